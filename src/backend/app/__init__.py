@@ -12,8 +12,16 @@ from .preference.router import router as preference_router
 
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from common.database import Base, engine
+from llm.cache import get_cache_stats
+from llm.metrics import render_prometheus
+from .connection.jira.metrics import render_jira_metrics
+from common.embedding_cache import (
+    get_embedding_cache_stats,
+    render_embedding_cache_metrics,
+)
 
 
 @asynccontextmanager
@@ -55,3 +63,20 @@ app.include_router(preference_router, prefix="/preferences")
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/llm/cache/stats")
+def llm_cache_stats():
+    return {
+        "pipelines": get_cache_stats(),
+        "embeddings": get_embedding_cache_stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def llm_metrics():
+    """LLM calls, tokens, latency, retries and rotations per agent, node and pipeline,
+    Jira webhook and sync counters, and embedding cache counters."""
+    return (
+        render_prometheus() + render_jira_metrics() + render_embedding_cache_metrics()
+    )
@@ -1,3 +1,4 @@
+from functools import partial
 from dataclasses import dataclass, field
 from typing import List, Optional, Literal
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
@@ -7,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from llm.dynamic_agent import DynamicAgent
 from common.configs import LlmConfig
+from common.registry import lazy
 from common.agents.schemas import LlmContext
 from langchain.agents.middleware import dynamic_prompt, ModelRequest
 
@@ -77,6 +79,7 @@ def create_agent_for_node(
     )
 
     return DynamicAgent(
+        name=f"ac.{node_name}",
         model_provider=provider,
         model_name=model_name,
         temperature=temperature,
@@ -88,22 +91,34 @@ def create_agent_for_node(
     )
 
 
-ac_generator_agent = create_agent_for_node(
-    node_name="ac_generator",
-    response_schema=ACGeneratorOutput,
-    temperature=LlmConfig.LLM_DEFAULT_TEMPERATURE,
+ac_generator_agent = lazy(
+    "ac.ac_generator",
+    partial(
+        create_agent_for_node,
+        node_name="ac_generator",
+        response_schema=ACGeneratorOutput,
+        temperature=LlmConfig.LLM_DEFAULT_TEMPERATURE,
+    ),
 )
 
-ac_reviewer_agent = create_agent_for_node(
-    node_name="ac_reviewer",
-    response_schema=ACReviewerOutput,
-    temperature=LlmConfig.LLM_DEFECT_TEMPERATURE,
+ac_reviewer_agent = lazy(
+    "ac.ac_reviewer",
+    partial(
+        create_agent_for_node,
+        node_name="ac_reviewer",
+        response_schema=ACReviewerOutput,
+        temperature=LlmConfig.LLM_DEFECT_TEMPERATURE,
+    ),
 )
 
-ac_rewriter_agent = create_agent_for_node(
-    node_name="ac_rewriter",
-    response_schema=ACGeneratorOutput,
-    temperature=LlmConfig.LLM_CHAT_TEMPERATURE,
+ac_rewriter_agent = lazy(
+    "ac.ac_rewriter",
+    partial(
+        create_agent_for_node,
+        node_name="ac_rewriter",
+        response_schema=ACGeneratorOutput,
+        temperature=LlmConfig.LLM_CHAT_TEMPERATURE,
+    ),
 )
 
 
@@ -259,7 +274,7 @@ def build_graph() -> StateGraph:
     return workflow.compile()
 
 
-_graph = build_graph()
+_graph = lazy("ac.graph", build_graph)
 
 
 def generate_ac_from_story(
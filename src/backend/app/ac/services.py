@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, or_
 from typing import Optional
+from functools import partial
 
 from common.database import uuid_generator
 
@@ -16,9 +17,10 @@ from app.connection.jira.services import JiraService
 from app.connection.jira.services.base_service import AC_ISSUE_TYPE_NAME
 from app.connection.jira.schemas import IssueUpdate, StoryDto
 from common.configs import LlmConfig
+from common.registry import lazy
 from utils.markdown_adf_bridge import md_to_adf
 
-from llm.gemini_dynamic_agent import GenimiDynamicAgent
+from llm.dynamic_agent import DynamicAgent
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.documentation.services import DocumentationService
 from app.preference.services import PreferenceService
@@ -45,11 +47,17 @@ RULES:
 - Return ONLY the suggestion in one of these formats. 
 - Do not add markdown backticks around the block unless it's part of the code."""
 
-suggestion_agent = GenimiDynamicAgent(
-    system_prompt=system_prompt,
-    model_name=LlmConfig.GEMINI_CHAT_MODEL,
-    temperature=0.2,
-    api_keys=LlmConfig.GEMINI_API_KEYS,
+suggestion_agent = lazy(
+    "ac.suggestion",
+    partial(
+        DynamicAgent,
+        name="ac.suggestion",
+        system_prompt=system_prompt,
+        model_name=LlmConfig.GEMINI_CHAT_MODEL,
+        temperature=0.2,
+        api_keys=LlmConfig.GEMINI_API_KEYS,
+        hedge=True,
+    ),
 )
 
 
@@ -405,7 +413,7 @@ Provide a useful suggestion following the given formats strictly.
 """
 
         try:
-            result = suggestion_agent.invoke([HumanMessage(content=user_prompt)])
+            result = await suggestion_agent.ainvoke([HumanMessage(content=user_prompt)])
 
             messages = result.get("messages", [])
             if len(messages) > 1:
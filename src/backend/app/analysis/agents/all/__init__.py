@@ -11,9 +11,10 @@ from .state import AllState, AllContext
 from .graph import build_all_graph
 from sqlalchemy.orm import Session
 from common.database import get_db
+from common.registry import lazy
 
-# Build the compiled graph at module level
-_graph = build_all_graph()
+# Compiled on first use, not at import
+_graph = lazy("analysis.all.graph", build_all_graph)
 
 
 def run_analysis(
@@ -160,6 +160,7 @@ def build_all_graph():
             stories=all_stories,
             project_context=project_context,
             batch_size=batch_size,
+            token_budget=runtime.context.self_batch_token_budget,
         )
         return {"raw_defects": defects}
 
@@ -2,6 +2,7 @@
 
 from ..schemas import BucketGroup, StoryMinimal
 from ..shared_state import AnalysisState, AnalysisContext
+from common.configs import LlmConfig
 
 
 class AllState(AnalysisState):
@@ -18,5 +19,6 @@ class AllState(AnalysisState):
 
 class AllContext(AnalysisContext):
     self_batch_size: int = 20
+    self_batch_token_budget: int = LlmConfig.LLM_BATCH_TOKEN_BUDGET
     group_story: bool = False
     group_story_threshold: int = 10
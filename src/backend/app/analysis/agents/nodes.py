@@ -42,10 +42,13 @@ from .utils import (
     format_raw_defects,
     get_last_langchain_message,
     get_response_as_schema,
+    story_tokens,
 )
+from utils.token_packer import chunk_items
 
 
 def _build_agent(
+    name: str,
     system_prompt: str = None,
     response_schema=None,
     tools=None,
@@ -77,6 +80,7 @@ def _build_agent(
         f"Building {provider} agent with model {model_name} and response schema {response_schema.__name__ if response_schema else 'None'}"
     )
     return DynamicAgent(
+        name=name,
         model_provider=provider,
         model_name=model_name,
         temperature=LlmConfig.LLM_DEFECT_TEMPERATURE,
@@ -88,12 +92,15 @@ def _build_agent(
         tools=tools,
         middleware=[user_context_prompt] if system_prompt else None,
         top_p=LlmConfig.LLM_DEFECT_TOP_P,
+        # Tool-using agents depend on live data, only pure schema agents are cached
+        cache=not tools,
     )
 
 
 # Lazy agent builders - instantiated at graph build time
 def build_context_gatherer_agent():
     return _build_agent(
+        name="analysis.context_gatherer",
         system_prompt=CONTEXT_GATHERER_PROMPT,
         tools=doc_tools + context_gatherer_tools,
     )
@@ -101,6 +108,7 @@ def build_context_gatherer_agent():
 
 def build_self_defect_agent():
     return _build_agent(
+        name="analysis.self_defect",
         system_prompt=SELF_DEFECT_ANALYZER_PROMPT,
         response_schema=SelfDefectResponse,
         response_mime_type="application/json",
@@ -114,16 +122,20 @@ def build_pairwise_defect_agent(targeted: bool = False, grouped: bool = False):
         )
 
     if grouped:
+        name = "analysis.pairwise_grouped"
         system_prompt = PAIRWISE_DEFECT_ANALYZER_TARGETED_GROUPED_PROMPT
         response_schema = PairwiseDefectGroupsResponse
     elif targeted:
+        name = "analysis.pairwise_targeted"
         system_prompt = PAIRWISE_DEFECT_ANALYZER_TARGETED_PROMPT
         response_schema = PairwiseDefectResponse
     else:
+        name = "analysis.pairwise"
         system_prompt = PAIRWISE_DEFECT_ANALYZER_PROMPT
         response_schema = PairwiseDefectResponse
 
     return _build_agent(
+        name=name,
         system_prompt=system_prompt,
         response_schema=response_schema,
         response_mime_type="application/json",
@@ -132,6 +144,7 @@ def build_pairwise_defect_agent(targeted: bool = False, grouped: bool = False):
 
 def build_validator_agent():
     return _build_agent(
+        name="analysis.validator",
         system_prompt=DEFECT_VALIDATOR_PROMPT,
         response_schema=ValidatorResponse,
         response_mime_type="application/json",
@@ -140,6 +153,7 @@ def build_validator_agent():
 
 def build_dependency_matrix_agent():
     return _build_agent(
+        name="analysis.dependency_matrix",
         system_prompt=DEPENDENCY_MATRIX_PROMPT,
         response_schema=DependencyMatrixResponse,
         response_mime_type="application/json",
@@ -205,9 +219,13 @@ def run_self_defect_analyzer(
     stories: list[StoryMinimal],
     project_context: str,
     batch_size: int = 1,
+    token_budget: int = 0,
 ) -> list[DefectByLlm]:
     """Analyze stories for self-defects (INVEST criteria violations).
 
+    Stories are packed into batches of at most ``token_budget`` tokens (and
+    ``batch_size`` stories) when a budget is given, else in fixed chunks.
+
     Returns:
         List of DefectByLlm for detected self-defects.
     """
@@ -220,8 +238,7 @@ def run_self_defect_analyzer(
         return []
 
     msg_lists = []
-    for i in range(0, len(stories), batch_size):
-        batch_stories = stories[i : i + batch_size]
+    for batch_stories in chunk_items(stories, batch_size, token_budget, story_tokens):
         stories_text = format_stories(batch_stories)
 
         msg = SELF_DEFECT_ANALYZER_MESSAGE.format(
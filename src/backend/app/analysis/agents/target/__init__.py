@@ -10,9 +10,10 @@ from ..schemas import StoryMinimal, DefectByLlm
 from .state import TargetedState, TargetedContext
 from .graph import build_targeted_graph
 from sqlalchemy.orm import Session
+from common.registry import lazy
 
-# Build the compiled graph at module level
-_graph = build_targeted_graph()
+# Compiled on first use, not at import
+_graph = lazy("analysis.target.graph", build_targeted_graph)
 
 
 def run_analysis(
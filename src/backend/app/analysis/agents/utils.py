@@ -1,6 +1,7 @@
 import json
 
 from .schemas import DefectByLlm, StoryMinimal
+from utils.token_packer import count_tokens
 import re
 
 
@@ -23,6 +24,11 @@ def format_stories(stories: list[StoryMinimal]) -> str:
     return "\n---\n".join(parts)
 
 
+def story_tokens(story: StoryMinimal) -> int:
+    """Tokens a story takes once rendered by format_stories."""
+    return count_tokens(format_stories([story]))
+
+
 def format_raw_defects(defects: list[DefectByLlm]) -> str:
     """Format raw defects into a readable text block for the validator."""
     if not defects:
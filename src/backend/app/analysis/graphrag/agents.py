@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from functools import partial
 from typing import Optional
 from langchain_core.messages import HumanMessage
 from langgraph.graph import StateGraph, START, END
@@ -7,6 +8,7 @@ from langchain.agents.middleware import dynamic_prompt, ModelRequest
 
 from llm.gemini_dynamic_agent import GenimiDynamicAgent
 from common.configs import LlmConfig
+from common.registry import lazy
 from .prompts import SELF_DEFECT_SYSTEM_PROMPT, PAIRWISE_DEFECT_SYSTEM_PROMPT
 from .schemas import SingleDefectResponse, PairwiseDefectResponse
 from .context_builder import build_llm_contexts_all, build_llm_contexts_targeted
@@ -28,24 +30,32 @@ def get_dynamic_prompt_middleware_for_node(node_name: str) -> str:
     return user_context_prompt
 
 
-self_defect_agent = GenimiDynamicAgent(
-    model_name=LlmConfig.GEMINI_DEFECT_MODEL,
-    temperature=LlmConfig.LLM_DEFECT_TEMPERATURE,
-    response_mime_type="application/json",
-    response_schema=SingleDefectResponse,
-    api_keys=LlmConfig.GEMINI_API_KEYS,
-    max_retries=LlmConfig.GEMINI_API_MAX_RETRY,
-    middleware=[get_dynamic_prompt_middleware_for_node("self_defect")],
+self_defect_agent = lazy(
+    "analysis.graphrag.self_defect",
+    partial(
+        GenimiDynamicAgent,
+        model_name=LlmConfig.GEMINI_DEFECT_MODEL,
+        temperature=LlmConfig.LLM_DEFECT_TEMPERATURE,
+        response_mime_type="application/json",
+        response_schema=SingleDefectResponse,
+        api_keys=LlmConfig.GEMINI_API_KEYS,
+        max_retries=LlmConfig.GEMINI_API_MAX_RETRY,
+        middleware=[get_dynamic_prompt_middleware_for_node("self_defect")],
+    ),
 )
 
-pairwise_defect_agent = GenimiDynamicAgent(
-    model_name=LlmConfig.GEMINI_DEFECT_MODEL,
-    temperature=LlmConfig.LLM_DEFECT_TEMPERATURE,
-    response_mime_type="application/json",
-    response_schema=PairwiseDefectResponse,
-    api_keys=LlmConfig.GEMINI_API_KEYS,
-    max_retries=LlmConfig.GEMINI_API_MAX_RETRY,
-    middleware=[get_dynamic_prompt_middleware_for_node("pairwise_defect")],
+pairwise_defect_agent = lazy(
+    "analysis.graphrag.pairwise_defect",
+    partial(
+        GenimiDynamicAgent,
+        model_name=LlmConfig.GEMINI_DEFECT_MODEL,
+        temperature=LlmConfig.LLM_DEFECT_TEMPERATURE,
+        response_mime_type="application/json",
+        response_schema=PairwiseDefectResponse,
+        api_keys=LlmConfig.GEMINI_API_KEYS,
+        max_retries=LlmConfig.GEMINI_API_MAX_RETRY,
+        middleware=[get_dynamic_prompt_middleware_for_node("pairwise_defect")],
+    ),
 )
 
 
@@ -173,8 +183,13 @@ def _build_analysis_graph(
     return workflow.compile()
 
 
-_graph_all = _build_analysis_graph(context_builder_all)
-_graph_targeted = _build_analysis_graph(context_builder_targeted)
+_graph_all = lazy(
+    "analysis.graphrag.graph_all", partial(_build_analysis_graph, context_builder_all)
+)
+_graph_targeted = lazy(
+    "analysis.graphrag.graph_targeted",
+    partial(_build_analysis_graph, context_builder_targeted),
+)
 
 
 def run_analysis_all(
@@ -92,6 +92,8 @@ class Analysis(Base):
 
     error_message = Column(Text, nullable=True)
     generating_proposals = Column(Boolean, default=False, nullable=False)
+    # JSON summary of LLM calls, tokens and latency per node/agent (llm.metrics)
+    llm_metrics = Column(Text, nullable=True)
 
     defects = relationship(
         "Defect", back_populates="analysis", cascade="all, delete-orphan"
@@ -36,6 +36,7 @@ from datetime import datetime
 from typing import Literal
 
 from common.redis_app import redis_client
+from llm.metrics import RunMetrics, track_run
 import json
 
 
@@ -101,12 +102,18 @@ class AnalysisRunService:
         )
 
     def _finish_analysis(
-        self, analysis: Analysis, status: AnalysisStatus, error_msg: str = None
+        self,
+        analysis: Analysis,
+        status: AnalysisStatus,
+        error_msg: str = None,
+        llm_run: RunMetrics = None,
     ):
         analysis.status = status
         analysis.ended_at = datetime.now()
         if error_msg:
             analysis.error_message = error_msg
+        if llm_run:
+            analysis.llm_metrics = json.dumps(llm_run.summary())
         self.db.commit()
         self._publish_status(
             analysis.id, status.value if hasattr(status, "value") else status
@@ -219,6 +226,7 @@ class AnalysisRunService:
 
     def run_analysis(self, analysis_id: str):
         start = time.perf_counter()
+        llm_run = None
         analysis = self._get_analysis_or_raise(analysis_id)
         targeted = analysis.type == AnalysisType.TARGETED
         target_key = analysis.story_key if targeted else None
@@ -292,29 +300,30 @@ class AnalysisRunService:
                 for d in query.all()
             ]
 
-            if targeted:
-                defects = run_user_stories_analysis_target(
-                    connection_id=analysis.connection_id,
-                    project_key=analysis.project_key,
-                    target_user_story=target,
-                    existing_defects=existing_defects,
-                    extra_instruction=(
-                        preference.extra_instruction if preference else None
-                    ),
-                    project_description=project_description,
-                )
-                log_message = "Target story analysis completed in:"
-            else:
-                defects = run_user_stories_analysis_all(
-                    connection_id=analysis.connection_id,
-                    project_key=analysis.project_key,
-                    existing_defects=existing_defects,
-                    extra_instruction=(
-                        preference.extra_instruction if preference else None
-                    ),
-                    project_description=project_description,
-                )
-                log_message = "User stories analysis completed in:"
+            with track_run("analysis", analysis.id) as llm_run:
+                if targeted:
+                    defects = run_user_stories_analysis_target(
+                        connection_id=analysis.connection_id,
+                        project_key=analysis.project_key,
+                        target_user_story=target,
+                        existing_defects=existing_defects,
+                        extra_instruction=(
+                            preference.extra_instruction if preference else None
+                        ),
+                        project_description=project_description,
+                    )
+                    log_message = "Target story analysis completed in:"
+                else:
+                    defects = run_user_stories_analysis_all(
+                        connection_id=analysis.connection_id,
+                        project_key=analysis.project_key,
+                        existing_defects=existing_defects,
+                        extra_instruction=(
+                            preference.extra_instruction if preference else None
+                        ),
+                        project_description=project_description,
+                    )
+                    log_message = "User stories analysis completed in:"
 
             self._convert_llm_defects(
                 analysis_id, defects, analysis.connection_id, analysis.project_key
@@ -326,7 +335,7 @@ class AnalysisRunService:
                 "ms",
             )
 
-            self._finish_analysis(analysis, AnalysisStatus.DONE)
+            self._finish_analysis(analysis, AnalysisStatus.DONE, llm_run=llm_run)
 
             if preference and preference.gen_proposal_after_analysis:
                 self._publish_notification(
@@ -337,7 +346,7 @@ class AnalysisRunService:
                 self.generate_proposals(analysis_id=analysis.id)
         except Exception:
             traceback.print_exc()
-            self._finish_analysis(analysis, AnalysisStatus.FAILED)
+            self._finish_analysis(analysis, AnalysisStatus.FAILED, llm_run=llm_run)
 
     def generate_proposals(self, analysis_id: str):
         """Generate proposals for the given analysis.
@@ -1 +1 @@
-from .agent import chat_with_agent, stream_with_agent
+from .agent import chat_with_agent, stream_with_agent, astream_with_agent
@@ -1,3 +1,5 @@
+from functools import partial
+
 from llm.dynamic_agent import DynamicAgent
 from langchain.agents.middleware import dynamic_prompt, ModelRequest
 from langchain_core.messages import BaseMessage, HumanMessage
@@ -5,6 +7,7 @@ from langchain_core.messages import BaseMessage, HumanMessage
 from sqlalchemy.orm import Session
 
 from common.configs import LlmConfig
+from common.registry import lazy
 from .prompts import SYSTEM_PROMPT, CHAT_TITLER_SYSTEM_PROMPT
 from .tools import tools
 from .context import Context
@@ -46,23 +49,34 @@ elif provider == "openai":
 else:
     raise ValueError(f"Unsupported LLM family: {provider}")
 
-chat_agent = DynamicAgent(
-    model_provider=provider,
-    model_name=model_name,
-    temperature=LlmConfig.LLM_CHAT_TEMPERATURE,
-    tools=tools,
-    middleware=[user_context_prompt],
-    api_keys=api_keys,
-    max_retries=max_retries,
+chat_agent = lazy(
+    "chat.assistant",
+    partial(
+        DynamicAgent,
+        name="chat.assistant",
+        model_provider=provider,
+        model_name=model_name,
+        temperature=LlmConfig.LLM_CHAT_TEMPERATURE,
+        tools=tools,
+        middleware=[user_context_prompt],
+        api_keys=api_keys,
+        max_retries=max_retries,
+    ),
 )
 
-titler_agent = DynamicAgent(
-    model_provider=provider,
-    model_name=model_name,
-    temperature=LlmConfig.LLM_CHAT_TEMPERATURE,
-    system_prompt=CHAT_TITLER_SYSTEM_PROMPT,
-    api_keys=api_keys,
-    max_retries=max_retries,
+titler_agent = lazy(
+    "chat.titler",
+    partial(
+        DynamicAgent,
+        name="chat.titler",
+        model_provider=provider,
+        model_name=model_name,
+        temperature=LlmConfig.LLM_CHAT_TEMPERATURE,
+        system_prompt=CHAT_TITLER_SYSTEM_PROMPT,
+        api_keys=api_keys,
+        max_retries=max_retries,
+        hedge=True,
+    ),
 )
 
 
@@ -138,6 +152,36 @@ def stream_with_agent(
         yield chunk, metadata
 
 
+async def astream_with_agent(
+    messages: list[BaseMessage],
+    connection_id: str,
+    session_id: str,
+    db: Session,
+    project_key: str,
+    project_description: str = None,
+    extra_instruction: str = None,
+):
+    """Async variant of stream_with_agent, for callers running on the event loop.
+
+    Yields:
+        tuple: (message chunk, metadata) pairs of the agent's response.
+    """
+
+    async for chunk, metadata in chat_agent.astream(
+        messages,
+        context=Context(
+            session_id=session_id,
+            connection_id=connection_id,
+            project_key=project_key,
+            db=db,
+            project_description=project_description,
+            extra_instruction=extra_instruction,
+        ),
+        stream_mode="messages",
+    ):
+        yield chunk, metadata
+
+
 def generate_chat_title(
     first_user_message: str,
 ) -> str:
@@ -154,3 +198,21 @@ def generate_chat_title(
     except:
         title = "New Chat Session"
     return title
+
+
+async def agenerate_chat_title(
+    first_user_message: str,
+) -> str:
+    """Async variant of generate_chat_title."""
+    response = await titler_agent.ainvoke(
+        [
+            HumanMessage(
+                content=f"Generate title for the following message: {first_user_message}"
+            )
+        ],
+    )
+    try:
+        title = response["messages"][-1].content.strip()
+    except:
+        title = "New Chat Session"
+    return title
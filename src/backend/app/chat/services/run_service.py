@@ -11,7 +11,7 @@ from app.documentation.services import DocumentationService
 from app.preference.services import PreferenceService
 from app.connection.jira.services import JiraService
 
-from ..agents.agent import stream_with_agent, generate_chat_title
+from ..agents.agent import astream_with_agent, agenerate_chat_title
 
 from ..models import (
     ChatSession,
@@ -105,7 +105,7 @@ class ChatService:
             )
 
             if not history_messages:
-                title = generate_chat_title(user_message)
+                title = await agenerate_chat_title(user_message)
                 # title = "New Chat"
                 print(f"Generated title for session {session.key}: {title}")
                 session.title = title
@@ -135,7 +135,7 @@ class ChatService:
                 connection_id=connection_id, project_key=project_key
             )
 
-            for chunk, _ in stream_with_agent(
+            async for chunk, _ in astream_with_agent(
                 messages=history_messages,
                 session_id=session.id,
                 connection_id=connection_id,
@@ -1,7 +1,12 @@
-import requests
-from typing import List, Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full, Queue
+from threading import Event
+from typing import Iterator, List, Literal, Optional
 import json
 
+from common.configs import JiraConfig
+
+from .http import jira_session
 from .schemas import (
     CreateIssuesRequest,
     IssueUpdate,
@@ -15,6 +20,14 @@ from .schemas import (
 API_BASE = "https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3"
 
 
+class JiraApiError(RuntimeError):
+    """A Jira call answered with an error status"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
 def _get_auth_header(access_token: str):
     return {"Authorization": f"Bearer {access_token}"}
 
@@ -37,7 +50,7 @@ class JiraClient:
         headers = {
             "Content-Type": "application/json",
         }
-        resp = requests.post(
+        resp = jira_session().post(
             "https://auth.atlassian.com/oauth/token", json=payload, headers=headers
         )
         resp.raise_for_status()
@@ -49,7 +62,7 @@ class JiraClient:
     ) -> list[JiraCloudInfoResponse]:
         url = "https://api.atlassian.com/oauth/token/accessible-resources"
         headers = _get_auth_header(access_token)
-        resp = requests.get(url, headers=headers)
+        resp = jira_session().get(url, headers=headers)
         resp.raise_for_status()
         return [JiraCloudInfoResponse(**item) for item in resp.json()]
 
@@ -58,7 +71,8 @@ class JiraClient:
         client_id: str,
         client_secret: str,
         refresh_token: str,
-    ) -> tuple[str, str]:
+    ) -> tuple[str, str, int]:
+        """Returns the new access token, the rotated refresh token and the lifetime of the access token in seconds"""
         url = "https://auth.atlassian.com/oauth/token"
         payload = {
             "grant_type": "refresh_token",
@@ -69,17 +83,17 @@ class JiraClient:
         headers = {
             "Content-Type": "application/json",
         }
-        resp = requests.post(url, json=payload, headers=headers)
+        resp = jira_session().post(url, json=payload, headers=headers)
         resp.raise_for_status()
         data = resp.json()
-        return data["access_token"], data["refresh_token"]
+        return data["access_token"], data["refresh_token"], data.get("expires_in", 3600)
 
     @staticmethod
     def _create_issues(cloud_id: str, access_token: str, payload: dict) -> list[str]:
         url = API_BASE.format(cloud_id=cloud_id) + "/issue/bulk"
         headers = _get_auth_header(access_token)
         headers["Content-Type"] = "application/json"
-        resp = requests.post(url, json=payload, headers=headers)
+        resp = jira_session().post(url, json=payload, headers=headers)
         resp.raise_for_status()
         resp_json = resp.json()
         created_issues = resp_json.get("issues", [])
@@ -106,7 +120,7 @@ class JiraClient:
         url = API_BASE.format(cloud_id=cloud_id) + "/issue"
         headers = _get_auth_header(access_token)
         headers["Content-Type"] = "application/json"
-        resp = requests.post(url, json=payload, headers=headers)
+        resp = jira_session().post(url, json=payload, headers=headers)
         # Log the response for debugging
         resp.raise_for_status()
 
@@ -121,7 +135,14 @@ class JiraClient:
         max_results: int | None = None,
         expand_rendered_fields: bool = False,
         get_raw_response: bool = False,
+        next_page_token: Optional[str] = None,
     ) -> SearchResponse | dict:
+        """Fetch one page of issues matching ``jql``
+
+        Args:
+            next_page_token (Optional[str]): Token of the page to fetch, from the
+                ``nextPageToken`` of the previous page. Defaults to the first page.
+        """
         url = API_BASE.format(cloud_id=cloud_id) + "/search/jql"
         params = {
             "jql": jql,
@@ -129,10 +150,12 @@ class JiraClient:
         }
         if max_results is not None:
             params["maxResults"] = str(max_results)
+        if next_page_token:
+            params["nextPageToken"] = next_page_token
         if expand_rendered_fields:
             params["expand"] = "renderedFields"
 
-        resp = requests.get(
+        resp = jira_session().get(
             url, headers=_get_auth_header(access_token), params=params, timeout=60
         )
         if not resp.ok:
@@ -140,14 +163,168 @@ class JiraClient:
                 detail = resp.text
             except Exception:
                 detail = ""
-            raise RuntimeError(
-                f"Jira search failed: {resp.status_code} {resp.reason} {detail}"
+            raise JiraApiError(
+                resp.status_code,
+                f"Jira search failed: {resp.status_code} {resp.reason} {detail}",
             )
 
         if get_raw_response:
             return resp.json()
         return SearchResponse(**resp.json())
 
+    @staticmethod
+    def iter_search_pages(
+        cloud_id: str,
+        access_token: str,
+        jql: str,
+        fields: list[str],
+        page_size: int = JiraConfig.SEARCH_PAGE_SIZE,
+        expand_rendered_fields: bool = False,
+        get_raw_response: bool = False,
+    ) -> Iterator[SearchResponse | dict]:
+        """Yield the pages of a search, following ``nextPageToken`` until the last page
+
+        Args:
+            cloud_id (str): Jira cloud ID
+            access_token (str): OAuth2 access token
+            jql (str): JQL query string
+            fields (list[str]): Fields to fetch
+            page_size (int): Issues per page
+        """
+        next_page_token = None
+        while True:
+            page = JiraClient.search_issues(
+                cloud_id=cloud_id,
+                access_token=access_token,
+                jql=jql,
+                fields=fields,
+                max_results=page_size,
+                expand_rendered_fields=expand_rendered_fields,
+                get_raw_response=get_raw_response,
+                next_page_token=next_page_token,
+            )
+            yield page
+            if get_raw_response:
+                next_page_token = page.get("nextPageToken")
+                is_last = page.get("isLast")
+            else:
+                next_page_token = page.next_page_token
+                is_last = page.is_last
+            if is_last or not next_page_token:
+                return
+
+    @staticmethod
+    def search_all_issues(
+        cloud_id: str,
+        access_token: str,
+        jql: str,
+        fields: list[str],
+        max_results: int | None = None,
+        expand_rendered_fields: bool = False,
+        get_raw_response: bool = False,
+    ) -> list[Issue] | list[dict]:
+        """Fetch every issue matching ``jql`` (up to ``max_results``) across pages"""
+        page_size = JiraConfig.SEARCH_PAGE_SIZE
+        if max_results is not None:
+            page_size = min(page_size, max_results)
+
+        issues = []
+        for page in JiraClient.iter_search_pages(
+            cloud_id=cloud_id,
+            access_token=access_token,
+            jql=jql,
+            fields=fields,
+            page_size=page_size,
+            expand_rendered_fields=expand_rendered_fields,
+            get_raw_response=get_raw_response,
+        ):
+            issues.extend(page["issues"] if get_raw_response else page.issues)
+            if max_results is not None and len(issues) >= max_results:
+                return issues[:max_results]
+        return issues
+
+    @staticmethod
+    def stream_search_pages(
+        cloud_id: str,
+        access_token: str,
+        jql_by_key: dict[str, str],
+        fields: list[str],
+        page_size: int = JiraConfig.SEARCH_PAGE_SIZE,
+        max_workers: int = JiraConfig.FETCH_CONCURRENCY,
+        prefetch_pages: int = 8,
+    ) -> Iterator[tuple[str, SearchResponse, bool]]:
+        """Run several paginated searches concurrently and stream their pages
+
+        Each search (e.g. one per project) follows its own ``nextPageToken``
+        chain in a bounded thread pool, so the caller can process the first
+        pages while later ones are still in flight. At most ``prefetch_pages``
+        pages wait for the caller before the fetchers pause.
+
+        Args:
+            cloud_id (str): Jira cloud ID
+            access_token (str): OAuth2 access token
+            jql_by_key (dict[str, str]): JQL query of each search, by a caller key
+            fields (list[str]): Fields to fetch
+            page_size (int): Issues per page
+            max_workers (int): Searches running at the same time
+            prefetch_pages (int): Pages buffered ahead of the caller
+
+        Yields:
+            tuple[str, SearchResponse, bool]: Key of the search, page, and
+                whether it is the last page of that search
+        """
+        pages: Queue = Queue(maxsize=max(prefetch_pages, 1))
+        stop = Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def fetch(key: str, jql: str):
+            try:
+                for page in JiraClient.iter_search_pages(
+                    cloud_id=cloud_id,
+                    access_token=access_token,
+                    jql=jql,
+                    fields=fields,
+                    page_size=page_size,
+                ):
+                    is_last = bool(page.is_last or not page.next_page_token)
+                    if not put((key, page, is_last)):
+                        return
+            except Exception as e:
+                put((key, e, True))
+            finally:
+                put((key, done, True))
+
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(jql_by_key))),
+            thread_name_prefix="jira-search",
+        )
+        try:
+            for key, jql in jql_by_key.items():
+                executor.submit(fetch, key, jql)
+
+            remaining = len(jql_by_key)
+            while remaining:
+                key, page, is_last = pages.get()
+                if page is done:
+                    remaining -= 1
+                    continue
+                if isinstance(page, Exception):
+                    raise page
+                yield key, page, is_last
+        finally:
+            # Early exit or error: stop the fetchers still paging
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
     @staticmethod
     def update_issue(
         cloud_id: str,
@@ -167,7 +344,7 @@ class JiraClient:
         print(f"JiraClient updating issue {issue_key}")
         url = API_BASE.format(cloud_id=cloud_id) + f"/issue/{issue_key}"
         headers = _get_auth_header(access_token)
-        resp = requests.put(url, json=payload, headers=headers)
+        resp = jira_session().put(url, json=payload, headers=headers)
         resp.raise_for_status()
 
     @staticmethod
@@ -186,7 +363,7 @@ class JiraClient:
         url = API_BASE.format(cloud_id=cloud_id) + f"/issue/{issue_key}"
         headers = _get_auth_header(access_token)
         headers["Accept"] = "application/json"
-        resp = requests.delete(url, headers=headers)
+        resp = jira_session().delete(url, headers=headers)
         resp.raise_for_status()
 
     @staticmethod
@@ -203,7 +380,7 @@ class JiraClient:
             params["fields"] = ",".join(fields)
         if expand_rendered_fields:
             params["expand"] = "renderedFields"
-        resp = requests.get(
+        resp = jira_session().get(
             url, headers=_get_auth_header(access_token), params=params, timeout=60
         )
         if not resp.ok:
@@ -211,8 +388,9 @@ class JiraClient:
                 detail = resp.text
             except Exception:
                 detail = ""
-            raise RuntimeError(
-                f"Jira get issue failed: {resp.status_code} {resp.reason} {detail}"
+            raise JiraApiError(
+                resp.status_code,
+                f"Jira get issue failed: {resp.status_code} {resp.reason} {detail}",
             )
 
         json = resp.json()
@@ -231,14 +409,17 @@ class JiraClient:
         url = API_BASE.format(cloud_id=cloud_id) + f"/{scope}/{id}/properties/"
         if prop_key:
             url += prop_key
-        resp = requests.get(url, headers=_get_auth_header(access_token), timeout=60)
+        resp = jira_session().get(
+            url, headers=_get_auth_header(access_token), timeout=60
+        )
         if not resp.ok:
             try:
                 detail = resp.text
             except Exception:
                 detail = ""
-            raise RuntimeError(
-                f"Jira get issue properties failed: {resp.status_code} {resp.reason} {detail}"
+            raise JiraApiError(
+                resp.status_code,
+                f"Jira get issue properties failed: {resp.status_code} {resp.reason} {detail}",
             )
 
         return resp.json()
@@ -279,7 +460,7 @@ class JiraClient:
         params = {
             "maxResults": str(max_results),
         }
-        resp = requests.get(
+        resp = jira_session().get(
             url, headers=_get_auth_header(access_token), params=params, timeout=60
         )
         if not resp.ok:
@@ -287,8 +468,9 @@ class JiraClient:
                 detail = resp.text
             except Exception:
                 detail = ""
-            raise RuntimeError(
-                f"Jira fetch projects failed: {resp.status_code} {resp.reason} {detail}"
+            raise JiraApiError(
+                resp.status_code,
+                f"Jira fetch projects failed: {resp.status_code} {resp.reason} {detail}",
             )
 
         json_data = resp.json()
@@ -319,7 +501,7 @@ class JiraClient:
         }
         if project_keys:
             params["keys"] = project_keys
-        resp = requests.get(
+        resp = jira_session().get(
             url, headers=_get_auth_header(access_token), params=params, timeout=60
         )
         if not resp.ok:
@@ -327,8 +509,9 @@ class JiraClient:
                 detail = resp.text
             except Exception:
                 detail = ""
-            raise RuntimeError(
-                f"Jira fetch projects failed: {resp.status_code} {resp.reason} {detail}"
+            raise JiraApiError(
+                resp.status_code,
+                f"Jira fetch projects failed: {resp.status_code} {resp.reason} {detail}",
             )
 
         json_data = resp.json()
@@ -358,6 +541,7 @@ class JiraClient:
         cloud_id: str,
         access_token: str,
         project_key: str,
+        issue_types: Optional[list[str]] = None,
     ) -> list[str]:
         """Fetch all story issue keys for a specific project
 
@@ -365,32 +549,26 @@ class JiraClient:
             cloud_id (str): Jira cloud ID
             access_token (str): OAuth2 access token
             project_key (str): The project key to fetch stories from
+            issue_types (list[str]): Issue types to include, defaults to stories only
 
         Returns:
             list[str]: List of story issue keys
         """
-        url = API_BASE.format(cloud_id=cloud_id) + "/search/jql"
-        jql = f'project = "{project_key}" AND issuetype = "Story" ORDER BY created ASC'
-        params = {
-            "jql": jql,
-            "fields": "key",
-            "maxResults": "1000",
-        }
-        resp = requests.get(
-            url, headers=_get_auth_header(access_token), params=params, timeout=60
+        types = ", ".join(f'"{t}"' for t in (issue_types or ["Story"]))
+        jql = (
+            f'project = "{project_key}" AND issuetype in ({types}) ORDER BY created ASC'
         )
-        if not resp.ok:
-            try:
-                detail = resp.text
-            except Exception:
-                detail = ""
-            raise RuntimeError(
-                f"Jira fetch story keys failed: {resp.status_code} {resp.reason} {detail}"
-            )
-
-        json_data = resp.json()
-        issues = json_data.get("issues", [])
-        return [issue["key"] for issue in issues]
+        keys = []
+        # Key-only pages can be much larger than full issue pages
+        for page in JiraClient.iter_search_pages(
+            cloud_id=cloud_id,
+            access_token=access_token,
+            jql=jql,
+            fields=["key"],
+            page_size=5000,
+        ):
+            keys.extend(issue.key for issue in page.issues)
+        return keys
 
     @staticmethod
     def create_issue_type(
@@ -424,7 +602,7 @@ class JiraClient:
             "description": description,
             "type": level,
         }
-        resp = requests.post(url, json=payload, headers=headers)
+        resp = jira_session().post(url, json=payload, headers=headers)
         resp.raise_for_status()
 
         return resp.json()["id"]
@@ -465,7 +643,7 @@ class JiraClient:
             "cropperHeight": height,
             "url": avatar_url,
         }
-        resp = requests.post(url, json=payload, headers=headers)
+        resp = jira_session().post(url, json=payload, headers=headers)
         resp.raise_for_status()
         return resp.json()["id"]
 
@@ -485,7 +663,7 @@ class JiraClient:
         headers = _get_auth_header(access_token)
         headers["Accept"] = "application/json"
 
-        issue_type_scheme_resp = requests.get(
+        issue_type_scheme_resp = jira_session().get(
             get_url,
             headers=headers,
             params={"projectId": project_id},
@@ -514,7 +692,7 @@ class JiraClient:
             payload = {
                 "issueTypeIds": [str(issue_type_id)],
             }
-            add_resp = requests.put(add_url, headers=headers, json=payload)
+            add_resp = jira_session().put(add_url, headers=headers, json=payload)
 
             if not add_resp.ok:
                 print(
@@ -543,7 +721,7 @@ class JiraClient:
         print("Fetching issue types to find:", name)
         url = API_BASE.format(cloud_id=cloud_id) + "/issuetype"
         headers = _get_auth_header(access_token)
-        resp = requests.get(url, headers=headers)
+        resp = jira_session().get(url, headers=headers)
         resp.raise_for_status()
         issue_types = resp.json()
         for issue_type in issue_types:
@@ -586,7 +764,7 @@ class JiraClient:
             "webhooks": [webhooks_payload],
         }
 
-        resp = requests.post(api_url, json=payload, headers=headers)
+        resp = jira_session().post(api_url, json=payload, headers=headers)
         resp.raise_for_status()
         print("Jira webhook registration response:", resp.status_code, resp.text)
         return resp.json()
@@ -607,7 +785,7 @@ class JiraClient:
         """
         api_url = API_BASE.format(cloud_id=cloud_id) + "/webhook"
         headers = _get_auth_header(access_token)
-        resp = requests.get(api_url, headers=headers)
+        resp = jira_session().get(api_url, headers=headers)
         resp.raise_for_status()
         return resp.json()["values"]
 
@@ -629,7 +807,7 @@ class JiraClient:
         payload = {
             "webhookIds": webhook_ids,
         }
-        resp = requests.delete(api_url, headers=headers, json=payload)
+        resp = jira_session().delete(api_url, headers=headers, json=payload)
         resp.raise_for_status()
 
     @staticmethod
@@ -652,7 +830,7 @@ class JiraClient:
         payload = {
             "webhookIds": webhook_ids,
         }
-        resp = requests.put(api_url, headers=headers, json=payload)
+        resp = jira_session().put(api_url, headers=headers, json=payload)
         resp.raise_for_status()
 
     @staticmethod
@@ -683,7 +861,7 @@ class JiraClient:
             "description": description,
             "type": type,
         }
-        resp = requests.post(url, json=payload, headers=headers)
+        resp = jira_session().post(url, json=payload, headers=headers)
         resp.raise_for_status()
         return resp.json()["id"]
 
@@ -705,7 +883,7 @@ class JiraClient:
         """
         url = API_BASE.format(cloud_id=cloud_id) + "/field"
         headers = _get_auth_header(access_token)
-        resp = requests.get(url, headers=headers)
+        resp = jira_session().get(url, headers=headers)
         resp.raise_for_status()
         fields = resp.json()
         for field in fields:
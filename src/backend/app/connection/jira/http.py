@@ -0,0 +1,116 @@
+"""Shared HTTP transport for the Jira and Atlassian OAuth APIs.
+
+Every ``JiraClient`` call used to open a new TCP + TLS connection through the
+module-level ``requests`` functions. One pooled, keep-alive session per process
+reuses connections across calls and threads. It applies default timeouts and
+waits out Jira throttling (429/503) using ``Retry-After`` before giving up.
+"""
+
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from common.configs import JiraConfig
+
+THROTTLED_STATUSES = (429, 503)
+
+
+def _retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class JiraSession(requests.Session):
+    """
+    ``requests.Session`` with a sized connection pool, default timeouts and
+    backoff on throttled responses. Throttled requests are retried whatever
+    their method, since Jira rejected them before doing any work.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = JiraConfig.HTTP_POOL_SIZE,
+        connect_timeout: float = JiraConfig.HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = JiraConfig.HTTP_READ_TIMEOUT,
+        max_retries: int = JiraConfig.HTTP_MAX_RETRIES,
+        max_backoff_seconds: float = JiraConfig.HTTP_MAX_BACKOFF_SECONDS,
+    ):
+        super().__init__()
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.max_backoff_seconds = max_backoff_seconds
+        # Only failed connects are retried here; nothing reached Jira
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.5
+            ),
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def _backoff(self, resp: requests.Response, attempt: int) -> float:
+        delay = _retry_after_seconds(resp)
+        if delay is None:
+            # Exponential with full jitter when Jira gives no hint
+            delay = random.uniform(0, min(self.max_backoff_seconds, 2**attempt))
+        return min(delay, self.max_backoff_seconds)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            resp = super().request(method, url, *args, **kwargs)
+            if (
+                resp.status_code not in THROTTLED_STATUSES
+                or attempt >= self.max_retries
+            ):
+                return resp
+            delay = self._backoff(resp, attempt)
+            print(
+                f"| Jira throttled {method} {url.split('?')[0]} "
+                f"({resp.status_code}), retrying in {delay:.1f}s "
+                f"[{attempt + 1}/{self.max_retries}]"
+            )
+            resp.close()
+            time.sleep(delay)
+            attempt += 1
+
+
+_session: Optional[JiraSession] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def jira_session() -> JiraSession:
+    """The process-wide session, recreated after a fork (RQ work horses)."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = JiraSession()
+                _session_pid = pid
+    return _session
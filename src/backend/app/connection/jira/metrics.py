@@ -0,0 +1,50 @@
+"""Counters of the Jira ingestion paths, shared by the API and the RQ workers.
+
+- ``webhook``: events received, processing runs, events coalesced into
+  another run, and updates skipped because the story content did not change
+- ``sync``: stories re-indexed by incremental syncs and those skipped as
+  unchanged
+"""
+
+from common.redis_app import redis_client
+
+METRICS_KEY = "jira:metrics:{scope}"
+COUNTERS = {
+    "webhook": ("events", "runs", "coalesced", "unchanged_skipped"),
+    "sync": ("stories_changed", "unchanged_skipped"),
+}
+
+
+def record(scope: str, **increments: int):
+    try:
+        pipe = redis_client.pipeline()
+        for field, value in increments.items():
+            if value:
+                pipe.hincrby(METRICS_KEY.format(scope=scope), field, value)
+        pipe.execute()
+    except Exception as e:
+        print(f"| Jira metrics: failed to record {scope}: {e}")
+
+
+def get_jira_metrics() -> dict:
+    metrics = {}
+    for scope, fields in COUNTERS.items():
+        raw = redis_client.hgetall(METRICS_KEY.format(scope=scope))
+        values = {field: 0 for field in fields}
+        values.update({key.decode(): int(value) for key, value in raw.items()})
+        metrics[scope] = values
+    webhook = metrics["webhook"]
+    webhook["events_per_run"] = round(
+        webhook["events"] / webhook["runs"] if webhook["runs"] else 0.0, 3
+    )
+    return metrics
+
+
+def render_jira_metrics() -> str:
+    """:func:`get_jira_metrics` in the Prometheus text exposition format."""
+    lines = []
+    for scope, values in get_jira_metrics().items():
+        for field, value in values.items():
+            suffix = "" if field == "events_per_run" else "_total"
+            lines.append(f"karela_jira_{scope}_{field}{suffix} {value:g}")
+    return "\n".join(lines) + "\n"
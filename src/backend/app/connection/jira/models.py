@@ -44,6 +44,7 @@ class Connection(Base):
     token_iv = Column(BINARY(12), nullable=False)
     refresh_token = Column(LONGBLOB, nullable=False)
     refresh_token_iv = Column(BINARY(12), nullable=False)
+    token_expires_at = Column(DateTime(timezone=True), nullable=True)
 
     name = Column(String(128), nullable=True, index=True)
     url = Column(String(256), nullable=True)
@@ -98,6 +99,8 @@ class Project(Base):
     synced = Column(
         Boolean, default=False, nullable=False
     )  # New field to track sync status
+    # Start of the last successful sync; incremental syncs fetch issues updated since
+    last_synced_at = Column(DateTime(timezone=True), nullable=True)
 
     connection = relationship("Connection", back_populates="projects")
     stories = relationship(
@@ -116,6 +119,8 @@ class Story(Base):
     key = Column(String(32), nullable=False, index=True)
     summary = Column(String(256), nullable=False)
     description = Column(Text, nullable=True)
+    # Hash of summary, description and ACs; unchanged content skips re-indexing
+    content_hash = Column(String(64), nullable=True)
 
     project_id = Column(
         String(64),
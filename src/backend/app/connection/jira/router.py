@@ -10,7 +10,7 @@ from .services import JiraService
 from .schemas import WebhookCallbackPayload
 from common.configs import JiraConfig
 from common.schemas import BasicResponse
-from .tasks import setup_connection
+from .tasks import enqueue_webhook, setup_connection
 
 router = APIRouter()
 
@@ -64,18 +64,19 @@ async def oauth_callback_css(css_file: str):
     return FileResponse(f"resources/pages/{css_file}")
 
 
-@router.post("/webhook/{connection_id}")
+@router.post("/webhook/{connection_id}", status_code=202)
 async def jira_webhook(
     connection_id: str,
     payload: WebhookCallbackPayload,
-    service: JiraService = Depends(get_jira_service),
 ):
+    """Accept a Jira webhook; it is processed by the webhook worker, coalesced per issue."""
     print("Webhook received for connection:", connection_id)
 
-    service.handle_webhook(
+    enqueue_webhook(
         connection_id=connection_id,
         payload=payload,
     )
+    return BasicResponse(data="Webhook accepted")
 
 
 @router.get("/webhook/health")
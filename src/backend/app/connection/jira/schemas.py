@@ -90,9 +90,12 @@ class Issue(BaseModel):
 class SearchResponse(BaseModel):
     total: Optional[int] = None
     issues: list[Issue] = Field(default_factory=list)
+    next_page_token: Optional[str] = Field(default=None, alias="nextPageToken")
+    is_last: Optional[bool] = Field(default=None, alias="isLast")
 
     model_config = ConfigDict(
         extra="ignore",
+        populate_by_name=True,
     )
 
 
@@ -274,3 +277,5 @@ class SyncProject(BaseModel):
 
 class SyncProjectsRequest(BaseModel):
     projects: list[SyncProject]
+    # Previously synced projects only fetch what changed since their last sync
+    incremental: bool = True
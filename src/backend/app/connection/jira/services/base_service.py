@@ -1,7 +1,15 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import requests
 from sqlalchemy.orm import Session
 from utils.security_utils import encrypt_token, decrypt_token
 from common.configs import JiraConfig
-from ..client import JiraClient
+from common.database import utcnow
+from common.redis_app import redis_client
+from ..client import JiraApiError, JiraClient
 from ..models import Connection
 from ..schemas import (
     Issue,
@@ -17,6 +25,35 @@ AI_TRANSACTION_ID_FIELD_NAME = "AI Transaction ID"
 AI_TRANSACTION_ID_FIELD_DESCRIPTION = (
     "Transaction ID for AI generated proposal for this issue"
 )
+TOKEN_CACHE_KEY = "jira:token:{connection_id}"
+TOKEN_REFRESH_LOCK_KEY = "jira:token_refresh_lock:{connection_id}"
+TOKEN_CACHE_TTL_SECONDS = 24 * 3600
+
+
+def _as_utc(value: datetime) -> datetime:
+    # MySQL DATETIME drops the offset; values are stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def story_content_hash(
+    summary: Optional[str], description: Optional[str], acs: Iterable[str] = ()
+) -> str:
+    """Hash of the story text read by analysis, tagging and embeddings; whitespace-only edits keep it"""
+
+    def normalize(text: Optional[str]) -> str:
+        return " ".join((text or "").split())
+
+    parts = [normalize(summary), normalize(description)]
+    parts += sorted(normalize(ac) for ac in acs)
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _is_unauthorized(e: Exception) -> bool:
+    if isinstance(e, JiraApiError):
+        return e.status_code == 401
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code == 401
+    return False
 
 
 class JiraBaseService:
@@ -25,12 +62,52 @@ class JiraBaseService:
         self.vector_store = JiraVectorStore()
         self.taxonomy_service = TaxonomyService(db=db)
 
-    def __refresh_access_token(self, connection: Connection):
+    def _token_is_fresh(self, expires_at: Optional[datetime]) -> bool:
+        if expires_at is None:
+            return False
+        margin = timedelta(seconds=JiraConfig.TOKEN_REFRESH_MARGIN_SECONDS)
+        return _as_utc(expires_at) - utcnow() > margin
+
+    def _load_cached_tokens(self, connection: Connection) -> bool:
+        """Adopt tokens another worker refreshed after this session loaded the connection"""
+        raw = redis_client.get(TOKEN_CACHE_KEY.format(connection_id=connection.id))
+        if not raw:
+            return False
+        cached = json.loads(raw)
+        expires_at = datetime.fromisoformat(cached["expires_at"])
+        current = connection.token_expires_at
+        if current is not None and _as_utc(current) >= expires_at:
+            return False
+
+        connection.token = bytes.fromhex(cached["token"])
+        connection.token_iv = bytes.fromhex(cached["token_iv"])
+        connection.refresh_token = bytes.fromhex(cached["refresh_token"])
+        connection.refresh_token_iv = bytes.fromhex(cached["refresh_token_iv"])
+        connection.token_expires_at = expires_at
+        return True
+
+    def _cache_tokens(self, connection: Connection):
+        # Tokens stay encrypted in Redis, as in the database
+        redis_client.set(
+            TOKEN_CACHE_KEY.format(connection_id=connection.id),
+            json.dumps(
+                {
+                    "token": connection.token.hex(),
+                    "token_iv": connection.token_iv.hex(),
+                    "refresh_token": connection.refresh_token.hex(),
+                    "refresh_token_iv": connection.refresh_token_iv.hex(),
+                    "expires_at": connection.token_expires_at.isoformat(),
+                }
+            ),
+            ex=TOKEN_CACHE_TTL_SECONDS,
+        )
+
+    def _refresh_access_token(self, connection: Connection):
         refresh_token = decrypt_token(
             connection.refresh_token, connection.refresh_token_iv
         )
 
-        access_token, refresh_token = JiraClient.refresh_access_token(
+        access_token, refresh_token, expires_in = JiraClient.refresh_access_token(
             client_id=JiraConfig.CLIENT_ID,
             client_secret=JiraConfig.CLIENT_SECRET,
             refresh_token=refresh_token,
@@ -39,6 +116,7 @@ class JiraBaseService:
         encrypted_atok, atok_iv = encrypt_token(access_token)
         connection.token = encrypted_atok
         connection.token_iv = atok_iv
+        connection.token_expires_at = utcnow() + timedelta(seconds=expires_in)
 
         encrypted_rtok, rtok_iv = encrypt_token(refresh_token)
         connection.refresh_token = encrypted_rtok
@@ -46,9 +124,44 @@ class JiraBaseService:
 
         self.db.add(connection)
         self.db.commit()
+        self._cache_tokens(connection)
 
         return access_token
 
+    def _get_access_token(
+        self, connection: Connection, rejected_token: Optional[bytes] = None
+    ) -> str:
+        """
+        Access token of the connection, refreshed shortly before it expires.
+        Only one worker refreshes a connection at a time (Atlassian rotates the
+        refresh token on every use); the others wait for the lock and pick up
+        the new tokens from Redis.
+
+        Args:
+            connection (Connection): Jira connection
+            rejected_token (bytes): Encrypted token Jira just answered 401 to, never returned again
+        """
+
+        def usable() -> bool:
+            return connection.token != rejected_token and self._token_is_fresh(
+                connection.token_expires_at
+            )
+
+        if usable() or (self._load_cached_tokens(connection) and usable()):
+            return decrypt_token(connection.token, connection.token_iv)
+
+        with redis_client.lock(
+            TOKEN_REFRESH_LOCK_KEY.format(connection_id=connection.id),
+            timeout=60,
+            blocking_timeout=60,
+        ):
+            # Another worker may have refreshed while this one waited
+            self._load_cached_tokens(connection)
+            if usable():
+                return decrypt_token(connection.token, connection.token_iv)
+            print(f"Refreshing access token of connection {connection.id}...")
+            return self._refresh_access_token(connection)
+
     def _exec_refreshing_access_token(
         self,
         connection: Connection,
@@ -56,13 +169,17 @@ class JiraBaseService:
         *args,
         **kwargs,
     ):
+        access_token = self._get_access_token(connection)
+        used_token = connection.token
         try:
-            access_token = decrypt_token(connection.token, connection.token_iv)
             return func(access_token=access_token, *args, **kwargs)
         except Exception as e:
-            if "401" in str(e) or "400" in str(e):
-                print("Access token expired, refreshing...")
-                access_token = self.__refresh_access_token(connection)
+            if _is_unauthorized(e):
+                # Revoked or expired early; the stored expiry cannot tell
+                print("Access token rejected, refreshing...")
+                access_token = self._get_access_token(
+                    connection, rejected_token=used_token
+                )
                 print("Refreshed access token, retrying function...")
                 return func(access_token=access_token, *args, **kwargs)
             else:
@@ -77,9 +194,9 @@ class JiraBaseService:
         expand_rendered_fields: bool = False,
         get_raw_response: bool = False,
     ):
-        response = self._exec_refreshing_access_token(
+        return self._exec_refreshing_access_token(
             connection,
-            JiraClient.search_issues,
+            JiraClient.search_all_issues,
             cloud_id=connection.id,
             jql=jql,
             fields=fields,
@@ -87,9 +204,6 @@ class JiraBaseService:
             expand_rendered_fields=expand_rendered_fields,
             get_raw_response=get_raw_response,
         )
-        if get_raw_response:
-            return response["issues"]
-        return response.issues
 
     def validate_connection(self, connection_id: str) -> bool:
         connection_count = (
@@ -148,6 +262,8 @@ class JiraBaseService:
             story_key=story_key,
             analysis_type="TARGETED",
         )
+        # The analysis searches the vectors this run may still be buffering
+        self.vector_store.flush()
         run_analysis(analysis_id=analysis_id)
 
     def _run_analysis_all(self, connection_id: str, project_key: str):
@@ -161,4 +277,5 @@ class JiraBaseService:
             story_key=None,
             analysis_type="ALL",
         )
+        self.vector_store.flush()
         run_analysis(analysis_id=analysis_id)
@@ -1,15 +1,17 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import Optional
+from datetime import timedelta
 
 from utils.markdown_adf_bridge.markdown_adf_bridge import md_to_adf, adf_to_md
 from utils.security_utils import encrypt_token, generate_jwt
 from common.configs import JiraConfig
-from common.vectorstore import chroma_vectorstore
+from common.vectorstore import delete_tenant_vectors
 from common.neo4j_app import delete_bucket_safe
-from .base_service import JiraBaseService
+from .base_service import JiraBaseService, story_content_hash
+from .sync_service import JiraSyncService
 from ..client import JiraClient
-from ..models import Connection, Project, Story, GherkinAC
+from ..models import Connection, Project, Story, GherkinAC, SyncStatus
 from ..schemas import (
     ConnectionDto,
     ConnectionSyncStatusDto,
@@ -25,12 +27,13 @@ from ..schemas import (
     WebhookCallbackPayload,
     SyncProjectsRequest,
 )
-from ..tasks import setup_connection, sync_projects
+from ..tasks import enqueue_sync, setup_connection
+from .. import metrics
 
 from app.documentation.services import DocumentationService
 
 # from app.xgraphrag.increment import GraphRAGUpdater
-from common.database import uuid_generator
+from common.database import uuid_generator, utcnow
 
 
 class JiraService(JiraBaseService):
@@ -50,6 +53,7 @@ class JiraService(JiraBaseService):
         refresh_encrypted_token, refresh_token_iv = encrypt_token(
             exchange_resp.refresh_token
         )
+        token_expires_at = utcnow() + timedelta(seconds=exchange_resp.expires_in)
 
         cloud_info = JiraClient.get_cloud_info(access_token=exchange_resp.access_token)[
             0
@@ -70,6 +74,7 @@ class JiraService(JiraBaseService):
             connection.token_iv = token_iv
             connection.refresh_token = refresh_encrypted_token
             connection.refresh_token_iv = refresh_token_iv
+            connection.token_expires_at = token_expires_at
 
             new = False
         else:
@@ -79,6 +84,7 @@ class JiraService(JiraBaseService):
                 token_iv=token_iv,
                 refresh_token=refresh_encrypted_token,
                 refresh_token_iv=refresh_token_iv,
+                token_expires_at=token_expires_at,
                 name=cloud_info.name,
                 url=cloud_info.url,
                 scopes=" ".join(cloud_info.scopes) if cloud_info.scopes else None,
@@ -105,10 +111,12 @@ class JiraService(JiraBaseService):
         if not connection:
             raise ValueError("Connection not found")
 
-        sync_projects.delay(
-            connection_id=connection_id,
-            request=request,
-        )
+        if not enqueue_sync(connection_id=connection_id, request=request):
+            JiraSyncService(self.db)._publish_status(
+                connection,
+                status=SyncStatus.IN_PROGRESS,
+                message="Waiting for documents to be processed...",
+            )
 
     def __get_connection_and_project(self, connection_id: str, project_key: str):
         connection_and_project = (
@@ -675,6 +683,7 @@ class JiraService(JiraBaseService):
                 ),
                 project_id=project.id,
             )
+            story.content_hash = story_content_hash(story.summary, story.description)
             self.db.add(story)
 
             self.db.commit()
@@ -761,12 +770,24 @@ class JiraService(JiraBaseService):
                 return
 
             fields = issue.get("fields", {}) or {}
-            story.summary = fields.get("summary")
-            story.description = (
+            summary = fields.get("summary")
+            description = (
                 adf_to_md(fields.get("description"))
                 if fields.get("description")
                 else None
             )
+            # Status, assignee or label changes leave the analysed content as is
+            content_hash = story_content_hash(
+                summary, description, [ac.description for ac in story.acs]
+            )
+            if content_hash == story.content_hash:
+                print(f"Story {story.key} content unchanged, skipping update")
+                metrics.record("webhook", unchanged_skipped=1)
+                return
+
+            story.summary = summary
+            story.description = description
+            story.content_hash = content_hash
 
             to_vector = [
                 StoryDto(
@@ -909,16 +930,15 @@ class JiraService(JiraBaseService):
                 webhook_ids=webhook_ids,
             )
 
-        # Delete from vector store
-        print("Deleting connection from vector store:", connection_id)
-        chroma_vectorstore.delete(
-            where={"connection_id": connection_id},
-        )
-
         # Delete all documentation related to this connection
         print("Deleting documentation for connection:", connection_id)
         DocumentationService(self.db).delete_all_docs(connection_id)
 
+        # Delete from vector store, after the docs so that removing their
+        # chunks does not recreate the connection's collection
+        print("Deleting connection from vector store:", connection_id)
+        delete_tenant_vectors(connection_id)
+
         print("Deleting connection from neo4j:", connection_id)
         projects = (
             self.db.query(Project).filter(Project.connection_id == connection_id).all()
@@ -1053,6 +1073,7 @@ class JiraService(JiraBaseService):
         )
         self.db.add(ac)
         self.db.commit()
+        self._refresh_content_hash(story)
 
     def _on_ac_update(
         self,
@@ -1084,6 +1105,7 @@ class JiraService(JiraBaseService):
         ac.summary = summary
         ac.description = description
         self.db.commit()
+        self._refresh_content_hash(ac.story)
 
     def _on_ac_delete(
         self,
@@ -1110,8 +1132,17 @@ class JiraService(JiraBaseService):
         if not ac:
             raise ValueError("AC not found")
 
+        story = ac.story
         self.db.delete(ac)
         self.db.commit()
+        self._refresh_content_hash(story)
+
+    def _refresh_content_hash(self, story: Story):
+        """Keep the story hash in line with its ACs, so later story updates compare against it"""
+        story.content_hash = story_content_hash(
+            story.summary, story.description, [ac.description for ac in story.acs]
+        )
+        self.db.commit()
 
     def get_project_description(self, connection_id: str, project_key: str) -> str:
         """Fetch project description from Jira"""
@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from sqlalchemy.orm import Session
 import json
+import math
+import time
 from app.connection.jira.services.base_service import (
     AC_ISSUE_TYPE_DESCRIPTION,
     AC_ISSUE_TYPE_LEVEL,
@@ -7,17 +11,18 @@ from app.connection.jira.services.base_service import (
     AI_TRANSACTION_ID_FIELD_DESCRIPTION,
     AI_TRANSACTION_ID_FIELD_NAME,
 )
-from common.database import uuid_generator
+from common.database import SessionLocal, uuid_generator, utcnow
 from utils.markdown_adf_bridge.markdown_adf_bridge import adf_to_md
 from common.configs import JiraConfig
-from .base_service import JiraBaseService
+from .base_service import JiraBaseService, _as_utc, story_content_hash
+from .. import metrics
 from ..client import JiraClient
+from ..upsert import store_project_issues
 from ..models import GherkinAC, Connection, Project, Story, SyncError, SyncStatus
 from ..schemas import (
     StoryDto,
 )
 
-from utils.security_utils import decrypt_token
 from common.redis_app import redis_client
 
 # from app.xgraphrag import index_user_stories
@@ -91,11 +96,13 @@ class JiraSyncService(JiraBaseService):
         connection: Connection,
         project_keys: list[str],
         project_context_map: dict[str, str],
+        incremental: bool = True,
     ):
         self._sync_projects(
             connection,
             project_keys=project_keys,
             project_context_map=project_context_map,
+            incremental=incremental,
         )
         self._publish_status(
             connection, status=SyncStatus.DONE, message="Sync completed"
@@ -106,8 +113,13 @@ class JiraSyncService(JiraBaseService):
         connection: Connection,
         project_keys: list[str],
         project_context_map: dict[str, str],
+        incremental: bool = True,
     ):
-        """Fetch projects and stories from Jira and cache them locally, including vector store"""
+        """Fetch projects and stories from Jira and cache them locally, including vector store.
+
+        With ``incremental``, projects synced before only fetch the issues updated
+        since their last sync, and drop the issues no longer in Jira.
+        """
         self.db.add(connection)
         connection.sync_error = None
         self._publish_status(
@@ -115,6 +127,9 @@ class JiraSyncService(JiraBaseService):
         )
 
         try:
+            # Watermark of this run, taken before anything is fetched
+            sync_started = utcnow()
+
             # Fetch all projects from Jira
             print("Fetching projects from Jira...")
             projects_data = self._exec_refreshing_access_token(
@@ -128,13 +143,10 @@ class JiraSyncService(JiraBaseService):
 
             # Get access token once for all concurrent operations
             # This also ensures token is refreshed if needed before concurrent work
-            access_token = self._get_valid_access_token(connection)
+            access_token = self._get_access_token(connection)
             cloud_id = connection.id
 
-            def process_project(project_data):
-                """Process a single project: fetch issues and return data for DB"""
-                print("Processing project:", project_data.key)
-
+            for project_data in projects_data:
                 self._exec_refreshing_access_token(
                     connection=connection,
                     func=JiraClient.add_issue_type_to_project,
@@ -148,33 +160,30 @@ class JiraSyncService(JiraBaseService):
                     project_data.key,
                 )
 
-                # Fetch stories for this project using pre-fetched token (no DB access)
-                response = JiraClient.search_issues(
-                    access_token=access_token,
-                    cloud_id=cloud_id,
-                    jql=f'project = "{project_data.key}" AND issuetype in ("Story", "{AC_ISSUE_TYPE_NAME}")',
-                    fields=["summary", "description", "issuetype", "parent", "created"],
-                    max_results=1000,  # Adjust as needed, consider pagination for large projects
-                )
-                issues = response.issues
-
-                print(f"Fetched {len(issues)} issues for project {project_data.key}")
-
-                stories: list[Story] = []
-                gherkin_acs: list[GherkinAC] = []
-                story_dtos: list[StoryDto] = []
-
-                project_id = uuid_generator()
-                project = Project(
-                    id=project_id,
-                    id_=project_data.id,
-                    key=project_data.key,
-                    name=project_data.name,
-                    avatar_url=project_data.avatar_url,
-                    connection_id=connection.id,
+            def start_project(project_data) -> dict:
+                """Local project row and accumulators for its issues"""
+                print("Processing project:", project_data.key)
+                self._publish_status(
+                    connection,
+                    message=f"Processing project {project_data.key}...",
+                    status=SyncStatus.IN_PROGRESS,
                 )
-
-                story_key_to_id_map = {}
+                project = {
+                    "id_": project_data.id,
+                    "key": project_data.key,
+                    "name": project_data.name,
+                    "avatar_url": project_data.avatar_url,
+                    "connection_id": connection.id,
+                }
+                return {
+                    "started": time.perf_counter(),
+                    "project": project,
+                    "stories": [],
+                    "gherkin_acs": [],
+                }
+
+            def add_issues(state: dict, issues):
+                """Convert one page of issues into story and Gherkin AC rows"""
                 for issue in issues:
                     description_md = (
                         adf_to_md(issue.fields.description)
@@ -182,91 +191,201 @@ class JiraSyncService(JiraBaseService):
                         else None
                     )
                     if issue.fields.issuetype.name == "Story":
-                        story_id = uuid_generator()
-                        stories.append(
-                            Story(
-                                id=story_id,
-                                id_=issue.id,
-                                key=issue.key,
-                                summary=issue.fields.summary,
-                                description=description_md,
-                                project_id=project_id,
-                            )
-                        )
-                        story_key_to_id_map[issue.key] = story_id
-                        story_dtos.append(
-                            StoryDto(
-                                id=issue.id,
-                                key=issue.key,
-                                summary=issue.fields.summary,
-                                description=description_md,
-                            )
+                        state["stories"].append(
+                            {
+                                "id_": issue.id,
+                                "key": issue.key,
+                                "summary": issue.fields.summary,
+                                "description": description_md,
+                            }
                         )
                     else:
-                        gherkin_acs.append(
-                            GherkinAC(
-                                id_=issue.id,
-                                key=issue.key,
-                                summary=issue.fields.summary,
-                                description=description_md or "",
-                                story_id=(
-                                    issue.fields.parent.key  # Placeholder, we will change to the correct ID below
+                        state["gherkin_acs"].append(
+                            {
+                                "id_": issue.id,
+                                "key": issue.key,
+                                "summary": issue.fields.summary,
+                                "description": description_md or "",
+                                "parent_key": (
+                                    issue.fields.parent.key
                                     if issue.fields.parent
                                     else None
                                 ),
-                                created_at=issue.fields.created,
-                            )
+                                "created_at": issue.fields.created,
+                            }
                         )
-                for gherkin_ac in gherkin_acs:
-                    story_id = story_key_to_id_map.get(gherkin_ac.story_id)
-                    if story_id:
-                        gherkin_ac.story_id = story_id
 
-                return project, stories, gherkin_acs, story_dtos
+            def finish_project(
+                service: "JiraSyncService", connection: Connection, state: dict
+            ):
+                """Store a fully fetched project and index its stories, on a worker"""
+                project = state["project"]
+                stories = state["stories"]
+                print(
+                    f"Fetched {len(stories) + len(state['gherkin_acs'])} issues for project {project['key']}"
+                )
 
-            for project_data in projects_data:
-                self._publish_status(
-                    connection,
-                    message=f"Processing project {project_data.key}...",
-                    status=SyncStatus.IN_PROGRESS,
+                # Parents may arrive on a later page than their ACs
+                ac_descriptions = {}
+                for gherkin_ac in state["gherkin_acs"]:
+                    ac_descriptions.setdefault(gherkin_ac["parent_key"], []).append(
+                        gherkin_ac["description"]
+                    )
+                for story in stories:
+                    story["content_hash"] = story_content_hash(
+                        story["summary"],
+                        story["description"],
+                        ac_descriptions.get(story["key"], ()),
+                    )
+
+                project.update(
+                    synced=True,
+                    last_synced_at=sync_started,
+                    description=project_context_map.get(project["key"], ""),
                 )
-                project, stories, gherkin_acs, story_dtos = process_project(
-                    project_data
+                project, stories, deleted = store_project_issues(
+                    service.db, project, stories, state["gherkin_acs"]
                 )
+                if deleted:
+                    # Left over from an earlier sync of this project
+                    service.vector_store.remove_stories(
+                        connection_id=connection.id,
+                        project_key=project["key"],
+                        story_ids=[story["id"] for story in deleted]
+                        + [story["id_"] for story in deleted],
+                    )
 
-                project.synced = True
-                project.description = project_context_map.get(project.key, "")
-                self.db.add(project)
-                self.db.add_all(stories)
-                self.db.add_all(gherkin_acs)
-
+                story_dtos = [
+                    StoryDto(
+                        id=story["id_"],
+                        key=story["key"],
+                        summary=story["summary"],
+                        description=story["description"],
+                    )
+                    for story in stories
+                ]
                 # Push this project's stories to vector store
                 if story_dtos:
-                    self._publish_status(
+                    service._publish_status(
                         connection,
-                        message=f"Indexing {len(story_dtos)} stories for project {project_data.key}...",
+                        message=f"Indexing {len(story_dtos)} stories for project {project['key']}...",
                         status=SyncStatus.IN_PROGRESS,
                     )
 
                     # index_user_stories(
                     #     connection_id=connection.id,
-                    #     project_key=project.key,
+                    #     project_key=project["key"],
                     #     user_stories=story_dtos,
                     # )
 
-                    self.taxonomy_service.initialize_buckets(
+                    service.taxonomy_service.initialize_buckets(
                         connection_id=connection.id,
-                        project_key=project.key,
+                        project_key=project["key"],
                         stories=story_dtos,
-                        project_description=project.description or "",
+                        project_description=project["description"] or "",
                     )
 
-                    self.vector_store.add_stories(
+                    service.vector_store.add_stories(
                         connection_id=connection.id,
-                        project_key=project.key,
+                        project_key=project["key"],
                         stories=story_dtos,
                     )
 
+            local_projects = {}
+            if incremental:
+                local_projects = {
+                    project.key: project
+                    for project in self.db.query(Project).filter(
+                        Project.connection_id == connection.id,
+                        Project.synced.is_(True),
+                        Project.last_synced_at.isnot(None),
+                    )
+                }
+
+            def sync_delta(
+                service: "JiraSyncService", connection: Connection, project_id: str
+            ):
+                project = service.db.get(Project, project_id)
+                service._sync_project_delta(
+                    connection,
+                    project,
+                    project_description=project_context_map.get(project.key, ""),
+                    sync_started=sync_started,
+                )
+
+            # Each project is stored, embedded and bucketed on a worker with a
+            # DB session of its own, so the LLM-bound taxonomy builds overlap
+            futures = {}
+            # Workers share this store; their vector writes are batched across
+            # projects and flushed in the background while taxonomies build
+            with self.vector_store.buffered(), ThreadPoolExecutor(
+                max_workers=JiraConfig.SYNC_PROJECT_CONCURRENCY,
+                thread_name_prefix="jira-sync",
+            ) as executor:
+                for project_data in projects_data:
+                    project = local_projects.get(project_data.key)
+                    if project is not None:
+                        future = executor.submit(
+                            self._run_project_worker,
+                            connection.id,
+                            project.key,
+                            partial(sync_delta, project_id=project.id),
+                        )
+                        futures[future] = project.key
+
+                # Pages of all other projects are fetched concurrently, following
+                # nextPageToken, and converted here as they arrive
+                projects_by_key = {
+                    p.key: p for p in projects_data if p.key not in local_projects
+                }
+                in_progress: dict[str, dict] = {}
+                pages = JiraClient.stream_search_pages(
+                    cloud_id=cloud_id,
+                    access_token=access_token,
+                    jql_by_key={
+                        key: f'project = "{key}" AND issuetype in ("Story", "{AC_ISSUE_TYPE_NAME}")'
+                        for key in projects_by_key
+                    },
+                    fields=["summary", "description", "issuetype", "parent", "created"],
+                )
+                for project_key, page, is_last in pages:
+                    if project_key not in in_progress:
+                        in_progress[project_key] = start_project(
+                            projects_by_key[project_key]
+                        )
+                    add_issues(in_progress[project_key], page.issues)
+                    if is_last:
+                        state = in_progress.pop(project_key)
+                        future = executor.submit(
+                            self._run_project_worker,
+                            connection.id,
+                            project_key,
+                            partial(finish_project, state=state),
+                            started=state["started"],
+                        )
+                        futures[future] = project_key
+
+                timings = {}
+                for future in as_completed(futures):
+                    try:
+                        timings[futures[future]] = future.result()
+                    except Exception:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+
+            if timings:
+                print(
+                    "Project sync timings: "
+                    + ", ".join(
+                        f"{key} {seconds:.1f}s"
+                        for key, seconds in sorted(
+                            timings.items(), key=lambda item: -item[1]
+                        )
+                    )
+                )
+            # Workers may have refreshed the tokens and status meanwhile
+            self.db.refresh(connection)
             self._publish_status(
                 connection, status=SyncStatus.DONE, message="Sync completed"
             )
@@ -284,19 +403,230 @@ class JiraSyncService(JiraBaseService):
             self.db.commit()
             raise
 
-    def _get_valid_access_token(self, connection: Connection) -> str:
-        """Get a valid access token, refreshing if necessary"""
-
-        access_token = decrypt_token(connection.token, connection.token_iv)
-        # Test the token with a simple API call
+    def _run_project_worker(
+        self, connection_id: str, project_key: str, work, started: float = None
+    ) -> float:
+        """
+        Run ``work(service, connection)`` with a service and DB session of its own,
+        then publish how long the project took. ``started`` backdates the timing
+        to when the project's first page arrived.
+        """
+        started = started or time.perf_counter()
+        db = SessionLocal()
         try:
-            JiraClient.fetch_projects(access_token=access_token, cloud_id=connection.id)
-            return access_token
-        except Exception as e:
-            if "401" in str(e) or "400" in str(e):
-                # Token expired, refresh it
-                return self.__refresh_access_token(connection)
+            service = JiraSyncService(db)
+            service.vector_store = self.vector_store
+            connection = db.get(Connection, connection_id)
+            work(service, connection)
+            elapsed = time.perf_counter() - started
+            service._publish_status(
+                connection, message=f"Project {project_key} synced in {elapsed:.1f}s"
+            )
+            return elapsed
+        except Exception:
+            db.rollback()
             raise
+        finally:
+            db.close()
+
+    def _sync_project_delta(
+        self,
+        connection: Connection,
+        project: Project,
+        project_description: str,
+        sync_started,
+    ):
+        """Apply the issues changed since the project's last sync, and the deletions"""
+        self._publish_status(
+            connection,
+            message=f"Fetching changes of project {project.key}...",
+            status=SyncStatus.IN_PROGRESS,
+        )
+        issue_types = ["Story", AC_ISSUE_TYPE_NAME]
+        types = ", ".join(f'"{t}"' for t in issue_types)
+
+        # Relative JQL dates do not depend on the Jira user's time zone
+        elapsed = (sync_started - _as_utc(project.last_synced_at)).total_seconds()
+        minutes = math.ceil(elapsed / 60) + JiraConfig.SYNC_WATERMARK_OVERLAP_MINUTES
+        changed = self._fetch_issues(
+            connection,
+            jql=f'project = "{project.key}" AND issuetype in ({types}) AND updated >= -{minutes}m',
+            fields=["summary", "description", "issuetype", "parent", "created"],
+        )
+        # Deletions leave no trace in a search; diff the key sets instead
+        remote_keys = set(
+            self._exec_refreshing_access_token(
+                connection,
+                JiraClient.fetch_story_keys,
+                cloud_id=connection.id,
+                project_key=project.key,
+                issue_types=issue_types,
+            )
+        )
+
+        stories = {
+            story.key: story
+            for story in self.db.query(Story).filter(Story.project_id == project.id)
+        }
+        acs = {
+            ac.key: ac
+            for ac in self.db.query(GherkinAC)
+            .join(Story)
+            .filter(Story.project_id == project.id, GherkinAC.key.isnot(None))
+        }
+
+        added, touched = [], {}
+        # Stories first, so that new ACs find their parent
+        changed.sort(key=lambda issue: issue.fields.issuetype.name != "Story")
+        for issue in changed:
+            description_md = (
+                adf_to_md(issue.fields.description)
+                if issue.fields.description
+                else None
+            )
+            if issue.fields.issuetype.name == "Story":
+                story = stories.get(issue.key)
+                if story is None:
+                    story = Story(
+                        id=uuid_generator(),
+                        id_=issue.id,
+                        key=issue.key,
+                        summary=issue.fields.summary,
+                        description=description_md,
+                        project_id=project.id,
+                    )
+                    self.db.add(story)
+                    stories[issue.key] = story
+                    added.append(story)
+                else:
+                    story.summary = issue.fields.summary
+                    story.description = description_md
+                    touched[story.id] = story
+                continue
+
+            parent = (
+                stories.get(issue.fields.parent.key) if issue.fields.parent else None
+            )
+            if parent is None:
+                print(f"Skipping AC {issue.key}: parent story not synced")
+                continue
+            ac = acs.get(issue.key)
+            if ac is None:
+                self.db.add(
+                    GherkinAC(
+                        id_=issue.id,
+                        key=issue.key,
+                        summary=issue.fields.summary,
+                        description=description_md or "",
+                        story_id=parent.id,
+                        created_at=issue.fields.created,
+                    )
+                )
+            else:
+                old_parent = self.db.get(Story, ac.story_id)
+                if old_parent is not None and old_parent.id != parent.id:
+                    touched[old_parent.id] = old_parent
+                ac.summary = issue.fields.summary
+                ac.description = description_md or ""
+                ac.story_id = parent.id
+            touched[parent.id] = parent
+
+        deleted = [story for key, story in stories.items() if key not in remote_keys]
+        deleted_ids = {story.id for story in deleted}
+        for story in deleted:
+            self.db.delete(story)  # Its ACs are deleted with it
+        for key, ac in acs.items():
+            if key not in remote_keys and ac.story_id not in deleted_ids:
+                self.db.delete(ac)
+                parent = self.db.get(Story, ac.story_id)
+                if parent is not None:
+                    touched[parent.id] = parent
+
+        # Re-index only the stories whose summary, description or ACs changed
+        self.db.flush()
+        ac_descriptions = {}
+        for story_id, description in (
+            self.db.query(GherkinAC.story_id, GherkinAC.description)
+            .join(Story)
+            .filter(Story.project_id == project.id)
+        ):
+            ac_descriptions.setdefault(story_id, []).append(description)
+        for story in added:
+            story.content_hash = story_content_hash(
+                story.summary, story.description, ac_descriptions.get(story.id, ())
+            )
+        updated, skipped = [], 0
+        added_ids = {story.id for story in added}
+        for story_id, story in touched.items():
+            if story_id in added_ids or story_id in deleted_ids:
+                continue
+            content_hash = story_content_hash(
+                story.summary, story.description, ac_descriptions.get(story_id, ())
+            )
+            if content_hash == story.content_hash:
+                skipped += 1
+                continue
+            story.content_hash = content_hash
+            updated.append(story)
+
+        project.last_synced_at = sync_started
+        project.description = project_description
+        self.db.commit()
+        print(
+            f"Project {project.key}: {len(changed)} issues changed since last sync, "
+            f"{len(added)} stories added, {len(updated)} updated, {len(deleted)} deleted, "
+            f"{skipped} unchanged"
+        )
+        metrics.record(
+            "sync", stories_changed=len(added) + len(updated), unchanged_skipped=skipped
+        )
+
+        def to_dtos(items: list[Story]) -> list[StoryDto]:
+            # Full syncs index stories under their Jira ID
+            return [
+                StoryDto(
+                    id=story.id_,
+                    key=story.key,
+                    summary=story.summary,
+                    description=story.description,
+                )
+                for story in items
+            ]
+
+        if added or updated:
+            self._publish_status(
+                connection,
+                message=f"Indexing {len(added) + len(updated)} changed stories for project {project.key}...",
+                status=SyncStatus.IN_PROGRESS,
+            )
+            self.taxonomy_service.update_buckets(
+                connection_id=connection.id,
+                project_key=project.key,
+                stories=to_dtos(added + updated),
+                project_description=project.description or "",
+            )
+        if deleted:
+            self.taxonomy_service.delete_buckets_by_story_keys(
+                connection_id=connection.id,
+                project_key=project.key,
+                story_keys=[story.key for story in deleted],
+            )
+        # Stories created by webhooks are indexed under their local ID
+        stale_ids = [story.id for story in updated + deleted] + [
+            story.id_ for story in deleted
+        ]
+        if stale_ids:
+            self.vector_store.remove_stories(
+                connection_id=connection.id,
+                project_key=project.key,
+                story_ids=stale_ids,
+            )
+        if added or updated:
+            self.vector_store.add_stories(
+                connection_id=connection.id,
+                project_key=project.key,
+                stories=to_dtos(added + updated),
+            )
 
     def _update_issue_type_for_connection(
         self, connection: Connection, issue_type_id: str
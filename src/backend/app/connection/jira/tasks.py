@@ -1,17 +1,28 @@
 from common.database import SessionLocal
 from .services.sync_service import JiraSyncService
+from rq import Queue, Retry
 from rq.decorators import job
+from common.configs import JiraConfig
 from common.redis_app import redis_client
-from .schemas import SyncProjectsRequest
-from .models import Connection, SyncStatus
+from app.documentation.tasks import enqueue_after_docs
+from .schemas import SyncProjectsRequest, WebhookCallbackPayload
+from .models import Connection
+from . import metrics
 
-import time
+from datetime import timedelta
+import json
 
+WEBHOOK_PENDING_KEY = "jira:webhook:pending:{connection_id}:{issue_key}"
+WEBHOOK_SCHEDULED_KEY = "jira:webhook:scheduled:{connection_id}:{issue_key}"
+WEBHOOK_PROCESSING_KEY = "jira:webhook:processing:{connection_id}:{issue_key}"
+WEBHOOK_LOCK_KEY = "jira:webhook:lock:{connection_id}:{issue_key}"
+WEBHOOK_EVENTS_TTL = 24 * 3600
+WEBHOOK_JOB_TIMEOUT = 600
+SYNC_JOB_TIMEOUT = 3600
 
-@job("sync", timeout=3600, connection=redis_client)
-def sync_projects(
-    connection_id: str, request: SyncProjectsRequest, timeout=1800, interval=5
-):
+
+@job("sync", timeout=SYNC_JOB_TIMEOUT, connection=redis_client)
+def sync_projects(connection_id: str, request: SyncProjectsRequest):
     db = SessionLocal()
     connection = db.query(Connection).filter(Connection.id == connection_id).first()
     if not connection:
@@ -19,21 +30,6 @@ def sync_projects(
 
     try:
         service = JiraSyncService(db)
-        service._publish_status(
-            connection=connection,
-            status=SyncStatus.IN_PROGRESS,
-            message="Processing documents...",
-        )
-
-        start = time.time()
-        print("Start checking doc processing")
-        while time.time() - start < timeout:
-            doc_processing_count = redis_client.scard(f"doc_{connection_id}")
-            if doc_processing_count == 0:
-                print("Doc processing done.")
-                break
-            print(f"Doc progress: {doc_processing_count} remaining...")
-            time.sleep(interval)
 
         project_context_map = {}
         project_keys = []
@@ -48,6 +44,7 @@ def sync_projects(
             connection=connection,
             project_keys=project_keys,
             project_context_map=project_context_map,
+            incremental=request.incremental,
         )
 
         for project_key in run_analysis_keys:
@@ -60,6 +57,23 @@ def sync_projects(
         db.close()
 
 
+def enqueue_sync(connection_id: str, request: SyncProjectsRequest) -> bool:
+    """Queue a sync that starts once the connection's documents are processed.
+
+    The analysis that can follow the sync searches the documentation, so the
+    sync waits for pending document tasks. It does so without holding a worker:
+    the job is parked and the last document task enqueues it. Returns True if
+    the sync was queued right away.
+    """
+    queue = Queue("sync", connection=redis_client)
+    job = queue.create_job(
+        sync_projects,
+        kwargs={"connection_id": connection_id, "request": request},
+        timeout=SYNC_JOB_TIMEOUT,
+    )
+    return enqueue_after_docs(connection_id, queue, job)
+
+
 @job("sync", timeout=3600, connection=redis_client)
 def setup_connection(connection_id: str):
     db = SessionLocal()
@@ -68,3 +82,110 @@ def setup_connection(connection_id: str):
         service.setup_new_connection(connection_id)
     finally:
         db.close()
+
+
+def enqueue_webhook(connection_id: str, payload: WebhookCallbackPayload):
+    """Buffer a webhook event and schedule its processing.
+
+    Events for the same issue that arrive within ``JIRA_WEBHOOK_COALESCE_SECONDS``
+    of the first one are processed together, in a single run.
+    """
+    issue_key = payload.issue.get("key") or payload.issue.get("id")
+    keys = {"connection_id": connection_id, "issue_key": issue_key}
+    pending_key = WEBHOOK_PENDING_KEY.format(**keys)
+
+    pipe = redis_client.pipeline()
+    pipe.rpush(
+        pending_key, json.dumps({"event": payload.webhookEvent, "issue": payload.issue})
+    )
+    pipe.expire(pending_key, WEBHOOK_EVENTS_TTL)
+    pipe.execute()
+    metrics.record("webhook", events=1)
+
+    window = JiraConfig.WEBHOOK_COALESCE_SECONDS
+    # Only the first event of a burst schedules a run
+    scheduled = redis_client.set(
+        WEBHOOK_SCHEDULED_KEY.format(**keys),
+        1,
+        nx=True,
+        ex=int(window) + WEBHOOK_JOB_TIMEOUT,
+    )
+    if scheduled:
+        Queue("webhook", connection=redis_client).enqueue_in(
+            timedelta(seconds=window),
+            process_webhook_events,
+            connection_id=connection_id,
+            issue_key=issue_key,
+            job_timeout=WEBHOOK_JOB_TIMEOUT,
+            retry=Retry(max=3, interval=[30, 120, 600]),
+        )
+
+
+def _coalesce_events(events: list[dict]) -> dict:
+    """One event with the net effect of a burst, carrying the latest issue fields"""
+    last = events[-1]
+    if last["event"] == "jira:issue_deleted":
+        return last
+    for event in reversed(events):
+        if event["event"] == "jira:issue_deleted":
+            break
+        if event["event"] == "jira:issue_created":
+            # Created and then edited: still unknown locally
+            return {"event": "jira:issue_created", "issue": last["issue"]}
+    return last
+
+
+@job("webhook", timeout=WEBHOOK_JOB_TIMEOUT, connection=redis_client)
+def process_webhook_events(connection_id: str, issue_key: str):
+    keys = {"connection_id": connection_id, "issue_key": issue_key}
+    # Released first: an event arriving from now on schedules another run
+    redis_client.delete(WEBHOOK_SCHEDULED_KEY.format(**keys))
+    # Runs of one issue never overlap, so an older run cannot finish last and
+    # overwrite what a newer one stored
+    with redis_client.lock(
+        WEBHOOK_LOCK_KEY.format(**keys),
+        timeout=WEBHOOK_JOB_TIMEOUT,
+        blocking_timeout=WEBHOOK_JOB_TIMEOUT // 2,
+    ):
+        _process_pending_events(connection_id, issue_key)
+
+
+def _process_pending_events(connection_id: str, issue_key: str):
+    """Move the pending events to the processing list and handle them together.
+
+    The processing list is only deleted once the run succeeded. Events of a
+    failed run stay there and are handled first by the retry or the next run.
+    """
+    from .services.main_service import JiraService
+
+    keys = {"connection_id": connection_id, "issue_key": issue_key}
+    pending_key = WEBHOOK_PENDING_KEY.format(**keys)
+    processing_key = WEBHOOK_PROCESSING_KEY.format(**keys)
+    while redis_client.lmove(pending_key, processing_key, "LEFT", "RIGHT"):
+        pass
+    redis_client.expire(processing_key, WEBHOOK_EVENTS_TTL)
+    raw_events = redis_client.lrange(processing_key, 0, -1)
+    if not raw_events:
+        return
+
+    events = [json.loads(raw) for raw in raw_events]
+    event = _coalesce_events(events)
+    metrics.record("webhook", runs=1, coalesced=len(events) - 1)
+    print(
+        f"Processing {event['event']} for {issue_key} "
+        f"(coalesced from {len(events)} webhook events)"
+    )
+
+    db = SessionLocal()
+    try:
+        service = JiraService(db)
+        with service.vector_store.buffered():
+            service.handle_webhook(
+                connection_id=connection_id,
+                payload=WebhookCallbackPayload(
+                    webhookEvent=event["event"], issue=event["issue"]
+                ),
+            )
+    finally:
+        db.close()
+    redis_client.delete(processing_key)
@@ -0,0 +1,175 @@
+"""Set-based writes of fully synced projects.
+
+A full sync used to add every story and AC as an ORM object and flush them
+one INSERT at a time in a single transaction. Rows are now written with
+multi-row ``INSERT ... ON DUPLICATE KEY UPDATE`` statements, committed chunk by
+chunk. Local IDs are reused for issues already stored (matched on the Jira ID),
+so running the same sync twice updates rows in place instead of duplicating
+them.
+"""
+
+from typing import Iterable, Sequence
+
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from common.configs import JiraConfig
+from common.database import uuid_generator, utcnow
+from .models import GherkinAC, Project, Story
+
+PROJECT_UPDATE_COLUMNS = (
+    "key",
+    "name",
+    "avatar_url",
+    "description",
+    "synced",
+    "last_synced_at",
+)
+STORY_UPDATE_COLUMNS = ("key", "summary", "description", "content_hash")
+AC_UPDATE_COLUMNS = ("id_", "key", "summary", "description", "story_id", "updated_at")
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def upsert_rows(
+    db: Session,
+    model,
+    rows: list[dict],
+    update_columns: Sequence[str],
+    chunk_size: int = JiraConfig.SYNC_UPSERT_CHUNK_SIZE,
+) -> int:
+    """
+    Insert ``rows`` into the table of ``model``, updating ``update_columns`` of
+    rows whose primary key already exists. Each chunk is its own statement and
+    transaction, so locks are only held for one chunk at a time.
+    """
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    for chunk in _chunks(rows, chunk_size):
+        if dialect == "mysql":
+            stmt = mysql.insert(table).values(list(chunk))
+            stmt = stmt.on_duplicate_key_update(
+                {column: stmt.inserted[column] for column in update_columns}
+            )
+        elif dialect in ("sqlite", "postgresql"):
+            insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = insert(table).values(list(chunk))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[column.name for column in table.primary_key],
+                set_={column: stmt.excluded[column] for column in update_columns},
+            )
+        else:
+            raise ValueError(f"Bulk upsert is not supported on {dialect}")
+        db.execute(stmt)
+        db.commit()
+    return len(rows)
+
+
+def _delete_ids(db: Session, model, ids: list[str], chunk_size: int):
+    for chunk in _chunks(ids, chunk_size):
+        db.query(model).filter(model.id.in_(chunk)).delete(synchronize_session=False)
+        db.commit()
+
+
+def store_project_issues(
+    db: Session,
+    project: dict,
+    stories: list[dict],
+    acs: list[dict],
+    chunk_size: int = JiraConfig.SYNC_UPSERT_CHUNK_SIZE,
+) -> tuple[dict, list[dict], list[dict]]:
+    """
+    Upsert a fully fetched project with its stories and ACs, and delete the
+    stories and ACs no longer in Jira.
+
+    Args:
+        project: ``Project`` columns; ``id`` is resolved from ``connection_id``
+            and the Jira ``id_``
+        stories: ``Story`` columns without ``id`` and ``project_id``
+        acs: ``GherkinAC`` columns without ``id`` and ``story_id``, plus
+            ``parent_key``, the Jira key of their story
+
+    Returns:
+        The stored project row, the stored story rows and the deleted stories
+        (``id``, ``id_`` and ``key``)
+    """
+    existing_project_id = (
+        db.query(Project.id)
+        .filter(
+            Project.connection_id == project["connection_id"],
+            Project.id_ == project["id_"],
+        )
+        .scalar()
+    )
+    project = {**project, "id": existing_project_id or uuid_generator()}
+    upsert_rows(db, Project, [project], PROJECT_UPDATE_COLUMNS, chunk_size)
+
+    story_ids = dict(
+        db.query(Story.id_, Story.id).filter(Story.project_id == project["id"])
+    )
+    story_rows = [
+        {
+            **story,
+            "id": story_ids.get(story["id_"]) or uuid_generator(),
+            "project_id": project["id"],
+        }
+        for story in stories
+    ]
+    upsert_rows(db, Story, story_rows, STORY_UPDATE_COLUMNS, chunk_size)
+
+    # ACs created in the app get a random id_ and only their Jira key once
+    # pushed, so existing rows are matched on the key as well
+    existing_acs = (
+        db.query(GherkinAC.id, GherkinAC.id_, GherkinAC.key)
+        .join(Story)
+        .filter(Story.project_id == project["id"])
+        .all()
+    )
+    ac_ids = {id_: id for id, id_, _ in existing_acs if id_ is not None}
+    ac_ids_by_key = {key: id for id, _, key in existing_acs if key is not None}
+    id_by_key = {story["key"]: story["id"] for story in story_rows}
+    now = utcnow()
+    ac_rows = []
+    for ac in acs:
+        story_id = id_by_key.get(ac["parent_key"])
+        if story_id is None:
+            print(f"Skipping AC {ac['key']}: parent story not synced")
+            continue
+        row = {key: value for key, value in ac.items() if key != "parent_key"}
+        row.update(
+            id=ac_ids.get(ac["id_"])
+            or ac_ids_by_key.get(ac["key"])
+            or uuid_generator(),
+            story_id=story_id,
+            updated_at=now,
+        )
+        ac_rows.append(row)
+    upsert_rows(db, GherkinAC, ac_rows, AC_UPDATE_COLUMNS, chunk_size)
+
+    # Rerunning a full sync also drops what was deleted in Jira meanwhile.
+    # ACs created locally and not pushed yet have no Jira key and are kept.
+    synced_story_ids = {story["id_"] for story in stories}
+    deleted = [
+        {"id": id, "id_": id_, "key": key}
+        for id, id_, key in db.query(Story.id, Story.id_, Story.key).filter(
+            Story.project_id == project["id"]
+        )
+        if id_ not in synced_story_ids
+    ]
+    synced_ac_ids = {row["id"] for row in ac_rows}
+    stale_ac_ids = [
+        id for id, _, key in existing_acs if key is not None and id not in synced_ac_ids
+    ]
+    deleted_story_ids = [story["id"] for story in deleted]
+    stale_ac_ids += [
+        ac_id
+        for (ac_id,) in db.query(GherkinAC.id).filter(
+            GherkinAC.story_id.in_(deleted_story_ids)
+        )
+    ]
+    _delete_ids(db, GherkinAC, stale_ac_ids, chunk_size)
+    _delete_ids(db, Story, deleted_story_ids, chunk_size)
+    return project, story_rows, deleted
@@ -1,12 +1,51 @@
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
 from langchain_core.documents import Document
 
-from common.vectorstore import chroma_vectorstore
+from common.configs import JiraConfig
+from common.embedding_cache import track_ingest
+from common.vectorstore import get_tenant_vectorstore
 from .schemas import StoryDto
 
+# (connection_id, project_key, story_id)
+WriteKey = tuple[str, str, str]
+
 
 class JiraVectorStore:
-    def __init__(self, vector_store=chroma_vectorstore):
+    """
+    Story vectors in Chroma, in the collection of their connection (see
+    ``get_tenant_vectorstore``) unless ``vector_store`` is given. Writes go
+    straight to Chroma, except inside :meth:`buffered`, where they are
+    collected, collapsed per story (the last add, update or remove wins) and
+    flushed in batches of ``batch_size`` with ``max_workers`` concurrent
+    requests. A background flush starts whenever enough writes are pending, so
+    embedding overlaps with the caller's work.
+    """
+
+    def __init__(
+        self,
+        vector_store=None,
+        batch_size: int = JiraConfig.VECTOR_WRITE_BATCH_SIZE,
+        max_workers: int = JiraConfig.VECTOR_WRITE_CONCURRENCY,
+    ):
         self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        # None marks a removal
+        self._pending: dict[WriteKey, Optional[Document]] = {}
+        self._buffer_depth = 0
+        self._flusher: Optional[ThreadPoolExecutor] = None
+        self._flushes: list[Future] = []
+
+    def _store(self, connection_id: str):
+        if self.vector_store is not None:
+            return self.vector_store
+        return get_tenant_vectorstore(connection_id)
 
     def retrieve_similar_stories(
         self,
@@ -29,7 +68,7 @@ class JiraVectorStore:
 
         where = {"$and": and_op}
 
-        results = self.vector_store._similarity_search_with_relevance_scores(
+        results = self._store(connection_id)._similarity_search_with_relevance_scores(
             query=query,
             k=k,
             filter=where,
@@ -51,67 +90,147 @@ class JiraVectorStore:
             stories.append(story)
         return stories
 
+    @staticmethod
+    def _story_document(
+        connection_id: str, project_key: str, story: StoryDto | dict
+    ) -> Optional[Document]:
+        if isinstance(story, StoryDto):
+            content = f"Summary: {story.summary}\nDescription: {story.description}"
+            id = story.id
+            key = story.key
+        elif isinstance(story, dict):
+            content = f"Summary: {story.get('summary', '')}\nDescription: {story.get('description', '')}"
+            id = story.get("id", "")
+            key = story.get("key", "")
+        else:
+            return None
+        metadata = {
+            "key": key,
+            "connection_id": connection_id,
+            "project_key": project_key,
+        }
+        return Document(page_content=content, id=id, metadata=metadata)
+
     def add_stories(
         self, connection_id: str, project_key: str, stories: list[StoryDto | dict]
     ):
-        documents = []
+        writes = {}
         for story in stories:
-            if isinstance(story, StoryDto):
-                content = f"Summary: {story.summary}\nDescription: {story.description}"
-                id = story.id
-                metadata = {
-                    "key": story.key,
-                    "connection_id": connection_id,
-                    "project_key": project_key,
-                }
-            elif isinstance(story, dict):
-                content = f"Summary: {story.get('summary', '')}\nDescription: {story.get('description', '')}"
-                id = story.get("id", "")
-                metadata = {
-                    "key": story.get("key", ""),
-                    "connection_id": connection_id,
-                    "project_key": project_key,
-                }
-            else:
-                continue
-            documents.append(Document(page_content=content, id=id, metadata=metadata))
-        self.vector_store.add_documents(documents)
+            document = self._story_document(connection_id, project_key, story)
+            if document is not None:
+                writes[(connection_id, project_key, document.id)] = document
+        self._write(writes)
 
     def update_stories(
         self, connection_id: str, project_key: str, stories: list[StoryDto | dict]
     ):
-        ids = []
-        documents = []
-        for story in stories:
-            if isinstance(story, StoryDto):
-                content = f"Summary: {story.summary}\nDescription: {story.description}"
-                id = story.id
-                metadata = {
-                    "key": story.key,
-                    "connection_id": connection_id,
-                    "project_key": project_key,
-                }
-                ids.append(story.id)
-            elif isinstance(story, dict):
-                content = f"Summary: {story.get('summary', '')}\nDescription: {story.get('description', '')}"
-                id = story.get("id", "")
-                metadata = {
-                    "key": story.get("key", ""),
-                    "connection_id": connection_id,
-                    "project_key": project_key,
-                }
-            else:
-                continue
-            ids.append(id)
-            documents.append(Document(page_content=content, id=id, metadata=metadata))
-        self.vector_store.update_documents(ids=ids, documents=documents)
+        # Chroma adds are upserts, so an update is the same write
+        self.add_stories(connection_id, project_key, stories)
 
     def remove_stories(
         self, connection_id: str, project_key: str, story_ids: list[str]
     ):
-        where_op = [
-            {"connection_id": connection_id},
-            {"project_key": project_key},
+        self._write(
+            {(connection_id, project_key, story_id): None for story_id in story_ids}
+        )
+
+    @contextmanager
+    def buffered(self):
+        """Collect the writes made inside (from any thread) and flush them on exit."""
+        with self._lock:
+            self._buffer_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._buffer_depth -= 1
+                outermost = self._buffer_depth == 0
+            if outermost:
+                self.flush()
+
+    def flush(self):
+        """Write all pending writes and wait for the background flushes."""
+        self._submit_flush()
+        with self._lock:
+            flushes, self._flushes = self._flushes, []
+        errors = [f.exception() for f in flushes if f.exception() is not None]
+        with self._lock:
+            # Stores live as long as their service; do not keep idle threads
+            if self._flusher and not (self._flushes or self._buffer_depth):
+                self._flusher.shutdown(wait=False)
+                self._flusher = None
+        if errors:
+            raise errors[0]
+
+    def _write(self, writes: dict[WriteKey, Optional[Document]]):
+        if not writes:
+            return
+        with self._lock:
+            self._pending.update(writes)
+            buffered = self._buffer_depth > 0
+            backlog = len(self._pending)
+        if not buffered:
+            self.flush()
+        elif backlog >= self.batch_size * self.max_workers:
+            self._submit_flush()
+
+    def _submit_flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            # One flusher thread keeps flushes in submission order
+            if self._flusher is None:
+                self._flusher = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="jira-vectors"
+                )
+            self._flushes.append(self._flusher.submit(self._apply, pending))
+
+    def _apply(self, pending: dict[WriteKey, Optional[Document]]):
+        removals: dict[tuple[str, str], list[str]] = {}
+        documents: dict[str, list[Document]] = {}
+        for (connection_id, project_key, story_id), document in pending.items():
+            if document is None:
+                removals.setdefault((connection_id, project_key), []).append(story_id)
+            else:
+                documents.setdefault(connection_id, []).append(document)
+
+        for (connection_id, project_key), story_ids in removals.items():
+            where = {
+                "$and": [
+                    {"connection_id": connection_id},
+                    {"project_key": project_key},
+                ]
+            }
+            store = self._store(connection_id)
+            for start in range(0, len(story_ids), self.batch_size):
+                store.delete(
+                    ids=story_ids[start : start + self.batch_size], where=where
+                )
+
+        if not documents:
+            return
+        # Batches never span connections, which may live in different collections
+        batches = [
+            (self._store(connection_id), docs[start : start + self.batch_size])
+            for connection_id, docs in documents.items()
+            for start in range(0, len(docs), self.batch_size)
         ]
-        where = {"$and": where_op}
-        self.vector_store.delete(ids=story_ids, where=where)
+        count = sum(len(docs) for docs in documents.values())
+        with track_ingest(f"{count} stories"):
+            if len(batches) == 1:
+                store, batch = batches[0]
+                store.add_documents(batch)
+                return
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(batches))
+            ) as executor:
+                futures = [
+                    # Batches count towards this flush's cache stats
+                    executor.submit(
+                        contextvars.copy_context().run, store.add_documents, batch
+                    )
+                    for store, batch in batches
+                ]
+                for future in futures:
+                    future.result()
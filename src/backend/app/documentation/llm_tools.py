@@ -73,6 +73,7 @@ def search_in_docs(
     vectorstore = DocumentationVectorStore()
     results = vectorstore.retrieve_similar(
         query=query,
+        connection_id=context.connection_id,
         documentation_id=doc_id,
         k=k,
     )
@@ -173,7 +173,9 @@ class DocumentationService:
         if not doc:
             raise ValueError(f"Text documentation {doc_id} not found")
 
-        self.vectorstore.remove_chunks(documentation_id=doc_id)
+        self.vectorstore.remove_chunks(
+            documentation_id=doc_id, connection_id=doc.connection_id
+        )
         self.db.delete(doc)
         self.db.commit()
 
@@ -382,7 +384,9 @@ class DocumentationService:
         except FileNotFoundError:
             pass  # Already gone
 
-        self.vectorstore.remove_chunks(documentation_id=doc_id)
+        self.vectorstore.remove_chunks(
+            documentation_id=doc_id, connection_id=doc.connection_id
+        )
         self.db.delete(doc)
         self.db.commit()
 
@@ -496,7 +500,9 @@ class DocumentationService:
         )
 
         for doc in text_docs:
-            self.vectorstore.remove_chunks(documentation_id=doc.id)
+            self.vectorstore.remove_chunks(
+                documentation_id=doc.id, connection_id=doc.connection_id
+            )
             self.db.delete(doc)
 
         for doc in file_docs:
@@ -504,7 +510,9 @@ class DocumentationService:
                 delete_file(doc.url)
             except FileNotFoundError:
                 pass  # Already gone
-            self.vectorstore.remove_chunks(documentation_id=doc.id)
+            self.vectorstore.remove_chunks(
+                documentation_id=doc.id, connection_id=doc.connection_id
+            )
             self.db.delete(doc)
 
         self.db.commit()
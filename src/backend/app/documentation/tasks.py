@@ -7,12 +7,23 @@ from .models import TextDocumentation, FileDocumentation
 from .vectorstore import DocumentationVectorStore
 from utils.pdf2md import pdf2md_bytes
 from utils.file_storage import download_file
+from utils.token_packer import count_tokens
+from rq import Queue
 from rq.decorators import job
+from rq.job import Job
+from redis.exceptions import WatchError
 from common.redis_app import redis_client
 from langchain_text_splitters import MarkdownTextSplitter
-import tiktoken
 from markitdown import MarkItDown
 import io
+from datetime import timedelta
+
+DOC_TASKS_KEY = "doc_{connection_id}"
+# Jobs parked until the connection has no document processing left
+DOC_WAITING_JOBS_KEY = "doc_waiting_{connection_id}"
+# Longest document job; a task that died without finishing stops blocking then
+DOC_TASKS_TTL_SECONDS = 7200
+DOC_WAIT_TIMEOUT_SECONDS = 1800
 
 
 def _split_text_into_chunks(
@@ -26,13 +37,6 @@ def _split_text_into_chunks(
     return text_splitter.split_text(text)
 
 
-def _count_tokens(text: str, model: str = "o200k_base") -> int:
-    """Helper to count tokens in a text using tiktoken."""
-    encoding = tiktoken.get_encoding(model)
-    tokens = encoding.encode(text)
-    return len(tokens)
-
-
 def _docx_to_markdown(file_binary: bytes) -> str:
     """Helper to convert DOCX file binary to markdown string using markitdown."""
     try:
@@ -52,12 +56,14 @@ def _process_and_save_text_doc(
     """Helper to process text content, save chunks to vectorstore."""
     for doc in docs:
         chunks = _split_text_into_chunks(doc.content)
-        token_count = _count_tokens(doc.content)
+        token_count = count_tokens(doc.content)
 
         doc.token_count = token_count
         db.add(doc)
 
-        vectorstore.remove_chunks(documentation_id=doc.id)
+        vectorstore.remove_chunks(
+            documentation_id=doc.id, connection_id=doc.connection_id
+        )
         if chunks:
             vectorstore.add_chunks(
                 documentation_id=doc.id,
@@ -90,7 +96,7 @@ def _process_and_save_file_doc(
             markdown = file_bins.decode("utf-8")
 
         chunks = _split_text_into_chunks(markdown)
-        token_count = _count_tokens(markdown)
+        token_count = count_tokens(markdown)
         print(
             f"Processed file doc {doc.name} with {token_count} tokens and {len(chunks)} chunks"
         )
@@ -122,7 +128,7 @@ def _process_and_save_file_doc(
                 print(f"Failed to convert PDF {doc.id} to markdown")
                 continue
             chunks = _split_text_into_chunks(markdown)
-            token_count = _count_tokens(markdown)
+            token_count = count_tokens(markdown)
 
             doc.token_count = token_count
             doc.content = markdown
@@ -142,35 +148,108 @@ def _process_and_save_file_doc(
 
 def create_doc_task(connection_id: str):
     task_id = uuid_generator()
-    redis_client.sadd(f"doc_{connection_id}", task_id)
+    key = DOC_TASKS_KEY.format(connection_id=connection_id)
+    pipe = redis_client.pipeline()
+    pipe.sadd(key, task_id)
+    pipe.expire(key, DOC_TASKS_TTL_SECONDS)
+    pipe.execute()
     return task_id
 
 
+def enqueue_after_docs(connection_id: str, queue: Queue, job: Job) -> bool:
+    """
+    Enqueue ``job`` on ``queue`` once no document of the connection is being
+    processed. Returns True if it was enqueued right away; otherwise the last
+    document task to finish enqueues it, or ``release_waiting_jobs`` after
+    ``DOC_WAIT_TIMEOUT_SECONDS`` if a task never reports back.
+    """
+    tasks_key = DOC_TASKS_KEY.format(connection_id=connection_id)
+    waiting_key = DOC_WAITING_JOBS_KEY.format(connection_id=connection_id)
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                # A task finishing between the check and the push retries this
+                pipe.watch(tasks_key)
+                if not pipe.scard(tasks_key):
+                    pipe.unwatch()
+                    queue.enqueue_job(job)
+                    return True
+                job.save()
+                pipe.multi()
+                pipe.rpush(waiting_key, f"{queue.name}:{job.id}")
+                pipe.expire(waiting_key, DOC_TASKS_TTL_SECONDS)
+                pipe.execute()
+                break
+            except WatchError:
+                continue
+    Queue("doc", connection=redis_client).enqueue_in(
+        timedelta(seconds=DOC_WAIT_TIMEOUT_SECONDS),
+        release_waiting_jobs,
+        connection_id,
+    )
+    return False
+
+
+@job("doc", timeout=60, connection=redis_client)
+def release_waiting_jobs(connection_id: str):
+    """Enqueue the jobs parked by ``enqueue_after_docs``"""
+    waiting_key = DOC_WAITING_JOBS_KEY.format(connection_id=connection_id)
+    while entry := redis_client.lpop(waiting_key):
+        queue_name, job_id = entry.decode().split(":", 1)
+        try:
+            job = Job.fetch(job_id, connection=redis_client)
+        except Exception as e:
+            print(f"Waiting job {job_id} is gone: {e}")
+            continue
+        Queue(queue_name, connection=redis_client).enqueue_job(job)
+        print(f"Document processing done, enqueued {job.func_name} ({job_id})")
+
+
+def _finish_doc_task(connection_id: str, task_id: str):
+    key = DOC_TASKS_KEY.format(connection_id=connection_id)
+    pipe = redis_client.pipeline()
+    pipe.srem(key, task_id)
+    pipe.scard(key)
+    _, remaining = pipe.execute()
+    if not remaining:
+        release_waiting_jobs(connection_id)
+
+
 @job("doc", timeout=3600, connection=redis_client)
 def process_document_task(connection_id: str, doc_id: str, type: str, task_id: str):
     db = SessionLocal()
     vectorsore = DocumentationVectorStore()
-    if type == "text":
-        doc = db.query(TextDocumentation).filter(TextDocumentation.id == doc_id).first()
-        if not doc:
-            raise ValueError(f"Text documentation {doc_id} not found")
-
-        _process_and_save_text_doc(
-            db=db,
-            docs=[doc],
-            vectorstore=vectorsore,
-        )
-    else:
-        doc = db.query(FileDocumentation).filter(FileDocumentation.id == doc_id).first()
-        if not doc:
-            raise ValueError(f"File documentation {doc_id} not found")
-        _process_and_save_file_doc(
-            db=db,
-            docs=[doc],
-            vectorstore=vectorsore,
-        )
+    try:
+        if type == "text":
+            doc = (
+                db.query(TextDocumentation)
+                .filter(TextDocumentation.id == doc_id)
+                .first()
+            )
+            if not doc:
+                raise ValueError(f"Text documentation {doc_id} not found")
 
-    redis_client.srem(f"doc_{connection_id}", task_id)
+            _process_and_save_text_doc(
+                db=db,
+                docs=[doc],
+                vectorstore=vectorsore,
+            )
+        else:
+            doc = (
+                db.query(FileDocumentation)
+                .filter(FileDocumentation.id == doc_id)
+                .first()
+            )
+            if not doc:
+                raise ValueError(f"File documentation {doc_id} not found")
+            _process_and_save_file_doc(
+                db=db,
+                docs=[doc],
+                vectorstore=vectorsore,
+            )
+    finally:
+        db.close()
+        _finish_doc_task(connection_id, task_id)
 
 
 @job("doc", timeout=7200, connection=redis_client)
@@ -180,33 +259,34 @@ def process_bulk_docs_task(connection_id: str, doc_tasks: list[dict], task_id: s
     )
     db = SessionLocal()
     vectorsore = DocumentationVectorStore()
+    try:
+        text_ids = []
+        file_ids = []
+        for task in doc_tasks:
+            doc_id = task.get("doc_id")
+            doc_type = task.get("type")
+            if doc_type == "text":
+                text_ids.append(doc_id)
+            elif doc_type == "file":
+                file_ids.append(doc_id)
+            else:
+                print(f"Unknown documentation type for doc_id {doc_id}: {doc_type}")
+
+        text_docs = (
+            db.query(TextDocumentation).filter(TextDocumentation.id.in_(text_ids)).all()
+            if text_ids
+            else []
+        )
 
-    text_ids = []
-    file_ids = []
-    for task in doc_tasks:
-        doc_id = task.get("doc_id")
-        doc_type = task.get("type")
-        if doc_type == "text":
-            text_ids.append(doc_id)
-        elif doc_type == "file":
-            file_ids.append(doc_id)
-        else:
-            print(f"Unknown documentation type for doc_id {doc_id}: {doc_type}")
-
-    text_docs = (
-        db.query(TextDocumentation).filter(TextDocumentation.id.in_(text_ids)).all()
-        if text_ids
-        else []
-    )
-
-    file_docs = (
-        db.query(FileDocumentation).filter(FileDocumentation.id.in_(file_ids)).all()
-        if file_ids
-        else []
-    )
-
-    _process_and_save_text_doc(db=db, docs=text_docs, vectorstore=vectorsore)
-    _process_and_save_file_doc(db=db, docs=file_docs, vectorstore=vectorsore)
-    print("Bulk documentation processing task completed successfully")
+        file_docs = (
+            db.query(FileDocumentation).filter(FileDocumentation.id.in_(file_ids)).all()
+            if file_ids
+            else []
+        )
 
-    redis_client.srem(f"doc_{connection_id}", task_id)
+        _process_and_save_text_doc(db=db, docs=text_docs, vectorstore=vectorsore)
+        _process_and_save_file_doc(db=db, docs=file_docs, vectorstore=vectorsore)
+        print("Bulk documentation processing task completed successfully")
+    finally:
+        db.close()
+        _finish_doc_task(connection_id, task_id)
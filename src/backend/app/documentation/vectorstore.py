@@ -1,14 +1,21 @@
 from langchain_core.documents import Document
 
-from common.vectorstore import create_chroma_vectorstore
+from common.embedding_cache import track_ingest
+from common.vectorstore import get_tenant_vectorstore
 
 import httpx
 
 
 class DocumentationVectorStore:
-    def __init__(self, vector_store=create_chroma_vectorstore()):
+    def __init__(self, vector_store=None):
+        # None routes each connection to its collection (get_tenant_vectorstore)
         self.vector_store = vector_store
 
+    def _store(self, connection_id: str):
+        if self.vector_store is not None:
+            return self.vector_store
+        return get_tenant_vectorstore(connection_id)
+
     def add_chunks(
         self,
         documentation_id: str,
@@ -39,21 +46,27 @@ class DocumentationVectorStore:
             )
 
         if documents:
-            self.vector_store.add_documents(documents)
+            with track_ingest(f"documentation {documentation_id}"):
+                self._store(connection_id).add_documents(documents)
 
-    def remove_chunks(self, documentation_id: str):
+    def remove_chunks(self, documentation_id: str, connection_id: str):
         """Remove all chunks for a given documentation ID."""
-        self.vector_store.delete(
+        self._store(connection_id).delete(
             where={"documentation_id": documentation_id},
         )
 
     def retrieve_similar(
-        self, query: str, documentation_id: str | None = None, k: int = 5
+        self,
+        query: str,
+        connection_id: str,
+        documentation_id: str | None = None,
+        k: int = 5,
     ) -> list[dict]:
         """Retrieve similar document chunks for a query.
 
         Args:
             query: The query string to search for.
+            connection_id: Connection whose documentation is searched.
             documentation_id: Optional documentation ID to filter by.
             where_headers: Optional dict of header key-value pairs to filter by (e.g., {"#": "Introduction", "##": "Subheader"}).
             k: Number of top similar chunks to return.
@@ -62,7 +75,7 @@ class DocumentationVectorStore:
         Returns:
             list of dicts with 'content', 'metadata', and 'similarity' keys.
         """
-        and_conditions = []
+        and_conditions = [{"connection_id": {"$eq": connection_id}}]
 
         if documentation_id:
             and_conditions.append({"documentation_id": {"$eq": documentation_id}})
@@ -76,7 +89,9 @@ class DocumentationVectorStore:
 
         try:
             # The underlying httpx client will forcefully abort if this takes > 5s
-            results = self.vector_store.similarity_search_with_relevance_scores(
+            results = self._store(
+                connection_id
+            ).similarity_search_with_relevance_scores(
                 query=query,
                 k=k,
                 filter=where_filter,
@@ -1,3 +1,4 @@
+from functools import partial
 from typing import Literal, Optional
 from langchain_core.messages import HumanMessage
 from langgraph.graph import StateGraph, START, END
@@ -19,6 +20,7 @@ from .schemas import ProposalOutput, Proposal, ProposalContent, ValidatorOutput
 from app.analysis.agents.schemas import BucketGroup, StoryTag, DefectByLlm
 from common.schemas import StoryMinimal
 from common.configs import LlmConfig
+from common.registry import lazy
 
 from .fake_history import (
     SPLITTER_FAKE_HISTORY,
@@ -47,6 +49,7 @@ _RESOLVER_TYPES = {"CONFLICT", "DUPLICATION"}
 # Agent factory
 # ---------------------------------------------------------------------------
 def _build_agent(
+    name: str,
     system_prompt: str,
     response_schema=ProposalOutput,
     temperature: float = LlmConfig.LLM_DEFECT_TEMPERATURE,
@@ -76,6 +79,7 @@ def _build_agent(
         f"Building {provider} agent with model {model_name} and response schema {response_schema.__name__ if response_schema else 'None'}"
     )
     return DynamicAgent(
+        name=name,
         model_provider=provider,
         model_name=model_name,
         response_mime_type="application/json",
@@ -89,19 +93,60 @@ def _build_agent(
 
 
 # Agents (no tools: response_mime_type="application/json" is incompatible with tool calling)
-splitter_agent = _build_agent(SPLITTER_SYSTEM_PROMPT, temperature=0.1, top_p=0.8)
-refiner_agent = _build_agent(REFINER_SYSTEM_PROMPT, temperature=0.1, top_p=0.8)
-resolver_agent = _build_agent(RESOLVER_SYSTEM_PROMPT, temperature=0.1, top_p=0.8)
+splitter_agent = lazy(
+    "proposal.splitter",
+    partial(
+        _build_agent,
+        "proposal.splitter",
+        SPLITTER_SYSTEM_PROMPT,
+        temperature=0.1,
+        top_p=0.8,
+    ),
+)
+refiner_agent = lazy(
+    "proposal.refiner",
+    partial(
+        _build_agent,
+        "proposal.refiner",
+        REFINER_SYSTEM_PROMPT,
+        temperature=0.1,
+        top_p=0.8,
+    ),
+)
+resolver_agent = lazy(
+    "proposal.resolver",
+    partial(
+        _build_agent,
+        "proposal.resolver",
+        RESOLVER_SYSTEM_PROMPT,
+        temperature=0.1,
+        top_p=0.8,
+    ),
+)
 
-simple_agent = _build_agent(SIMPLE_SYSTEM_PROMPT, temperature=0.1, top_p=0.8)
-validator_agent = _build_agent(
-    VALIDATOR_SYSTEM_PROMPT,
-    response_schema=ValidatorOutput,
-    temperature=0.0,
-    top_p=0.1,
+simple_agent = lazy(
+    "proposal.simple",
+    partial(
+        _build_agent,
+        "proposal.simple",
+        SIMPLE_SYSTEM_PROMPT,
+        temperature=0.1,
+        top_p=0.8,
+    ),
+)
+validator_agent = lazy(
+    "proposal.validator",
+    partial(
+        _build_agent,
+        "proposal.validator",
+        VALIDATOR_SYSTEM_PROMPT,
+        response_schema=ValidatorOutput,
+        temperature=0.0,
+        top_p=0.1,
+    ),
 )
 
-ctx_agent = build_context_gatherer_agent()
+ctx_agent = lazy("proposal.context", build_context_gatherer_agent)
 
 
 def _format_raw_defects(defects: list[DefectForProposal]) -> str:
@@ -858,8 +903,8 @@ def build_complex_graph() -> StateGraph:
     return workflow.compile()
 
 
-_deep_graph = build_deep_graph()
-_complex_graph = build_complex_graph()
+_deep_graph = lazy("proposal.deep_graph", build_deep_graph)
+_complex_graph = lazy("proposal.complex_graph", build_complex_graph)
 
 
 # ---------------------------------------------------------------------------
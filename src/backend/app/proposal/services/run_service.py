@@ -11,6 +11,7 @@ from app.proposal.schemas import (
 )
 from app.documentation.services import DocumentationService
 from app.preference.services import PreferenceService
+from llm.metrics import track_run
 
 from ..agents.graph import run_proposal_generation
 from .data_service import ProposalService
@@ -101,20 +102,21 @@ class ProposalRunService:
         elif preference.gen_proposal_mode:
             run_mode = preference.gen_proposal_mode
 
-        proposals = run_proposal_generation(
-            connection_id=connection_id,
-            project_key=project_key,
-            db=self.db,
-            mode=run_mode,
-            defects=defects,
-            user_stories=user_stories,
-            max_rewrite_attempts=max_rewrite_attempts,
-            extra_instruction=(
-                preference.gen_proposal_guidelines if preference else None
-            ),
-            clarifications=clarifications,
-            project_description=project_description,
-        )
+        with track_run("proposal", session_id):
+            proposals = run_proposal_generation(
+                connection_id=connection_id,
+                project_key=project_key,
+                db=self.db,
+                mode=run_mode,
+                defects=defects,
+                user_stories=user_stories,
+                max_rewrite_attempts=max_rewrite_attempts,
+                extra_instruction=(
+                    preference.gen_proposal_guidelines if preference else None
+                ),
+                clarifications=clarifications,
+                project_description=project_description,
+            )
 
         print(f"Generated {len(proposals)} proposals")
 
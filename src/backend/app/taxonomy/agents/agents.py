@@ -18,11 +18,20 @@ from .prompts import (
     VALIDATOR_SYSTEM_PROMPT,
     SEED_VALIDATOR_SYSTEM_PROMPT,
 )
+from .fake_history import (
+    SEED_FEW_SHOT,
+    EXTENSION_FEW_SHOT,
+    CATEGORIZE_FEW_SHOT,
+    VALIDATE_TAXONOMY_FEW_SHOT,
+    SEED_VALIDATE_FEW_SHOT,
+)
 
 
 def _build_agent(
+    name: str,
     system_prompt: str,
     response_schema: type,
+    static_prefix: list = None,
     provider: Literal["gemini", "openai"] = LlmConfig.LLM_PROVIDER,
 ):
     if provider == "gemini":
@@ -39,6 +48,7 @@ def _build_agent(
     )
 
     return DynamicAgent(
+        name=name,
         model_provider=provider,
         model_name=model_name,
         api_keys=api_keys,
@@ -47,44 +57,56 @@ def _build_agent(
         response_mime_type="application/json",
         response_schema=response_schema,
         top_p=LlmConfig.LLM_TAXONOMY_TOP_P,
+        cache=True,
+        static_prefix=static_prefix,
     )
 
 
 def build_seed_agent():
     """Agent for generating initial taxonomy from the first batch (Pass 0)."""
     return _build_agent(
+        name="taxonomy.seed",
         system_prompt=SEED_SYSTEM_PROMPT,
         response_schema=TaxonomySeedResponse,
+        static_prefix=SEED_FEW_SHOT,
     )
 
 
 def build_extension_agent():
     """Agent for extending taxonomy with subsequent batches or single stories (Pass 1)."""
     return _build_agent(
+        name="taxonomy.extension",
         system_prompt=EXTENSION_SYSTEM_PROMPT,
         response_schema=TaxonomyUpdateResponse,
+        static_prefix=EXTENSION_FEW_SHOT,
     )
 
 
 def build_categorizer_agent():
     """Agent for categorizing stories using the final taxonomy (Pass 2)."""
     return _build_agent(
+        name="taxonomy.categorizer",
         system_prompt=CATEGORIZER_SYSTEM_PROMPT,
         response_schema=TaxonomyCategorizationResponse,
+        static_prefix=CATEGORIZE_FEW_SHOT,
     )
 
 
 def build_validator_agent():
     """Agent for validating proposed taxonomy changes (VALID/INVALID/ADJUSTED)."""
     return _build_agent(
+        name="taxonomy.validator",
         system_prompt=VALIDATOR_SYSTEM_PROMPT,
         response_schema=TaxonomyValidationResponse,
+        static_prefix=VALIDATE_TAXONOMY_FEW_SHOT,
     )
 
 
 def build_seed_validator_agent():
     """Agent for validating the initial seed taxonomy."""
     return _build_agent(
+        name="taxonomy.seed_validator",
         system_prompt=SEED_VALIDATOR_SYSTEM_PROMPT,
         response_schema=SeedValidationResponse,
+        static_prefix=SEED_VALIDATE_FEW_SHOT,
     )
@@ -30,7 +30,12 @@ from langgraph.runtime import Runtime
 from app.analysis.agents.target import state
 from common.schemas import StoryMinimal
 from common.database import get_db
-from app.analysis.agents.utils import format_stories, get_response_as_schema
+from app.analysis.agents.utils import (
+    format_stories,
+    get_response_as_schema,
+    story_tokens,
+)
+from utils.token_packer import chunk_items
 from app.analysis.agents.nodes import build_context_gatherer_agent, run_context_gatherer
 
 from .schemas import (
@@ -58,21 +63,15 @@ from .prompts import (
     VALIDATOR_MESSAGE,
     SEED_VALIDATOR_MESSAGE,
 )
-from .fake_history import (
-    SEED_FEW_SHOT,
-    EXTENSION_FEW_SHOT,
-    CATEGORIZE_FEW_SHOT,
-    VALIDATE_TAXONOMY_FEW_SHOT,
-    SEED_VALIDATE_FEW_SHOT,
-)
 from .state import TaxonomyState, TaxonomyContext
+from common.registry import lazy
 
-context_agent = build_context_gatherer_agent()
-seed_agent = build_seed_agent()
-extension_agent = build_extension_agent()
-categorization_agent = build_categorizer_agent()
-validator_agent = build_validator_agent()
-seed_validator_agent = build_seed_validator_agent()
+context_agent = lazy("taxonomy.context", build_context_gatherer_agent)
+seed_agent = lazy("taxonomy.seed", build_seed_agent)
+extension_agent = lazy("taxonomy.extension", build_extension_agent)
+categorization_agent = lazy("taxonomy.categorizer", build_categorizer_agent)
+validator_agent = lazy("taxonomy.validator", build_validator_agent)
+seed_validator_agent = lazy("taxonomy.seed_validator", build_seed_validator_agent)
 
 MAX_SEED_ITERATIONS = 3
 MAX_EXTENSION_ITERATIONS = 6
@@ -160,10 +159,9 @@ def seed_selector_node(state: TaxonomyState, runtime: Runtime[TaxonomyContext]):
     seed_keys = {s.key for s in seed}
     remaining_stories = [s for s in stories if s.key not in seed_keys]
 
-    extension_batches = [
-        remaining_stories[i : i + batch_size]
-        for i in range(0, len(remaining_stories), batch_size)
-    ]
+    extension_batches = chunk_items(
+        remaining_stories, batch_size, ctx.extension_batch_token_budget, story_tokens
+    )
 
     print(f"| Seed: {len(seed)} stories, Extensions: {len(extension_batches)} batches")
     return {
@@ -188,7 +186,7 @@ def seed_extraction_node(state: TaxonomyState):
         stories=stories_text,
         errors=error_text,
     )
-    messages = SEED_FEW_SHOT + [HumanMessage(content=msg)]
+    messages = [HumanMessage(content=msg)]
     response = seed_agent.invoke(messages)
 
     output: TaxonomySeedResponse = get_response_as_schema(
@@ -230,7 +228,7 @@ def seed_validation_node(state: TaxonomyState):
         proposed_taxonomy=proposed_text,
         stories=stories_text,
     )
-    messages = SEED_VALIDATE_FEW_SHOT + [HumanMessage(content=msg)]
+    messages = [HumanMessage(content=msg)]
     response = seed_validator_agent.invoke(messages)
 
     output: SeedValidationResponse = get_response_as_schema(
@@ -323,7 +321,7 @@ def extension_extraction_node(state: TaxonomyState):
             stories=stories_text,
             errors=error_text,
         )
-        msg_lists.append(EXTENSION_FEW_SHOT + [HumanMessage(content=msg)])
+        msg_lists.append([HumanMessage(content=msg)])
 
     # Run all concurrently
     print(f"| Sending {len(msg_lists)} batches to extension agent")
@@ -391,7 +389,7 @@ def extension_validation_node(state: TaxonomyState):
             proposed_updates=draft_text,
             stories=stories_text,
         )
-        msg_lists.append(VALIDATE_TAXONOMY_FEW_SHOT + [HumanMessage(content=msg)])
+        msg_lists.append([HumanMessage(content=msg)])
         actual_indices_to_check.append(idx)
 
     responses = validator_agent.batch(msg_lists)
@@ -471,10 +469,12 @@ def categorize_node(state: TaxonomyState, runtime: Runtime[TaxonomyContext]):
     all_categorizations: dict[str, StoryCategorization] = {}
 
     for attempt in range(1 + MAX_CATEGORIZE_RETRIES):
-        story_batches = [
-            stories_to_categorize[i : i + batch_size]
-            for i in range(0, len(stories_to_categorize), batch_size)
-        ]
+        story_batches = chunk_items(
+            stories_to_categorize,
+            batch_size,
+            runtime.context.extension_batch_token_budget,
+            story_tokens,
+        )
 
         label = "categorizing" if attempt == 0 else f"retry {attempt}"
         print(
@@ -495,7 +495,7 @@ def categorize_node(state: TaxonomyState, runtime: Runtime[TaxonomyContext]):
                 stories=stories_text,
                 errors=error_text,
             )
-            msg_lists.append(CATEGORIZE_FEW_SHOT + [HumanMessage(content=msg)])
+            msg_lists.append([HumanMessage(content=msg)])
 
         responses = categorization_agent.batch(msg_lists)
 
@@ -547,9 +547,9 @@ def update_setup_node(state: TaxonomyState, runtime: Runtime[TaxonomyContext]):
     batch_size = ctx.extension_batch_size
     stories = ctx.user_stories
 
-    extension_batches = [
-        stories[i : i + batch_size] for i in range(0, len(stories), batch_size)
-    ]
+    extension_batches = chunk_items(
+        stories, batch_size, ctx.extension_batch_token_budget, story_tokens
+    )
 
     return {
         "all_stories": stories,
@@ -596,7 +596,7 @@ def build_taxonomy_graph():
     return builder.compile()
 
 
-taxonomy_graph = build_taxonomy_graph()
+taxonomy_graph = lazy("taxonomy.graph", build_taxonomy_graph)
 
 
 def run_taxonomy_graph(
@@ -2,6 +2,7 @@ from typing import Literal, Optional
 from typing_extensions import TypedDict
 from common.schemas import StoryMinimal
 from common.agents.schemas import LlmContext
+from common.configs import LlmConfig
 
 from .schemas import NewBucket, StoryCategorization, TaxonomyDraft
 
@@ -41,4 +42,5 @@ class TaxonomyContext(LlmContext):
     seed_size: int = 50
     seed_hybrid_first_pct: float = 0.6
     extension_batch_size: int = 20
+    extension_batch_token_budget: int = LlmConfig.LLM_BATCH_TOKEN_BUDGET
     extra_instruction: Optional[str] = None
@@ -3,6 +3,7 @@
 from sqlalchemy.orm import Session
 
 from common.schemas import StoryMinimal
+from llm.metrics import track_run
 
 from ..agents.schemas import NewBucket, StoryCategorization
 from ..agents.graph import run_taxonomy_graph
@@ -47,17 +48,18 @@ class TaxonomyService:
             f"Existing buckets dropped for project {project_key}. Starting fresh initialization."
         )
 
-        buckets, categorizations = run_taxonomy_graph(
-            user_stories=stories,
-            current_taxonomy=[],
-            project_description=project_description,
-            connection_id=connection_id,
-            project_key=project_key,
-            is_update=False,
-            seed_strategy=seed_strategy,
-            seed_size=seed_size,
-            extension_batch_size=extension_batch_size,
-        )
+        with track_run("taxonomy", f"{connection_id}:{project_key}"):
+            buckets, categorizations = run_taxonomy_graph(
+                user_stories=stories,
+                current_taxonomy=[],
+                project_description=project_description,
+                connection_id=connection_id,
+                project_key=project_key,
+                is_update=False,
+                seed_strategy=seed_strategy,
+                seed_size=seed_size,
+                extension_batch_size=extension_batch_size,
+            )
 
         self._persist_state(connection_id, project_key, buckets, categorizations)
 
@@ -81,15 +83,16 @@ class TaxonomyService:
             NewBucket(name=b.tag, description=b.description or "") for b in db_buckets
         ]
 
-        all_bucket, categorizations = run_taxonomy_graph(
-            user_stories=stories,
-            current_taxonomy=current_taxonomy,
-            project_description=project_description,
-            connection_id=connection_id,
-            project_key=project_key,
-            is_update=True,
-            extension_batch_size=extension_batch_size,
-        )
+        with track_run("taxonomy", f"{connection_id}:{project_key}"):
+            all_bucket, categorizations = run_taxonomy_graph(
+                user_stories=stories,
+                current_taxonomy=current_taxonomy,
+                project_description=project_description,
+                connection_id=connection_id,
+                project_key=project_key,
+                is_update=True,
+                extension_batch_size=extension_batch_size,
+            )
 
         self._persist_state(connection_id, project_key, all_bucket, categorizations)
 
@@ -4,7 +4,10 @@ from graphrag_llm.completion.completion_factory import (
 )
 from graphrag_llm.embedding.embedding_factory import create_embedding
 from graphrag_llm.config import ModelConfig, TokenizerConfig
-from common.configs import GraphRAGConfig
+from common.configs import GraphRAGConfig, VectorStoreConfig
+from common.local_embeddings import get_local_embeddings
+from common.registry import lazy
+from .local_embedding import LocalTextEmbedder
 
 
 COMMUNITY_TABLE = "communities"
@@ -16,24 +19,43 @@ DOCUMENT_TABLE = "documents"
 COMMUNITY_LEVEL = 2
 
 
-tokenizer = create_tokenizer(
-    TokenizerConfig(model_id=GraphRAGConfig.TOKENIZER_MODEL_ID)
-)
+def _build_tokenizer():
+    return create_tokenizer(
+        TokenizerConfig(model_id=GraphRAGConfig.TOKENIZER_MODEL_ID)
+    )
+
 
-chat_model = create_completion(
-    model_config=ModelConfig(
-        api_key=GraphRAGConfig.MODEL_API_KEY,
-        model_provider=GraphRAGConfig.MODEL_PROVIDER,
-        # model="gemma-4-31b-it",
-        model=GraphRAGConfig.CHAT_MODEL,
+def _build_chat_model():
+    return create_completion(
+        model_config=ModelConfig(
+            api_key=GraphRAGConfig.MODEL_API_KEY,
+            model_provider=GraphRAGConfig.MODEL_PROVIDER,
+            # model="gemma-4-31b-it",
+            model=GraphRAGConfig.CHAT_MODEL,
+        )
     )
-)
 
 
-text_embedder = create_embedding(
-    model_config=ModelConfig(
-        api_key=GraphRAGConfig.MODEL_API_KEY,
-        model_provider=GraphRAGConfig.MODEL_PROVIDER,
-        model=GraphRAGConfig.EMBEDDING_MODEL,
+def _build_text_embedder():
+    if GraphRAGConfig.EMBEDDING_PROVIDER == "local":
+        return LocalTextEmbedder(
+            get_local_embeddings(
+                VectorStoreConfig.EMBEDDING_LOCAL_MODEL,
+                VectorStoreConfig.EMBEDDING_LOCAL_BATCH_SIZE,
+            )
+        )
+    return create_embedding(
+        model_config=ModelConfig(
+            api_key=GraphRAGConfig.MODEL_API_KEY,
+            model_provider=GraphRAGConfig.MODEL_PROVIDER,
+            model=GraphRAGConfig.EMBEDDING_MODEL,
+        )
     )
-)
+
+
+# Built on first use: most processes importing this module never call GraphRAG
+tokenizer = lazy("xgraphrag.tokenizer", _build_tokenizer)
+
+chat_model = lazy("xgraphrag.chat_model", _build_chat_model)
+
+text_embedder = lazy("xgraphrag.text_embedder", _build_text_embedder)
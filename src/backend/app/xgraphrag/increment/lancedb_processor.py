@@ -49,16 +49,17 @@ class LanceDBProcessor:
         df = self._enrich_dates(df.copy())
 
         # MOCK EMBEDDING: Generate vectors using the active model
-        # Typically requires an embedding step, returning List[float] length 3072
-        # If using text-embedding-3-small, dim depends on choice, 3072 for text-embedding-3-large maybe
+        # The width depends on the model: 3072 for gemini-embedding-001, 384
+        # for the default local model
         print(f"Creating embeddings for {len(df)} records for {table_name}...")
         df["vector"] = df[text_column].apply(lambda x: self._embed(str(x)))
+        dimensions = len(df["vector"].iloc[0])
 
         # Ensure only compatible columns are saved
         schema = pa.schema(
             [
                 pa.field("id", pa.string()),
-                pa.field("vector", pa.list_(pa.float32(), 3072)),
+                pa.field("vector", pa.list_(pa.float32(), dimensions)),
                 pa.field("create_date", pa.string()),
                 pa.field("update_date", pa.string()),
                 pa.field("create_date_year", pa.int64()),
@@ -1,8 +1,10 @@
 import json
+from functools import partial
 from typing import Optional, List, Dict
 from pydantic import BaseModel, Field
 from llm.gemini_dynamic_agent import GenimiDynamicAgent
 from common.configs import LlmConfig
+from common.registry import lazy
 from langchain_core.messages import HumanMessage
 from ..logger import Logger
 
@@ -56,14 +58,18 @@ class BatchResponseSchema(BaseModel):
     )
 
 
-llm = GenimiDynamicAgent(
-    system_prompt=system_prompt,
-    model_name=LlmConfig.GEMINI_CHAT_MODEL,
-    temperature=0.0,  # Dropped to 0.0 for maximum consistency on batched arrays
-    api_keys=LlmConfig.GEMINI_API_KEYS,
-    max_retries=LlmConfig.GEMINI_API_MAX_RETRY,
-    response_mime_type="application/json",
-    response_schema=BatchResponseSchema,
+llm = lazy(
+    "xgraphrag.judge",
+    partial(
+        GenimiDynamicAgent,
+        system_prompt=system_prompt,
+        model_name=LlmConfig.GEMINI_CHAT_MODEL,
+        temperature=0.0,  # Dropped to 0.0 for maximum consistency on batched arrays
+        api_keys=LlmConfig.GEMINI_API_KEYS,
+        max_retries=LlmConfig.GEMINI_API_MAX_RETRY,
+        response_mime_type="application/json",
+        response_schema=BatchResponseSchema,
+    ),
 )
 
 
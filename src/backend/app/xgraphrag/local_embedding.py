@@ -0,0 +1,47 @@
+"""``text_embedder`` backed by :class:`common.local_embeddings.LocalEmbeddings`.
+
+GraphRAG search and the LanceDB increments only call ``embedding`` /
+``embedding_async`` with an ``input`` text or list of texts and read the
+vectors off the response, so this adapter implements that part of the
+``graphrag_llm`` embedding client.
+"""
+
+import asyncio
+from dataclasses import dataclass
+
+from common.local_embeddings import LocalEmbeddings
+
+
+@dataclass
+class LocalEmbeddingResponse:
+    embeddings: list[list[float]]
+    model: str
+
+    @property
+    def first_embedding(self) -> list[float]:
+        return self.embeddings[0]
+
+    @property
+    def data(self) -> list[dict]:
+        # The shape of LiteLLM/OpenAI embedding responses
+        return [
+            {"object": "embedding", "index": index, "embedding": embedding}
+            for index, embedding in enumerate(self.embeddings)
+        ]
+
+
+class LocalTextEmbedder:
+    def __init__(self, embeddings: LocalEmbeddings):
+        self.embeddings = embeddings
+
+    def embedding(self, input: str | list[str], **kwargs) -> LocalEmbeddingResponse:
+        texts = [input] if isinstance(input, str) else list(input)
+        return LocalEmbeddingResponse(
+            embeddings=self.embeddings.embed_documents(texts),
+            model=self.embeddings.model_name,
+        )
+
+    async def embedding_async(
+        self, input: str | list[str], **kwargs
+    ) -> LocalEmbeddingResponse:
+        return await asyncio.to_thread(self.embedding, input, **kwargs)
@@ -0,0 +1,110 @@
+"""Embedding throughput and query latency of the local CPU model vs OpenAI.
+
+Embeds the story texts of ``data/`` the way ``JiraVectorStore`` writes them,
+in batches like a sync flush, then times single query embeddings like the
+story-search tool. The embedding cache is bypassed so every text is computed.
+
+The local model is downloaded on first use and then runs offline. OpenAI is
+only measured when ``OPENAI_API_KEYS`` is set.
+
+Usage (from src/backend):
+    python benchmarks/embedding_throughput.py
+    python benchmarks/embedding_throughput.py --providers local openai --model BAAI/bge-small-en-v1.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from common.local_embeddings import DEFAULT_MODEL, LocalEmbeddings  # noqa: E402
+
+DATA_PATHS = [
+    os.path.join(BACKEND_DIR, "data", "sample_100_us.json"),
+    os.path.join(BACKEND_DIR, "data", "IntelligenceBank", "500_us.json"),
+]
+
+
+def load_texts() -> list[str]:
+    texts = []
+    for path in DATA_PATHS:
+        with open(path, "r", encoding="utf-8") as f:
+            for story in json.load(f):
+                texts.append(
+                    f"Summary: {story['user_story']}\n"
+                    f"Description: {story.get('requirements') or ''}"
+                )
+    return texts
+
+
+def create_embeddings(provider: str, model: str, batch_size: int):
+    if provider == "local":
+        return LocalEmbeddings(model, batch_size)
+    from langchain_openai import OpenAIEmbeddings
+
+    from common.configs import LlmConfig
+
+    if not LlmConfig.OPENAI_API_KEYS or not LlmConfig.OPENAI_API_KEYS[0]:
+        return None
+    return OpenAIEmbeddings(
+        model="text-embedding-3-small",
+        openai_api_key=LlmConfig.OPENAI_API_KEYS[0],
+        dimensions=1024,
+    )
+
+
+def bench(provider: str, embeddings, texts: list[str], batch_size: int, queries: int):
+    started = time.perf_counter()
+    dimensions = len(embeddings.embed_query("warm up"))
+    print(
+        f"{provider:>7} first call: {time.perf_counter() - started:7.2f}s "
+        f"({dimensions} dimensions, includes loading a local model)"
+    )
+
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        embeddings.embed_documents(texts[start : start + batch_size])
+    elapsed = time.perf_counter() - started
+    print(
+        f"{provider:>7} documents:  {len(texts) / elapsed:9.1f} texts/s "
+        f"({len(texts)} texts in batches of {batch_size})"
+    )
+
+    latencies = []
+    for text in texts[:queries]:
+        started = time.perf_counter()
+        embeddings.embed_query(text.splitlines()[0])
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    print(
+        f"{provider:>7} query:      p50 {statistics.median(latencies):7.2f} ms  "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--providers", nargs="+", choices=["local", "openai"], default=["local"]
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    texts = load_texts()
+    for provider in args.providers:
+        embeddings = create_embeddings(provider, args.model, args.batch_size)
+        if embeddings is None:
+            print(f"{provider:>7}: skipped, OPENAI_API_KEYS is not set")
+            continue
+        bench(provider, embeddings, texts, args.batch_size, args.queries)
+
+
+if __name__ == "__main__":
+    main()
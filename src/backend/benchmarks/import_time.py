@@ -0,0 +1,130 @@
+"""Measure the start-up cost of the backend modules.
+
+Each module is imported in a fresh interpreter (as an RQ worker or an API
+reload would) with ``-X importtime``. The script reports the wall time, the
+cumulative import time and the slowest dependencies, and with ``--build`` also
+the cost of building the lazily registered agents and graphs on first use.
+
+Usage (from src/backend):
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules app.taxonomy.agents.graph --build
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "app",
+    "app.analysis.agents.all",
+    "app.analysis.agents.target",
+    "app.taxonomy.agents.graph",
+    "app.chat.agents.agent",
+    "app.proposal.agents.graph",
+    "app.ac.agents.graph",
+    "app.xgraphrag.defines",
+]
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter() - started
+from common.registry import registry
+built_at_import = [n for n, s in registry.stats().items() if s["built"]]
+build_seconds = None
+if {build}:
+    started = time.perf_counter()
+    registry.warm_up()
+    build_seconds = time.perf_counter() - started
+print("@@" + json.dumps({{
+    "import_seconds": imported,
+    "registered": len(registry.stats()),
+    "built_at_import": built_at_import,
+    "build_seconds": build_seconds,
+}}))
+"""
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Return ``(module, self_us, cumulative_us)`` rows of ``-X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module: str, build: bool) -> dict:
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            _PROBE.format(module=module, build=build),
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "PYTHONPATH": BACKEND_DIR},
+        capture_output=True,
+        text=True,
+    )
+    result_line = next(
+        (line for line in completed.stdout.splitlines() if line.startswith("@@")),
+        None,
+    )
+    if result_line is None:
+        error = completed.stderr.strip().splitlines()
+        return {"module": module, "error": error[-1] if error else "unknown error"}
+
+    result = json.loads(result_line[2:])
+    rows = _parse_importtime(completed.stderr)
+    result["module"] = module
+    result["slowest"] = sorted(rows, key=lambda row: row[1], reverse=True)[:5]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--build",
+        action="store_true",
+        help="Also time building every registered agent and graph",
+    )
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [measure(module, args.build) for _ in range(args.repeat)]
+        if "error" in runs[0]:
+            print(f"{module}: failed to import ({runs[0]['error']})")
+            continue
+
+        import_seconds = statistics.median(run["import_seconds"] for run in runs)
+        last = runs[-1]
+        print(
+            f"{module}: {import_seconds * 1000:.0f} ms import (median of {args.repeat}), "
+            f"{last['registered']} lazy objects registered, "
+            f"{len(last['built_at_import'])} built at import"
+        )
+        if args.build:
+            build_seconds = statistics.median(run["build_seconds"] for run in runs)
+            print(
+                f"    first-use build of all registered objects: {build_seconds * 1000:.0f} ms"
+            )
+        for name, self_us, cumulative_us in last["slowest"]:
+            print(
+                f"    {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative  {name}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Conformance corpus and throughput benchmark for the Markdown <-> ADF engines.
+
+The corpus is built from the user stories in ``data/`` (requirements as the
+description, scenarios as the Gherkin code block the AC service writes) plus
+Jira-shaped ADF documents with mentions, links, tables and panels, and
+Markdown edge cases: nested emphasis, images, escapes and task lists.
+
+``record`` stores the Node bridge output for every case, and ``check``
+compares the in-process engine against it. The Markdown the engine produces
+must also convert back to itself. A case without a recording fails the check:
+``JIRA_ADF_ENGINE=python`` is only safe once every case matches the bridge.
+
+Usage (from src/backend):
+    python benchmarks/markdown_adf.py corpus
+    python benchmarks/markdown_adf.py record      # needs node + npm packages
+    python benchmarks/markdown_adf.py check
+    python benchmarks/markdown_adf.py bench --engines python node
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from utils.markdown_adf_bridge import markdown_adf_bridge as bridge  # noqa: E402
+
+CORPUS_PATH = os.path.join(
+    BACKEND_DIR, "utils", "markdown_adf_bridge", "conformance_corpus.json"
+)
+SAMPLES = [
+    ("sample_100", os.path.join(BACKEND_DIR, "data", "sample_100_us.json")),
+    ("ib_500", os.path.join(BACKEND_DIR, "data", "IntelligenceBank", "500_us.json")),
+]
+
+
+def _text(text, *marks):
+    node = {"type": "text", "text": text}
+    if marks:
+        node["marks"] = list(marks)
+    return node
+
+
+def _paragraph(*content):
+    return {"type": "paragraph", "content": list(content)}
+
+
+def _doc(*content):
+    return {"version": 1, "type": "doc", "content": list(content)}
+
+
+# Node types Jira returns that Markdown written by the app never produces
+JIRA_ADF_CASES = {
+    "jira_marks_and_links": _doc(
+        _paragraph(
+            _text("Owner: "),
+            {
+                "type": "mention",
+                "attrs": {"id": "5b10a2844c20165700ede21g", "text": "@Alex"},
+            },
+            _text(" see "),
+            _text(
+                "the spec",
+                {"type": "link", "attrs": {"href": "https://example.com/spec"}},
+            ),
+            _text(", "),
+            _text("bold", {"type": "strong"}),
+            _text(" / "),
+            _text("italic", {"type": "em"}),
+            _text(" / "),
+            _text("gone", {"type": "strike"}),
+            _text(" / "),
+            _text("fn()", {"type": "code"}),
+            {"type": "hardBreak"},
+            _text("Ticket "),
+            {
+                "type": "inlineCard",
+                "attrs": {"url": "https://example.atlassian.net/browse/IB-12"},
+            },
+            _text(" "),
+            {"type": "emoji", "attrs": {"shortName": ":warning:", "text": "⚠️"}},
+        )
+    ),
+    "jira_nested_lists": _doc(
+        {"type": "heading", "attrs": {"level": 3}, "content": [_text("Acceptance")]},
+        {
+            "type": "orderedList",
+            "attrs": {"order": 1},
+            "content": [
+                {
+                    "type": "listItem",
+                    "content": [
+                        _paragraph(_text("Upload a file")),
+                        {
+                            "type": "bulletList",
+                            "content": [
+                                {
+                                    "type": "listItem",
+                                    "content": [_paragraph(_text("GIF"))],
+                                },
+                                {
+                                    "type": "listItem",
+                                    "content": [_paragraph(_text("Lottie"))],
+                                },
+                            ],
+                        },
+                    ],
+                },
+                {"type": "listItem", "content": [_paragraph(_text("Preview it"))]},
+            ],
+        },
+    ),
+    "jira_table_panel_rule": _doc(
+        {
+            "type": "panel",
+            "attrs": {"panelType": "info"},
+            "content": [_paragraph(_text("Behind the Azure feature flag"))],
+        },
+        {"type": "rule"},
+        {
+            "type": "table",
+            "attrs": {"isNumberColumnEnabled": False, "layout": "default"},
+            "content": [
+                {
+                    "type": "tableRow",
+                    "content": [
+                        {
+                            "type": "tableHeader",
+                            "attrs": {},
+                            "content": [_paragraph(_text("Setting"))],
+                        },
+                        {
+                            "type": "tableHeader",
+                            "attrs": {},
+                            "content": [_paragraph(_text("Default"))],
+                        },
+                    ],
+                },
+                {
+                    "type": "tableRow",
+                    "content": [
+                        {
+                            "type": "tableCell",
+                            "attrs": {},
+                            "content": [_paragraph(_text("Enable Image Tagging"))],
+                        },
+                        {
+                            "type": "tableCell",
+                            "attrs": {},
+                            "content": [
+                                _paragraph(_text("off | on", {"type": "code"}))
+                            ],
+                        },
+                    ],
+                },
+            ],
+        },
+        {
+            "type": "codeBlock",
+            "attrs": {"language": "gherkin"},
+            "content": [
+                _text(
+                    "Scenario: Tagging\n  Given tagging is enabled\n  Then images are tagged"
+                )
+            ],
+        },
+    ),
+    "jira_literal_markdown_characters": _doc(
+        _paragraph(
+            _text("*not em* and _not em_ in snake_case, "),
+            _text("2 * 3", {"type": "strong"}),
+            _text(" and C:\\temp\\*.log"),
+        )
+    ),
+    "jira_task_list_and_image": _doc(
+        {
+            "type": "taskList",
+            "attrs": {"localId": "task-list-1"},
+            "content": [
+                {
+                    "type": "taskItem",
+                    "attrs": {"localId": "task-1", "state": "DONE"},
+                    "content": [_text("Design reviewed")],
+                },
+                {
+                    "type": "taskItem",
+                    "attrs": {"localId": "task-2", "state": "TODO"},
+                    "content": [_text("Copy signed off")],
+                },
+            ],
+        },
+        {
+            "type": "mediaSingle",
+            "attrs": {"layout": "center"},
+            "content": [
+                {
+                    "type": "media",
+                    "attrs": {
+                        "type": "external",
+                        "url": "https://example.com/mockup.png",
+                        "alt": "Mockup",
+                    },
+                }
+            ],
+        },
+    ),
+}
+
+# Markdown constructs the AC and defect agents write that stories rarely contain
+MARKDOWN_CASES = {
+    "md_nested_emphasis": "Uploads are ***always*** scanned, **bold *and em***.",
+    "md_images": "![Mockup](https://example.com/mockup.png)\n\n"
+    "Inline ![icon](https://example.com/icon.png) in text",
+    "md_escaped_emphasis": "\\*not em\\* and \\_not em\\_ next to snake_case",
+    "md_task_list": "- [x] Design reviewed\n- [ ] Copy signed off\n"
+    "  - [ ] Legal copy\n- [ ] Release notes",
+}
+
+
+def build_corpus(per_sample: int) -> list[dict]:
+    cases = []
+    for prefix, path in SAMPLES:
+        with open(path, "r", encoding="utf-8") as f:
+            stories = json.load(f)
+        for story in stories[:per_sample]:
+            if story.get("requirements"):
+                cases.append(
+                    {
+                        "name": f"{prefix}_{story['id']}_requirements",
+                        "markdown": story["requirements"],
+                    }
+                )
+            if story.get("scenarios"):
+                cases.append(
+                    {
+                        "name": f"{prefix}_{story['id']}_gherkin",
+                        "markdown": f"```gherkin\n{story['scenarios']}\n```",
+                    }
+                )
+    for name, markdown in MARKDOWN_CASES.items():
+        cases.append({"name": name, "markdown": markdown})
+    for name, adf in JIRA_ADF_CASES.items():
+        cases.append({"name": name, "adf": adf})
+    # ADF inputs of the Markdown cases, in the shape Jira stores descriptions
+    for case in cases:
+        if "adf" not in case:
+            case["adf"] = bridge.md_to_adf(case["markdown"], engine="python")
+    return cases
+
+
+def load_corpus() -> list[dict]:
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_corpus(cases: list[dict]):
+    with open(CORPUS_PATH, "w", encoding="utf-8") as f:
+        json.dump(cases, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+
+
+def record(cases: list[dict]):
+    for case in cases:
+        expected = {"adf_to_md": bridge.node_adf_to_md(case["adf"])}
+        if "markdown" in case:
+            expected["md_to_adf"] = bridge.node_md_to_adf(case["markdown"])
+        case["expected"] = expected
+
+
+def _without_local_ids(node):
+    # Task lists get random localIds on every conversion
+    if isinstance(node, list):
+        return [_without_local_ids(child) for child in node]
+    if isinstance(node, dict):
+        return {
+            key: _without_local_ids(value)
+            for key, value in node.items()
+            if key != "localId"
+        }
+    return node
+
+
+def check(cases: list[dict]) -> int:
+    failures = 0
+    recorded = 0
+    for case in cases:
+        expected = case.get("expected")
+        problems = []
+        markdown = bridge.adf_to_md(case["adf"], engine="python")
+        if not expected:
+            problems.append("no recorded Node output, run `record`")
+        else:
+            recorded += 1
+            if markdown.strip() != expected["adf_to_md"].strip():
+                problems.append("adf_to_md differs from the Node bridge")
+            if "md_to_adf" in expected and _without_local_ids(
+                bridge.md_to_adf(case["markdown"], engine="python")
+            ) != _without_local_ids(expected["md_to_adf"]):
+                problems.append("md_to_adf differs from the Node bridge")
+        again = bridge.adf_to_md(
+            bridge.md_to_adf(markdown, engine="python"), engine="python"
+        )
+        if again != markdown:
+            problems.append("Markdown does not round-trip")
+        if problems:
+            failures += 1
+            print(f"FAIL {case['name']}: {'; '.join(problems)}")
+    print(
+        f"{len(cases) - failures}/{len(cases)} cases pass "
+        f"({recorded} with recorded Node output)"
+    )
+    return failures
+
+
+def bench(cases: list[dict], engines: list[str], repeat: int):
+    markdowns = [case["markdown"] for case in cases if "markdown" in case]
+    adfs = [case["adf"] for case in cases]
+    for engine in engines:
+        if engine == "node" and not bridge.NODE_MODULES.exists():
+            print("  node: skipped, run `npm i` in utils/markdown_adf_bridge first")
+            continue
+        for direction, inputs, convert in (
+            ("md_to_adf", markdowns, lambda x: bridge.md_to_adf(x, engine=engine)),
+            ("adf_to_md", adfs, lambda x: bridge.adf_to_md(x, engine=engine)),
+        ):
+            # The Node bridge costs a process per call; a few docs are enough
+            runs = repeat if engine == "python" else 1
+            docs = inputs if engine == "python" else inputs[:20]
+            started = time.perf_counter()
+            for _ in range(runs):
+                for doc in docs:
+                    convert(doc)
+            elapsed = time.perf_counter() - started
+            conversions = runs * len(docs)
+            print(
+                f"{engine:>6} {direction}: {conversions / elapsed:10.1f} docs/s "
+                f"({elapsed / conversions * 1000:.3f} ms per doc, {conversions} docs)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["corpus", "record", "check", "bench"])
+    parser.add_argument("--per-sample", type=int, default=20)
+    parser.add_argument("--engines", nargs="+", default=["python", "node"])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "corpus":
+        cases = build_corpus(args.per_sample)
+        save_corpus(cases)
+        print(f"Wrote {len(cases)} cases to {CORPUS_PATH}")
+    elif args.command == "record":
+        cases = load_corpus()
+        record(cases)
+        save_corpus(cases)
+        print(f"Recorded Node bridge output for {len(cases)} cases")
+    elif args.command == "check":
+        sys.exit(1 if check(load_corpus()) else 0)
+    else:
+        bench(load_corpus(), args.engines, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
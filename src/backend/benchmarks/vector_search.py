@@ -0,0 +1,184 @@
+"""Query latency of the vector store backends and collection layouts.
+
+The user stories of ``data/`` are stored as story documents of ``--tenants``
+connections (one Jira project each, the texts repeated per tenant), embedded
+with a deterministic hash embedding so no embedding API is called. Every query
+is filtered to one tenant, like ``search_stories_by_keywords``, and must find
+the story it was built from.
+
+Each tenant count runs with one shared collection and with a collection per
+connection (``VECTORSTORE_PARTITIONING``). With a shared collection, latency
+grows with the total number of documents; per connection, it should stay
+flat.
+
+The local index runs in a temporary directory and needs no service. Pass
+``--chroma-host`` to run the same workload against a Chroma server, on
+scratch collections that are deleted afterwards.
+
+Usage (from src/backend):
+    python benchmarks/vector_search.py
+    python benchmarks/vector_search.py --tenants 1 10 50 --chroma-host localhost
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+from common.local_vectorstore import LocalVectorStore  # noqa: E402
+
+DATA_PATHS = [
+    os.path.join(BACKEND_DIR, "data", "sample_100_us.json"),
+    os.path.join(BACKEND_DIR, "data", "IntelligenceBank", "500_us.json"),
+]
+COLLECTION_NAME = "benchmark_vector_search"
+
+
+def load_documents(tenants: int) -> list[Document]:
+    """Story documents shaped like the ones ``JiraVectorStore`` writes"""
+    stories = []
+    for path in DATA_PATHS:
+        with open(path, "r", encoding="utf-8") as f:
+            stories += json.load(f)
+    documents = []
+    for tenant in range(tenants):
+        for n, story in enumerate(stories):
+            documents.append(
+                Document(
+                    id=f"tenant{tenant}-{n}",
+                    page_content=f"Summary: {story['user_story']}\n"
+                    f"Description: {story.get('requirements') or ''}",
+                    metadata={
+                        "key": f"T{tenant}-{n}",
+                        "connection_id": f"connection-{tenant}",
+                        "project_key": f"T{tenant}",
+                    },
+                )
+            )
+    return documents
+
+
+def bench(name: str, store_for, documents: list[Document], queries: int, k: int):
+    """``store_for`` maps a connection ID to the store holding its documents"""
+    by_connection: dict[str, list[Document]] = {}
+    for doc in documents:
+        by_connection.setdefault(doc.metadata["connection_id"], []).append(doc)
+    started = time.perf_counter()
+    for connection_id, docs in by_connection.items():
+        store = store_for(connection_id)
+        for start in range(0, len(docs), 256):
+            store.add_documents(docs[start : start + 256])
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:>24} ingest: {len(documents) / elapsed:9.0f} docs/s "
+        f"({len(documents)} docs)"
+    )
+
+    rng = random.Random(0)
+    latencies = []
+    found = 0
+    for _ in range(queries):
+        doc = rng.choice(documents)
+        where = {
+            "$and": [
+                {"connection_id": doc.metadata["connection_id"]},
+                {"project_key": doc.metadata["project_key"]},
+            ]
+        }
+        store = store_for(doc.metadata["connection_id"])
+        started = time.perf_counter()
+        results = store._similarity_search_with_relevance_scores(
+            doc.page_content, k=k, filter=where
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        found += any(result.id == doc.id for result, _ in results)
+    latencies.sort()
+    print(
+        f"{name:>24} query:  p50 {statistics.median(latencies):7.2f} ms  "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms  "
+        f"self-match {found}/{queries}"
+    )
+
+
+def partitioned(create_store):
+    """One store per connection, like ``VECTORSTORE_PARTITIONING=connection``"""
+    stores = {}
+
+    def store_for(connection_id: str):
+        if connection_id not in stores:
+            stores[connection_id] = create_store(f"{COLLECTION_NAME}_{connection_id}")
+        return stores[connection_id]
+
+    return store_for, stores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 10, 40])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--chroma-host")
+    parser.add_argument("--chroma-port", type=int, default=8000)
+    args = parser.parse_args()
+
+    embeddings = DeterministicFakeEmbedding(size=args.dimensions)
+    client = None
+    if args.chroma_host:
+        import chromadb
+        from langchain_chroma import Chroma
+
+        client = chromadb.HttpClient(host=args.chroma_host, port=args.chroma_port)
+
+        def create_chroma(collection_name: str):
+            return Chroma(
+                client=client,
+                collection_name=collection_name,
+                embedding_function=embeddings,
+            )
+
+    for tenants in args.tenants:
+        documents = load_documents(tenants)
+        print(f"{len(documents)} documents in {tenants} tenants")
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            def create_local(collection_name: str):
+                return LocalVectorStore(collection_name, embeddings, directory)
+
+            shared = create_local(COLLECTION_NAME)
+            bench("local shared", lambda _: shared, documents, args.queries, args.k)
+            started = time.perf_counter()
+            reopened = create_local(COLLECTION_NAME)
+            print(
+                f"{'local shared':>24} reopen: "
+                f"{(time.perf_counter() - started) * 1000:7.1f} ms "
+                f"({reopened.count()} docs)"
+            )
+            store_for, _ = partitioned(create_local)
+            bench("local per-connection", store_for, documents, args.queries, args.k)
+
+        if client is None:
+            continue
+        shared = create_chroma(COLLECTION_NAME)
+        store_for, stores = partitioned(create_chroma)
+        try:
+            bench("chroma shared", lambda _: shared, documents, args.queries, args.k)
+            bench("chroma per-connection", store_for, documents, args.queries, args.k)
+        finally:
+            for store in [shared, *stores.values()]:
+                store.delete_collection()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,8 @@ class LlmConfig:
     LLM_DEFAULT_TEMPERATURE = float(os.getenv("LLM_DEFAULT_TEMPERATURE", "0.3"))
     LLM_TAXONOMY_TEMPERATURE = float(os.getenv("LLM_TAXONOMY_TEMPERATURE", "0.0"))
     LLM_TAXONOMY_TOP_P = float(os.getenv("LLM_TAXONOMY_TOP_P", "0.1"))
+    # Story tokens per batched LLM call (0 = fixed item counts only)
+    LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "6000"))
     LLM_DEFECT_TOP_P = float(os.getenv("LLM_DEFECT_TOP_P", "0.1"))
 
     GEMINI_API_KEYS = os.getenv("GEMINI_API_KEYS", "").split(",")
@@ -36,6 +38,45 @@ class LlmConfig:
     OPENAI_API_MAX_RETRY = int(os.getenv("OPENAI_API_MAX_RETRY", "3"))
     OPENAI_API_RETRY_DELAY_MS = int(os.getenv("OPENAI_API_RETRY_DELAY_MS", "1000"))
 
+    # "off" calls the provider directly, "replay" serves recorded responses from
+    # the cassette directory and records misses when a real API key is set
+    LLM_REPLAY_MODE = os.getenv("LLM_REPLAY_MODE", "off")
+    LLM_CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", "data/cassettes")
+
+    # Response cache for agents built with cache=True: "off", "redis" or "disk"
+    LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "off")
+    LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "data/llm_cache")
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+
+    # Redis token buckets shared by all workers, per API key and model (0 = unlimited)
+    LLM_RATE_LIMIT_RPM = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+    LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+    LLM_RATE_LIMIT_MAX_WAIT_SECONDS = float(
+        os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "120")
+    )
+
+    # AIMD concurrency of model calls per agent and model, tuned from latency
+    # and 429s. Off by default: batches then run at the executor's concurrency
+    LLM_ADAPTIVE_CONCURRENCY = (
+        os.getenv("LLM_ADAPTIVE_CONCURRENCY", "false").lower() == "true"
+    )
+    LLM_CONCURRENCY_INITIAL = int(os.getenv("LLM_CONCURRENCY_INITIAL", "4"))
+    LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+    LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "32"))
+
+    # Provider-side caching of few-shot histories (Gemini bills cache storage)
+    LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "false").lower() == "true"
+    LLM_PREFIX_CACHE_TTL_SECONDS = int(
+        os.getenv("LLM_PREFIX_CACHE_TTL_SECONDS", "3600")
+    )
+    LLM_PREFIX_CACHE_MIN_TOKENS = int(os.getenv("LLM_PREFIX_CACHE_MIN_TOKENS", "1024"))
+
+    # Hedged requests of latency-sensitive agents
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+
 
 class AuthConfig:
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "")
@@ -54,6 +95,36 @@ class JiraConfig:
     SCOPES = os.getenv("JIRA_SCOPES", "")
     WEBHOOK_EVENTS = os.getenv("JIRA_WEBHOOK_EVENTS", "").split(",")
     WEBHOOK_URL = os.getenv("JIRA_WEBHOOK_URL", "")
+    # Issues per search page, and projects fetched in parallel during sync
+    SEARCH_PAGE_SIZE = int(os.getenv("JIRA_SEARCH_PAGE_SIZE", "100"))
+    FETCH_CONCURRENCY = int(os.getenv("JIRA_FETCH_CONCURRENCY", "4"))
+    # Projects stored, embedded and bucketed in parallel, each with its own DB session
+    SYNC_PROJECT_CONCURRENCY = int(os.getenv("JIRA_SYNC_PROJECT_CONCURRENCY", "4"))
+    # Rows per INSERT ... ON DUPLICATE KEY UPDATE statement (and commit) in full syncs
+    SYNC_UPSERT_CHUNK_SIZE = int(os.getenv("JIRA_SYNC_UPSERT_CHUNK_SIZE", "500"))
+    # Story vectors per Chroma write, and concurrent writes, when flushing buffered writes
+    VECTOR_WRITE_BATCH_SIZE = int(os.getenv("JIRA_VECTOR_WRITE_BATCH_SIZE", "256"))
+    VECTOR_WRITE_CONCURRENCY = int(os.getenv("JIRA_VECTOR_WRITE_CONCURRENCY", "4"))
+    # Pooled keep-alive HTTP session shared by all Jira calls of a process
+    HTTP_POOL_SIZE = int(os.getenv("JIRA_HTTP_POOL_SIZE", "16"))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("JIRA_HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_READ_TIMEOUT = float(os.getenv("JIRA_HTTP_READ_TIMEOUT", "60"))
+    HTTP_MAX_RETRIES = int(os.getenv("JIRA_HTTP_MAX_RETRIES", "5"))
+    HTTP_MAX_BACKOFF_SECONDS = float(os.getenv("JIRA_HTTP_MAX_BACKOFF_SECONDS", "60"))
+    # Access tokens are refreshed this long before they expire
+    TOKEN_REFRESH_MARGIN_SECONDS = int(
+        os.getenv("JIRA_TOKEN_REFRESH_MARGIN_SECONDS", "300")
+    )
+    # Incremental syncs also re-fetch issues updated this long before the watermark
+    SYNC_WATERMARK_OVERLAP_MINUTES = int(
+        os.getenv("JIRA_SYNC_WATERMARK_OVERLAP_MINUTES", "5")
+    )
+    # Webhook events of one issue arriving within this window are processed once
+    WEBHOOK_COALESCE_SECONDS = float(os.getenv("JIRA_WEBHOOK_COALESCE_SECONDS", "10"))
+    # Markdown <-> ADF converter: "node" (bridge script) or "python" (in-process).
+    # Switch to python once `benchmarks/markdown_adf.py check` passes against
+    # the Node output stored by `record`
+    ADF_ENGINE = os.getenv("JIRA_ADF_ENGINE", "node")
 
 
 class DatabaseConfig:
@@ -78,6 +149,23 @@ class VectorStoreConfig:
     COLLECTION_NAME = os.getenv("VECTORSTORE_COLLECTION_NAME", "karela_collection")
     HOST = os.getenv("VECTORSTORE_HOST", "localhost")
     PORT = int(os.getenv("VECTORSTORE_PORT", "8000"))
+    # chroma (HTTP server at HOST:PORT) or local (in-process index in LOCAL_DIRECTORY)
+    BACKEND = os.getenv("VECTORSTORE_BACKEND", "chroma")
+    LOCAL_DIRECTORY = os.getenv("VECTORSTORE_LOCAL_DIRECTORY", "data/vector_index")
+    # shared (one collection, filtered by connection_id) or connection (a collection each)
+    PARTITIONING = os.getenv("VECTORSTORE_PARTITIONING", "shared")
+    # openai (text-embedding-3-small) or local (EMBEDDING_LOCAL_MODEL on CPU, in process)
+    EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+    EMBEDDING_LOCAL_MODEL = os.getenv("EMBEDDING_LOCAL_MODEL", "all-MiniLM-L6-v2")
+    EMBEDDING_LOCAL_BATCH_SIZE = int(os.getenv("EMBEDDING_LOCAL_BATCH_SIZE", "32"))
+    # Content-addressed cache of embedding vectors: off, redis or disk (SQLite file)
+    EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "redis")
+    EMBEDDING_CACHE_PATH = os.getenv(
+        "EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3"
+    )
+    EMBEDDING_CACHE_TTL_SECONDS = int(
+        os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "2592000")
+    )
 
 
 class MinioConfig:
@@ -104,6 +192,8 @@ class GraphRAGConfig:
     TOKENIZER_MODEL_ID = os.getenv("GRAPHRAG_MODEL_ID", "gemini/gemini-2.5-flash-lite")
     CHAT_MODEL = os.getenv("GRAPHRAG_CHAT_MODEL", "gemini/gemini-2.5-flash-lite")
     EMBEDDING_MODEL = os.getenv("GRAPHRAG_EMBEDDING_MODEL", "gemini-embedding-001")
+    # litellm (EMBEDDING_MODEL through MODEL_PROVIDER) or local (EMBEDDING_LOCAL_MODEL)
+    EMBEDDING_PROVIDER = os.getenv("GRAPHRAG_EMBEDDING_PROVIDER", "litellm")
 
 
 class MineruConfig:
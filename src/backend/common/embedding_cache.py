@@ -0,0 +1,237 @@
+"""Content-addressed cache in front of the embedding model.
+
+Vectors are keyed by the embedding model, its dimensions and a SHA-256 of the
+text, so re-syncing stories or re-processing a document only embeds the texts
+that actually changed. Hits, misses and the text bytes the hits kept from
+being sent are counted in Redis, and ``track_ingest`` prints them per ingest.
+"""
+
+import contextvars
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+from common.configs import VectorStoreConfig
+from common.redis_app import redis_client
+
+STATS_KEY = "embedding_cache:stats"
+STAT_FIELDS = ("hits", "misses", "saved_bytes")
+
+_ingest_stats: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "embedding_cache_ingest", default=None
+)
+
+
+def _pack(vector: list[float]) -> bytes:
+    # float32, the precision the vector store keeps anyway
+    return array("f", vector).tobytes()
+
+
+def _unpack(raw: bytes) -> list[float]:
+    vector = array("f")
+    vector.frombytes(raw)
+    return vector.tolist()
+
+
+class EmbeddingCacheBackend:
+    """Key/value store for packed vectors."""
+
+    def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        raise NotImplementedError
+
+    def set_many(self, items: dict[str, bytes]):
+        raise NotImplementedError
+
+
+class RedisEmbeddingCache(EmbeddingCacheBackend):
+    def __init__(
+        self,
+        client=redis_client,
+        prefix: str = "embedding_cache:",
+        ttl_seconds: int = 0,
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return self.client.mget([f"{self.prefix}{key}" for key in keys])
+
+    def set_many(self, items: dict[str, bytes]):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(f"{self.prefix}{key}", value, ex=self.ttl_seconds or None)
+        pipe.execute()
+
+
+class SqliteEmbeddingCache(EmbeddingCacheBackend):
+    """Local key/value file, for single-host deployments and development."""
+
+    def __init__(self, path: str, ttl_seconds: int = 0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings"
+                " (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        oldest = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        found = {}
+        with self._lock:
+            # Stay below SQLite's host parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE created_at >= ?"
+                    f" AND key IN ({','.join('?' * len(chunk))})",
+                    [oldest, *chunk],
+                )
+                found.update(rows)
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items: dict[str, bytes]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    ``Embeddings`` that serve previously embedded texts from ``backend`` and only
+    send the others to ``embeddings``. Duplicate texts within a call are embedded
+    once. Cache failures fall back to embedding everything.
+    """
+
+    def __init__(
+        self, embeddings: Embeddings, namespace: str, backend: EmbeddingCacheBackend
+    ):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.backend = backend
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{kind}:{digest}"
+
+    def _embed(self, texts: list[str], kind: str, compute) -> list[list[float]]:
+        keys = [self._key(kind, text) for text in texts]
+        try:
+            cached = self.backend.get_many(keys)
+        except Exception as e:
+            print(f"| Embedding cache: lookup failed: {e}")
+            cached = [None] * len(texts)
+
+        vectors: dict[str, list[float]] = {
+            key: _unpack(raw) for key, raw in zip(keys, cached) if raw is not None
+        }
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            computed = compute(list(missing.values()))
+            vectors.update(zip(missing.keys(), computed))
+            try:
+                self.backend.set_many(
+                    {key: _pack(vector) for key, vector in zip(missing, computed)}
+                )
+            except Exception as e:
+                print(f"| Embedding cache: store failed: {e}")
+
+        hits = len(texts) - len(missing)
+        saved_bytes = sum(
+            len(text.encode("utf-8"))
+            for key, text in zip(keys, texts)
+            if key not in missing
+        )
+        _record_stats(hits=hits, misses=len(missing), saved_bytes=saved_bytes)
+        return [vectors[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts, "doc", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        # Some models embed queries differently from documents
+        return self._embed(
+            [text], "query", lambda texts: [self.embeddings.embed_query(texts[0])]
+        )[0]
+
+
+def _record_stats(**increments: int):
+    ingest = _ingest_stats.get()
+    if ingest is not None:
+        for field, value in increments.items():
+            ingest[field] += value
+    try:
+        pipe = redis_client.pipeline()
+        for field, value in increments.items():
+            if value:
+                pipe.hincrby(STATS_KEY, field, value)
+        pipe.execute()
+    except Exception as e:
+        print(f"| Embedding cache: failed to record stats: {e}")
+
+
+@contextmanager
+def track_ingest(label: str):
+    """Count the cache hits of the embeddings computed inside, and print them."""
+    stats = {field: 0 for field in STAT_FIELDS}
+    token = _ingest_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _ingest_stats.reset(token)
+        total = stats["hits"] + stats["misses"]
+        if total:
+            print(
+                f"| Embedding cache [{label}]: {stats['hits']}/{total} hits "
+                f"({stats['hits'] / total:.0%}), {stats['saved_bytes'] / 1024:.1f} KiB not sent"
+            )
+
+
+def get_embedding_cache_stats() -> dict:
+    raw = redis_client.hgetall(STATS_KEY)
+    stats = {field: int(raw.get(field.encode(), 0)) for field in STAT_FIELDS}
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+    return stats
+
+
+def render_embedding_cache_metrics() -> str:
+    """:func:`get_embedding_cache_stats` in the Prometheus text exposition format."""
+    lines = []
+    for field, value in get_embedding_cache_stats().items():
+        suffix = "" if field == "hit_rate" else "_total"
+        lines.append(f"karela_embedding_cache_{field}{suffix} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def with_embedding_cache(
+    embeddings: Embeddings, model: str, dimensions: Optional[int] = None
+) -> Embeddings:
+    """Wrap ``embeddings`` in the cache selected by ``EMBEDDING_CACHE_BACKEND``."""
+    backend_name = VectorStoreConfig.EMBEDDING_CACHE_BACKEND
+    if backend_name == "redis":
+        backend = RedisEmbeddingCache(
+            ttl_seconds=VectorStoreConfig.EMBEDDING_CACHE_TTL_SECONDS
+        )
+    elif backend_name == "disk":
+        backend = SqliteEmbeddingCache(
+            VectorStoreConfig.EMBEDDING_CACHE_PATH,
+            ttl_seconds=VectorStoreConfig.EMBEDDING_CACHE_TTL_SECONDS,
+        )
+    else:
+        return embeddings
+    return CachedEmbeddings(embeddings, f"{model}:{dimensions or 'default'}", backend)
@@ -0,0 +1,88 @@
+"""Sentence-embedding models run on CPU inside the process.
+
+An alternative to the OpenAI embedding API for story sync, doc ingestion and
+search: no network round trip, no rate limit, works offline. The model is
+loaded on first use, with ``sentence-transformers`` when it is installed (any
+Hugging Face sentence-embedding model). Without it, ``all-MiniLM-L6-v2`` runs
+on the ONNX build that ``chromadb`` already ships, so no extra dependency is
+needed for the default model.
+
+Vectors of different models are not comparable: switching providers or models
+needs the stores re-indexed into a new collection.
+"""
+
+import threading
+import time
+from functools import lru_cache
+from typing import Callable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+def _load_model(model_name: str, batch_size: int) -> Callable[[list[str]], np.ndarray]:
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        SentenceTransformer = None
+
+    if SentenceTransformer is not None:
+        model = SentenceTransformer(model_name, device="cpu")
+        return lambda texts: model.encode(
+            texts,
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+    if model_name == DEFAULT_MODEL:
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+        model = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+        return lambda texts: np.asarray(model(texts), dtype=np.float32)
+    raise ImportError(
+        f"Local embedding model '{model_name}' needs sentence-transformers: "
+        "pip install sentence-transformers"
+    )
+
+
+class LocalEmbeddings(Embeddings):
+    """``Embeddings`` computed by a model loaded in this process."""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = 32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._encode = None
+        self._lock = threading.Lock()
+
+    def _model(self) -> Callable[[list[str]], np.ndarray]:
+        with self._lock:
+            if self._encode is None:
+                started = time.perf_counter()
+                self._encode = _load_model(self.model_name, self.batch_size)
+                print(
+                    f"| Local embeddings: loaded {self.model_name} in "
+                    f"{time.perf_counter() - started:.1f}s"
+                )
+            return self._encode
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        encode = self._model()
+        # The model already uses every core; concurrent batches would only
+        # compete for them
+        with self._lock:
+            return np.asarray(encode(list(texts)), dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+@lru_cache(maxsize=None)
+def get_local_embeddings(
+    model_name: str = DEFAULT_MODEL, batch_size: int = 32
+) -> LocalEmbeddings:
+    """One instance per model and process, so the model is loaded once."""
+    return LocalEmbeddings(model_name, batch_size)
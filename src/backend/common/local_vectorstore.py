@@ -0,0 +1,618 @@
+"""In-process vector index, an alternative to the Chroma HTTP server.
+
+Vectors live in a flat float32 matrix memory-mapped from ``vectors.f32`` and
+are searched exactly with one matrix product per query. IDs, texts and
+metadata live next to it in a SQLite file. Every process (API, RQ workers)
+maps the same files: writes are serialized by SQLite and log the slots they
+touch in a ``changes`` table, so when ``PRAGMA data_version`` shows another
+process committed, a process only re-reads the slots changed since.
+
+The vector of a live slot is never rewritten: an upsert writes to a new slot
+and frees the old one, and freed slots are only reused after a grace period.
+A process that is scoring a slot can therefore not see another document's
+vector in it.
+
+Brute force stays fast for small and medium tenants (a few hundred thousand
+vectors) and avoids the HTTP hop and the server-side filtering of a shared
+Chroma collection. Distances and relevance scores match Chroma's default
+``l2`` space, so existing similarity thresholds keep their meaning.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Optional
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+MIN_CAPACITY = 1024
+# A freed slot is not reused before every reader has had time to refresh
+FREE_SLOT_GRACE_SECONDS = 60
+# Changes kept for incremental refreshes; readers further behind reload fully
+CHANGELOG_SIZE = 100_000
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Exact nearest-neighbour search over a memory-mapped matrix, with the part
+    of the Chroma interface the app uses: upserting ``add_documents``,
+    ``delete`` by IDs and/or a ``where`` filter, and similarity searches
+    taking Chroma ``filter`` / ``where_document`` expressions.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_function: Embeddings,
+        persist_directory: str,
+    ):
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self.directory = Path(persist_directory) / collection_name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.f32"
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            self.directory / "index.sqlite3",
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items (slot INTEGER PRIMARY KEY,"
+            " id TEXT UNIQUE NOT NULL, document TEXT, metadata TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS changes"
+            " (seq INTEGER PRIMARY KEY AUTOINCREMENT, slot INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS free_slots"
+            " (slot INTEGER PRIMARY KEY, freed_at REAL NOT NULL)"
+        )
+        self._data_version = None
+        self._seq = 0
+        self._reload()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    # ---- storage ----
+
+    def _dimensions(self) -> Optional[int]:
+        row = self._conn.execute(
+            "SELECT value FROM state WHERE key = 'dimensions'"
+        ).fetchone()
+        return row[0] if row else None
+
+    def _map_vectors(self, capacity: int):
+        if capacity and self.dimensions:
+            size = capacity * self.dimensions * 4
+            if (
+                not self._vectors_path.exists()
+                or self._vectors_path.stat().st_size < size
+            ):
+                with open(self._vectors_path, "ab") as f:
+                    f.truncate(size)
+            self._vectors = np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r+",
+                shape=(capacity, self.dimensions),
+            )
+        else:
+            self._vectors = np.zeros((0, self.dimensions or 0), dtype=np.float32)
+
+        grown = capacity - len(self._ids)
+        self._ids += [None] * grown
+        self._documents += [None] * grown
+        self._metadatas += [None] * grown
+        self._alive = np.concatenate([self._alive, np.zeros(grown, dtype=bool)])
+        self._norms = np.concatenate([self._norms, np.zeros(grown, dtype=np.float32)])
+        for field, column in self._columns.items():
+            self._columns[field] = np.concatenate(
+                [column, np.full(grown, None, dtype=object)]
+            )
+
+    def _reload(self):
+        """Rebuild the in-memory view from the files, as another process left them."""
+        self.dimensions = self._dimensions()
+        self._slots: dict[str, int] = {}
+        self._ids: list[Optional[str]] = []
+        self._documents: list[Optional[str]] = []
+        self._metadatas: list[Optional[dict]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._columns: dict[str, np.ndarray] = {}
+
+        with self._read_transaction():
+            self._seq = self._last_seq()
+            rows = self._conn.execute(
+                "SELECT slot, id, document, metadata FROM items"
+            ).fetchall()
+        self._map_vectors(self._file_rows())
+        self._load_rows(rows)
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh(self):
+        """Apply the slots other processes changed since the last refresh."""
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        with self._read_transaction():
+            first_seq = self._conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            if first_seq is not None and first_seq > self._seq + 1:
+                # The changes this process missed were pruned from the log
+                self._reload()
+                return
+            last_seq = self._last_seq()
+            slots = [
+                slot
+                for (slot,) in self._conn.execute(
+                    "SELECT DISTINCT slot FROM changes WHERE seq > ?", (self._seq,)
+                )
+            ]
+            rows = []
+            for start in range(0, len(slots), 500):
+                chunk = slots[start : start + 500]
+                rows += self._conn.execute(
+                    "SELECT slot, id, document, metadata FROM items"
+                    f" WHERE slot IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+        if self.dimensions is None:
+            self.dimensions = self._dimensions()
+        if slots and max(slots) >= len(self._ids):
+            self._map_vectors(self._file_rows())
+        for slot in slots:
+            if self._alive[slot]:
+                self._clear_slot(slot)
+        self._load_rows(rows)
+        self._seq = last_seq
+        self._data_version = data_version
+
+    @contextmanager
+    def _read_transaction(self):
+        """One snapshot for several reads, unless a write transaction is open."""
+        if self._conn.in_transaction:
+            yield
+            return
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        finally:
+            self._conn.execute("COMMIT")
+
+    def _last_seq(self) -> int:
+        row = self._conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _file_rows(self) -> int:
+        if not self.dimensions or not self._vectors_path.exists():
+            return 0
+        return self._vectors_path.stat().st_size // (self.dimensions * 4)
+
+    def _load_rows(self, rows: list[tuple]):
+        for slot, id, document, metadata in rows:
+            self._set_slot(slot, id, document, json.loads(metadata or "{}"))
+        if rows:
+            slots = np.fromiter((row[0] for row in rows), dtype=np.int64)
+            vectors = np.asarray(self._vectors[slots])
+            self._norms[slots] = np.einsum("ij,ij->i", vectors, vectors)
+
+    def _set_slot(self, slot: int, id: str, document: str, metadata: dict):
+        self._slots[id] = slot
+        self._ids[slot] = id
+        self._documents[slot] = document
+        self._metadatas[slot] = metadata
+        self._alive[slot] = True
+        for field in self._columns.keys() | metadata.keys():
+            if field not in self._columns:
+                self._columns[field] = np.full(len(self._ids), None, dtype=object)
+            self._columns[field][slot] = metadata.get(field)
+
+    def _clear_slot(self, slot: int):
+        if self._slots.get(self._ids[slot]) == slot:
+            del self._slots[self._ids[slot]]
+        self._ids[slot] = self._documents[slot] = self._metadatas[slot] = None
+        self._alive[slot] = False
+        for column in self._columns.values():
+            column[slot] = None
+
+    def _allocate_slots(self, count: int) -> list[int]:
+        """Slots for new vectors; runs inside the write transaction."""
+        slots = [
+            slot
+            for (slot,) in self._conn.execute(
+                "SELECT slot FROM free_slots WHERE freed_at <= ? ORDER BY slot LIMIT ?",
+                (time.time() - FREE_SLOT_GRACE_SECONDS, count),
+            )
+        ]
+        self._conn.executemany(
+            "DELETE FROM free_slots WHERE slot = ?", [(slot,) for slot in slots]
+        )
+        if len(slots) < count:
+            top = self._conn.execute(
+                "SELECT MAX(slot) FROM (SELECT MAX(slot) AS slot FROM items"
+                " UNION ALL SELECT MAX(slot) FROM free_slots)"
+            ).fetchone()[0]
+            start = 0 if top is None else top + 1
+            slots += list(range(start, start + count - len(slots)))
+        capacity = len(self._ids)
+        if slots and max(slots) >= capacity:
+            self._map_vectors(max(max(slots) + 1, capacity * 2, MIN_CAPACITY))
+        return slots
+
+    def _free(self, slots: list[int]):
+        """Delete the rows of ``slots``; runs inside the write transaction."""
+        freed_at = time.time()
+        for start in range(0, len(slots), 500):
+            chunk = slots[start : start + 500]
+            self._conn.execute(
+                f"DELETE FROM items WHERE slot IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO free_slots (slot, freed_at) VALUES (?, ?)",
+            [(slot, freed_at) for slot in slots],
+        )
+
+    def _log_changes(self, slots: list[int]) -> int:
+        """Record the changed slots for other processes; returns the last sequence."""
+        self._conn.executemany(
+            "INSERT INTO changes (slot) VALUES (?)", [(slot,) for slot in slots]
+        )
+        last_seq = self._last_seq()
+        self._conn.execute(
+            "DELETE FROM changes WHERE seq <= ?", (last_seq - CHANGELOG_SIZE,)
+        )
+        return last_seq
+
+    # ---- writes ----
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Embed and upsert ``texts``; existing IDs are overwritten in place."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = (
+            [id or str(uuid4()) for id in ids] if ids else [str(uuid4()) for _ in texts]
+        )
+        # Embed outside the lock: it's the slow part, and concurrent batches
+        # from JiraVectorStore flushes should overlap on it
+        embeddings = self.embedding_function.embed_documents(texts)
+        self.upsert(ids, embeddings, texts, metadatas)
+        return ids
+
+    def upsert(
+        self,
+        ids: list[str],
+        embeddings: list[list[float]],
+        documents: list[str],
+        metadatas: list[Optional[dict]],
+    ):
+        """Store precomputed vectors, like ``Collection.upsert`` in Chroma."""
+        # Last write wins for IDs repeated within the call
+        latest = {id: n for n, id in enumerate(ids)}
+        keep = sorted(latest.values())
+        ids = [ids[n] for n in keep]
+        texts = [documents[n] for n in keep]
+        metadatas = [metadatas[n] or {} for n in keep]
+        vectors = np.asarray(embeddings, dtype=np.float32)[keep]
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                if self.dimensions is None:
+                    self.dimensions = vectors.shape[1]
+                    self._conn.execute(
+                        "INSERT INTO state (key, value) VALUES ('dimensions', ?)",
+                        (self.dimensions,),
+                    )
+                    self._map_vectors(len(self._ids))
+                elif vectors.shape[1] != self.dimensions:
+                    raise ValueError(
+                        f"Embedding has {vectors.shape[1]} dimensions, the "
+                        f"'{self.collection_name}' index stores {self.dimensions}"
+                    )
+
+                # Overwritten IDs move to new slots: other processes may be
+                # scoring the old ones
+                replaced = [self._slots[id] for id in ids if id in self._slots]
+                slots = self._allocate_slots(len(ids))
+                self._vectors[slots] = vectors
+                # Readers must not see the rows before their vectors
+                self._vectors.flush()
+                self._free(replaced)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO items (slot, id, document, metadata)"
+                    " VALUES (?, ?, ?, ?)",
+                    [
+                        (slot, id, text, json.dumps(metadata))
+                        for slot, id, text, metadata in zip(
+                            slots, ids, texts, metadatas
+                        )
+                    ],
+                )
+                seq = self._log_changes(replaced + slots)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._reload()
+                raise
+
+            for slot in replaced:
+                self._clear_slot(slot)
+            for slot, id, text, metadata in zip(slots, ids, texts, metadatas):
+                self._set_slot(slot, id, text, metadata)
+            self._norms[slots] = np.einsum("ij,ij->i", vectors, vectors)
+            self._seq = seq
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def delete(
+        self,
+        ids: Optional[list[str]] = None,
+        where: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Delete ``ids`` matching ``where``, or all documents matching ``where``."""
+        if ids is None and where is None:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                mask = self._alive.copy()
+                if ids is not None:
+                    selected = np.zeros_like(mask)
+                    selected[[self._slots[id] for id in ids if id in self._slots]] = (
+                        True
+                    )
+                    mask &= selected
+                if where:
+                    mask &= self._where_mask(where)
+                self._delete_slots(np.flatnonzero(mask).tolist())
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._reload()
+                raise
+
+    def _delete_slots(self, slots: list[int]):
+        """Free ``slots`` and commit the write transaction."""
+        self._free(slots)
+        seq = self._log_changes(slots)
+        self._conn.execute("COMMIT")
+        for slot in slots:
+            self._clear_slot(slot)
+        self._seq = seq
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def delete_collection(self):
+        """
+        Delete every document. The files stay, as other processes may still
+        map them; they are reused by the next writes.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                self._delete_slots(np.flatnonzero(self._alive).tolist())
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._reload()
+                raise
+
+    def get(
+        self,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Iterable[str] = ("documents", "metadatas"),
+    ) -> dict:
+        """Stored documents in slot order, shaped like ``Collection.get`` in Chroma."""
+        include = set(include)
+        with self._lock:
+            self._refresh()
+            mask = self._alive & self._where_mask(where) if where else self._alive
+            slots = np.flatnonzero(mask)[offset:]
+            if limit is not None:
+                slots = slots[:limit]
+            result = {"ids": [self._ids[slot] for slot in slots]}
+            if "documents" in include:
+                result["documents"] = [self._documents[slot] for slot in slots]
+            if "metadatas" in include:
+                result["metadatas"] = [dict(self._metadatas[slot]) for slot in slots]
+            if "embeddings" in include:
+                result["embeddings"] = np.array(self._vectors[slots])
+            return result
+
+    # ---- filters ----
+
+    def _column(self, field: str) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            return np.full(len(self._ids), None, dtype=object)
+        return column
+
+    def _where_mask(self, where: dict) -> np.ndarray:
+        """Boolean mask of the slots matching a Chroma ``where`` expression."""
+        mask = np.ones(len(self._ids), dtype=bool)
+        for field, condition in where.items():
+            if field in ("$and", "$or"):
+                masks = [self._where_mask(clause) for clause in condition]
+                combine = np.logical_and if field == "$and" else np.logical_or
+                mask &= combine.reduce(masks) if masks else field == "$and"
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            column = self._column(field)
+            present = np.not_equal(column, None)
+            for op, value in condition.items():
+                if op == "$eq":
+                    mask &= present & (column == value)
+                elif op == "$ne":
+                    mask &= present & (column != value)
+                elif op in ("$in", "$nin"):
+                    values = set(value)
+                    found = np.fromiter(
+                        (item in values for item in column),
+                        dtype=bool,
+                        count=len(column),
+                    )
+                    mask &= present & (found if op == "$in" else ~found)
+                elif op in ("$gt", "$gte", "$lt", "$lte"):
+                    compare = {
+                        "$gt": lambda a: a > value,
+                        "$gte": lambda a: a >= value,
+                        "$lt": lambda a: a < value,
+                        "$lte": lambda a: a <= value,
+                    }[op]
+                    mask &= np.fromiter(
+                        (item is not None and compare(item) for item in column),
+                        dtype=bool,
+                        count=len(column),
+                    )
+                else:
+                    raise ValueError(f"Unsupported where operator: {op}")
+        return mask
+
+    def _matches_document(self, text: str, where_document: dict) -> bool:
+        for op, value in where_document.items():
+            if op == "$and":
+                if not all(self._matches_document(text, c) for c in value):
+                    return False
+            elif op == "$or":
+                if not any(self._matches_document(text, c) for c in value):
+                    return False
+            elif op == "$contains":
+                if value not in text:
+                    return False
+            elif op == "$not_contains":
+                if value in text:
+                    return False
+            else:
+                raise ValueError(f"Unsupported where_document operator: {op}")
+        return True
+
+    # ---- search ----
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        where_document: Optional[dict] = None,
+    ) -> list[tuple[Document, float]]:
+        """The ``k`` closest documents with their squared L2 distance."""
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            mask = self._alive & self._where_mask(filter) if filter else self._alive
+            candidates = np.flatnonzero(mask)
+            if where_document:
+                candidates = np.fromiter(
+                    (
+                        slot
+                        for slot in candidates
+                        if self._matches_document(self._documents[slot], where_document)
+                    ),
+                    dtype=np.int64,
+                )
+            if not len(candidates) or k <= 0:
+                return []
+
+            distances = (
+                self._norms[candidates]
+                + np.dot(query, query)
+                - 2 * (self._vectors[candidates] @ query)
+            )
+            k = min(k, len(candidates))
+            nearest = np.argpartition(distances, k - 1)[:k]
+            nearest = nearest[np.argsort(distances[nearest])]
+            return [
+                (
+                    Document(
+                        id=self._ids[candidates[n]],
+                        page_content=self._documents[candidates[n]],
+                        metadata=dict(self._metadatas[candidates[n]]),
+                    ),
+                    # Rounding can take a self-match slightly below zero
+                    max(float(distances[n]), 0.0),
+                )
+                for n in nearest
+            ]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        where_document: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self.embedding_function.embed_query(query),
+            k=k,
+            filter=filter,
+            where_document=where_document,
+        )
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score(
+                query, k=k, filter=filter, **kwargs
+            )
+        ]
+
+    def _select_relevance_score_fn(self):
+        # Same scores as Chroma's default l2 space
+        return self._euclidean_relevance_score_fn
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._slots)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[list[str]] = None,
+        collection_name: str = "langchain",
+        persist_directory: str = "./local_vectorstore",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(collection_name, embedding, persist_directory)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
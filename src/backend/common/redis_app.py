@@ -15,4 +15,5 @@ queue_types = [
     "sync",
     "proposal",
     "doc",
+    "webhook",
 ]
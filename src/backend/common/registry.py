@@ -0,0 +1,94 @@
+"""Lazily constructed agents, compiled graphs and other expensive singletons.
+
+Pipeline modules used to build their agents and compile their graphs at import,
+so every RQ worker and every API reload paid for all workloads. They now
+register a factory with :func:`lazy` and keep a module-level stand-in: the
+object is built on first use, once per process, and later accesses go straight
+to it.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class LazyRegistry:
+    """Named factories whose results are built on first access and then reused."""
+
+    def __init__(self):
+        self._factories: dict[str, Callable[[], Any]] = {}
+        self._instances: dict[str, Any] = {}
+        self._build_seconds: dict[str, float] = {}
+        # Re-entrant: building a graph may build the agents it uses
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> "Lazy":
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+        return Lazy(name, self)
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._build_seconds[name] = time.perf_counter() - started
+            return self._instances[name]
+
+    def warm_up(self, prefix: Optional[str] = None):
+        """Build every registered object, or those whose name starts with ``prefix``."""
+        for name in list(self._factories):
+            if prefix is None or name.startswith(prefix):
+                self.get(name)
+
+    def stats(self) -> dict:
+        """Whether each registered object has been built, and how long it took."""
+        return {
+            name: {
+                "built": name in self._instances,
+                "build_seconds": round(self._build_seconds.get(name, 0.0), 4),
+            }
+            for name in self._factories
+        }
+
+
+registry = LazyRegistry()
+
+
+class Lazy:
+    """Stand-in for a registered object; attribute access builds and forwards to it."""
+
+    __slots__ = ("_name", "_registry")
+
+    def __init__(self, name: str, registry: LazyRegistry):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_registry", registry)
+
+    def _target(self):
+        return self._registry.get(self._name)
+
+    def __getattr__(self, attr: str):
+        return getattr(self._target(), attr)
+
+    @property
+    def __class__(self):
+        # Keeps isinstance() checks against the real type working
+        return type(self._target())
+
+    def __call__(self, *args, **kwargs):
+        return self._target()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        if self._name in self._registry._instances:
+            return repr(self._target())
+        return f"<lazy {self._name}>"
+
+
+def lazy(name: str, factory: Callable[[], Any]) -> Any:
+    """Register ``factory`` under ``name`` and return a stand-in built on first use."""
+    return registry.register(name, factory)
@@ -1,38 +1,117 @@
+import re
+import threading
+
+from langchain_core.vectorstores import VectorStore
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_openai import OpenAIEmbeddings
 from common.configs import LlmConfig, VectorStoreConfig
+from common.embedding_cache import with_embedding_cache
+from common.local_embeddings import get_local_embeddings
+from common.local_vectorstore import LocalVectorStore
 from langchain_chroma import Chroma
 import chromadb
 
-native_chroma_client = chromadb.HttpClient(
-    host=VectorStoreConfig.HOST, port=VectorStoreConfig.PORT
-)
-
-
 # default_embeddings = GoogleGenerativeAIEmbeddings(
 #     model="models/gemini-embedding-001", google_api_key=LlmConfig.GEMINI_API_KEYS[0]
 # )
 
-default_embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-    openai_api_key=LlmConfig.OPENAI_API_KEYS[0],
-    dimensions=1024,
-)
+if VectorStoreConfig.EMBEDDING_PROVIDER == "local":
+    # The model is loaded on the first embedding, not at import
+    default_embeddings = with_embedding_cache(
+        get_local_embeddings(
+            VectorStoreConfig.EMBEDDING_LOCAL_MODEL,
+            VectorStoreConfig.EMBEDDING_LOCAL_BATCH_SIZE,
+        ),
+        model=f"local/{VectorStoreConfig.EMBEDDING_LOCAL_MODEL}",
+    )
+else:
+    default_embeddings = with_embedding_cache(
+        OpenAIEmbeddings(
+            model="text-embedding-3-small",
+            openai_api_key=LlmConfig.OPENAI_API_KEYS[0],
+            dimensions=1024,
+        ),
+        model="text-embedding-3-small",
+        dimensions=1024,
+    )
 
 
-chroma_vectorstore = Chroma(
-    collection_name=VectorStoreConfig.COLLECTION_NAME,
-    embedding_function=default_embeddings,
-    host=VectorStoreConfig.HOST,
-    port=VectorStoreConfig.PORT,
-)
+if VectorStoreConfig.BACKEND == "local":
+    _local_vectorstores: dict[str, LocalVectorStore] = {}
+    _local_vectorstores_lock = threading.Lock()
 
+    def create_chroma_vectorstore(
+        collection_name: str = VectorStoreConfig.COLLECTION_NAME,
+    ):
+        # One instance per collection and process, as each maps the whole index
+        with _local_vectorstores_lock:
+            if collection_name not in _local_vectorstores:
+                _local_vectorstores[collection_name] = LocalVectorStore(
+                    collection_name=collection_name,
+                    embedding_function=default_embeddings,
+                    persist_directory=VectorStoreConfig.LOCAL_DIRECTORY,
+                )
+            return _local_vectorstores[collection_name]
 
-def create_chroma_vectorstore():
-    return Chroma(
-        client=native_chroma_client,
+    # Shared by the Jira and documentation stores, like the Chroma collection below
+    chroma_vectorstore = create_chroma_vectorstore()
+
+else:
+    native_chroma_client = chromadb.HttpClient(
+        host=VectorStoreConfig.HOST, port=VectorStoreConfig.PORT
+    )
+
+    chroma_vectorstore = Chroma(
         collection_name=VectorStoreConfig.COLLECTION_NAME,
         embedding_function=default_embeddings,
         host=VectorStoreConfig.HOST,
         port=VectorStoreConfig.PORT,
     )
+
+    def create_chroma_vectorstore(
+        collection_name: str = VectorStoreConfig.COLLECTION_NAME,
+    ):
+        return Chroma(
+            client=native_chroma_client,
+            collection_name=collection_name,
+            embedding_function=default_embeddings,
+            host=VectorStoreConfig.HOST,
+            port=VectorStoreConfig.PORT,
+        )
+
+
+_tenant_vectorstores: dict[str, VectorStore] = {}
+_tenant_vectorstores_lock = threading.Lock()
+
+
+def tenant_collection_name(connection_id: str) -> str:
+    # Chroma allows [a-zA-Z0-9._-] and must end with a letter or digit
+    suffix = re.sub(r"[^a-zA-Z0-9._-]", "-", connection_id).rstrip("._-")
+    return f"{VectorStoreConfig.COLLECTION_NAME}_{suffix}"
+
+
+def get_tenant_vectorstore(connection_id: str) -> VectorStore:
+    """
+    The store holding the vectors of a connection: its own collection when
+    ``VECTORSTORE_PARTITIONING=connection``, otherwise the shared one.
+    """
+    if VectorStoreConfig.PARTITIONING != "connection":
+        return chroma_vectorstore
+    collection_name = tenant_collection_name(connection_id)
+    with _tenant_vectorstores_lock:
+        if collection_name not in _tenant_vectorstores:
+            _tenant_vectorstores[collection_name] = create_chroma_vectorstore(
+                collection_name
+            )
+        return _tenant_vectorstores[collection_name]
+
+
+def delete_tenant_vectors(connection_id: str):
+    """Delete every vector of a connection, dropping its collection if it has one."""
+    if VectorStoreConfig.PARTITIONING != "connection":
+        chroma_vectorstore.delete(where={"connection_id": connection_id})
+        return
+    collection_name = tenant_collection_name(connection_id)
+    with _tenant_vectorstores_lock:
+        store = _tenant_vectorstores.pop(collection_name, None)
+    (store or create_chroma_vectorstore(collection_name)).delete_collection()
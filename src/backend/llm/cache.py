@@ -0,0 +1,415 @@
+"""Content-addressed response cache for DynamicAgent.
+
+Entries are keyed by a fingerprint of model, temperature, response schema,
+system prompt (as rendered by dynamic-prompt middleware) and normalized input
+messages, so re-running a pipeline on unchanged input is served without calling
+the provider. Hit/miss counters and the tokens the hits saved are kept in Redis
+per agent, grouped by pipeline (the agent name prefix, e.g. ``analysis`` for
+``analysis.self_defect``).
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+from pydantic import BaseModel
+
+from common.configs import LlmConfig
+from common.redis_app import redis_client
+from .fingerprint import (
+    fingerprint,
+    dump_response,
+    load_response,
+    render_system_prompt,
+)
+
+STATS_PREFIX = "llm_cache:stats:"
+STAT_FIELDS = (
+    "hits",
+    "misses",
+    "deduped",
+    "saved_input_tokens",
+    "saved_output_tokens",
+)
+
+
+class CacheBackend:
+    """Key/value store for serialized agent responses."""
+
+    def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def set(self, key: str, entry: dict):
+        raise NotImplementedError
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis backend. Entries expire through Redis TTL; a sorted set of last access
+    times is used to evict the least recently used entries above ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        client=redis_client,
+        prefix: str = "llm_cache:",
+        ttl_seconds: int = 0,
+        max_entries: int = 0,
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.lru_key = f"{prefix}lru"
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}entry:{key}"
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self.client.get(self._entry_key(key))
+        if raw is None:
+            return None
+        if self.max_entries:
+            self.client.zadd(self.lru_key, {key: time.time()})
+        return json.loads(raw)
+
+    def set(self, key: str, entry: dict):
+        pipe = self.client.pipeline()
+        pipe.set(
+            self._entry_key(key),
+            json.dumps(entry, ensure_ascii=False),
+            ex=self.ttl_seconds or None,
+        )
+        if self.max_entries:
+            pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.execute()
+
+        if self.max_entries:
+            excess = self.client.zcard(self.lru_key) - self.max_entries
+            if excess > 0:
+                evicted = self.client.zpopmin(self.lru_key, excess)
+                self.client.delete(
+                    *[self._entry_key(member.decode()) for member, _ in evicted]
+                )
+
+
+class DiskCacheBackend(CacheBackend):
+    """
+    Local-disk backend storing one JSON file per entry. The file mtime is bumped
+    on every hit and serves as the LRU clock; the creation time kept inside the
+    entry is used for TTL.
+
+    Counting entries means scanning the directory, so eviction does not run on
+    every write: the process counts the entries it adds and lets the cache grow
+    a tenth past ``max_entries`` before a scan trims the oldest. Entries added
+    by other processes are picked up by the next scan.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: int = 0, max_entries: int = 0):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._headroom = max(1, max_entries // 10)
+        # Entries on disk as of the last scan plus the ones added since
+        self._entries: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if self.ttl_seconds and time.time() - entry["created_at"] > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+
+        os.utime(path)
+        return entry
+
+    def set(self, key: str, entry: dict):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not path.exists()
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        if not self.max_entries:
+            return
+        with self._lock:
+            if self._entries is not None and is_new:
+                self._entries += 1
+            if self._entries is None or (
+                self._entries > self.max_entries + self._headroom
+            ):
+                self._evict()
+
+    def _evict(self):
+        files = list(self.directory.glob("*/*.json"))
+        excess = len(files) - self.max_entries
+        self._entries = len(files) - max(excess, 0)
+        if excess <= 0:
+            return
+        files.sort(key=lambda p: p.stat().st_mtime)
+        for path in files[:excess]:
+            path.unlink(missing_ok=True)
+
+
+_backend: Optional[CacheBackend] = None
+
+
+def get_cache_backend() -> Optional[CacheBackend]:
+    """Return the process-wide backend selected by ``LLM_CACHE_BACKEND``, or None."""
+    global _backend
+    if _backend is None:
+        if LlmConfig.LLM_CACHE_BACKEND == "redis":
+            _backend = RedisCacheBackend(
+                ttl_seconds=LlmConfig.LLM_CACHE_TTL_SECONDS,
+                max_entries=LlmConfig.LLM_CACHE_MAX_ENTRIES,
+            )
+        elif LlmConfig.LLM_CACHE_BACKEND == "disk":
+            _backend = DiskCacheBackend(
+                directory=LlmConfig.LLM_CACHE_DIR,
+                ttl_seconds=LlmConfig.LLM_CACHE_TTL_SECONDS,
+                max_entries=LlmConfig.LLM_CACHE_MAX_ENTRIES,
+            )
+    return _backend
+
+
+def response_token_usage(response) -> tuple[int, int]:
+    """Sum input/output tokens reported on the AI messages of an agent response."""
+    input_tokens = output_tokens = 0
+    if isinstance(response, dict):
+        for message in response.get("messages", []):
+            usage = getattr(message, "usage_metadata", None)
+            if isinstance(message, AIMessage) and usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    return input_tokens, output_tokens
+
+
+def record_cache_stats(agent_name: str, **increments):
+    try:
+        pipe = redis_client.pipeline()
+        for field, value in increments.items():
+            if value:
+                pipe.hincrby(f"{STATS_PREFIX}{agent_name}", field, value)
+        pipe.execute()
+    except Exception as e:
+        # Stats must never fail an LLM call
+        print(f"| LLM cache: failed to record stats for '{agent_name}': {e}")
+
+
+def get_cache_stats() -> dict:
+    """Return cache counters per pipeline, with the per-agent breakdown."""
+    pipelines = {}
+    for redis_key in redis_client.scan_iter(match=f"{STATS_PREFIX}*"):
+        agent_name = redis_key.decode()[len(STATS_PREFIX) :]
+        raw = redis_client.hgetall(redis_key)
+        counters = {field: int(raw.get(field.encode(), 0)) for field in STAT_FIELDS}
+
+        pipeline_name = agent_name.split(".", 1)[0]
+        pipeline = pipelines.setdefault(
+            pipeline_name, {**{field: 0 for field in STAT_FIELDS}, "agents": {}}
+        )
+        pipeline["agents"][agent_name] = counters
+        for field in STAT_FIELDS:
+            pipeline[field] += counters[field]
+
+    for pipeline in pipelines.values():
+        lookups = pipeline["hits"] + pipeline["misses"]
+        pipeline["hit_rate"] = pipeline["hits"] / lookups if lookups else 0.0
+    return pipelines
+
+
+class CachedDynamicAgent:
+    """
+    Serves ``invoke``/``batch`` from a CacheBackend and only forwards misses to
+    the delegate. ``stream`` is passed through uncached.
+    """
+
+    def __init__(
+        self,
+        delegate,
+        backend: CacheBackend,
+        name: str,
+        model_name: str,
+        temperature: float = None,
+        response_schema: Optional[BaseModel] = None,
+        system_prompt=None,
+        middleware: list = None,
+    ):
+        self._delegate = delegate
+        self.backend = backend
+        self.name = name
+        self.model_name = model_name
+        self.temperature = temperature
+        self.response_schema = response_schema
+        self.system_prompt = system_prompt
+        self.middleware = list(middleware or [])
+
+    @property
+    def agent(self):
+        return self._delegate.agent
+
+    @property
+    def model(self):
+        return self._delegate.model
+
+    def _key(self, messages, kwargs: dict) -> str:
+        return fingerprint(
+            messages,
+            model_name=self.model_name,
+            response_schema=self.response_schema,
+            # Keyed on the prompt dynamic-prompt middleware renders, not the template
+            system_prompt=render_system_prompt(
+                self.system_prompt, self.middleware, messages, kwargs.get("context")
+            ),
+            temperature=self.temperature,
+            context=kwargs.get("context"),
+        )
+
+    def _lookup(self, key: str):
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            print(f"| LLM cache: lookup failed for '{self.name}': {e}")
+            return None
+        if entry is None:
+            return None
+        return load_response(entry["response"], self.response_schema), entry
+
+    def _store(self, key: str, response):
+        if isinstance(response, Exception):
+            # batch(..., return_exceptions=True) failures must not be cached
+            return
+        input_tokens, output_tokens = response_token_usage(response)
+        try:
+            self.backend.set(
+                key,
+                {
+                    "agent": self.name,
+                    "model": self.model_name,
+                    "created_at": time.time(),
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "response": dump_response(response),
+                },
+            )
+        except Exception as e:
+            print(f"| LLM cache: store failed for '{self.name}': {e}")
+
+    def _cached(self, key: str):
+        hit = self._lookup(key)
+        if hit is None:
+            record_cache_stats(self.name, misses=1)
+            return None
+        response, entry = hit
+        record_cache_stats(
+            self.name,
+            hits=1,
+            saved_input_tokens=entry.get("input_tokens", 0),
+            saved_output_tokens=entry.get("output_tokens", 0),
+        )
+        return response
+
+    def _cached_batch(self, messages_list, kwargs: dict):
+        """Return the batch results served from cache and the misses grouped by key."""
+        keys = [self._key(messages, kwargs) for messages in messages_list]
+        results = [None] * len(messages_list)
+        hits = deduped = saved_input_tokens = saved_output_tokens = 0
+
+        # Identical inputs within one batch are sent to the provider once
+        misses: dict[str, list[int]] = {}
+        for i, key in enumerate(keys):
+            if key in misses:
+                misses[key].append(i)
+                deduped += 1
+                continue
+            hit = self._lookup(key)
+            if hit is None:
+                misses[key] = [i]
+                continue
+            response, entry = hit
+            results[i] = response
+            hits += 1
+            saved_input_tokens += entry.get("input_tokens", 0)
+            saved_output_tokens += entry.get("output_tokens", 0)
+
+        record_cache_stats(
+            self.name,
+            hits=hits,
+            misses=len(misses),
+            deduped=deduped,
+            saved_input_tokens=saved_input_tokens,
+            saved_output_tokens=saved_output_tokens,
+        )
+        return results, misses
+
+    def _store_batch(self, results, misses: dict[str, list[int]], responses):
+        for key, response in zip(misses, responses):
+            self._store(key, response)
+            for i in misses[key]:
+                results[i] = response
+        return results
+
+    def invoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
+        key = self._key(messages, kwargs)
+        response = self._cached(key)
+        if response is None:
+            response = self._delegate.invoke(messages, *args, **kwargs)
+            self._store(key, response)
+        return response
+
+    async def ainvoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
+        key = self._key(messages, kwargs)
+        response = self._cached(key)
+        if response is None:
+            response = await self._delegate.ainvoke(messages, *args, **kwargs)
+            self._store(key, response)
+        return response
+
+    def stream(
+        self, messages: list[BaseMessage] | list[dict], *args, **kwargs
+    ) -> Iterator:
+        yield from self._delegate.stream(messages, *args, **kwargs)
+
+    async def astream(
+        self, messages: list[BaseMessage] | list[dict], *args, **kwargs
+    ) -> AsyncIterator:
+        async for chunk in self._delegate.astream(messages, *args, **kwargs):
+            yield chunk
+
+    def batch(
+        self, messages_list: list[list[BaseMessage] | list[dict]], *args, **kwargs
+    ):
+        results, misses = self._cached_batch(messages_list, kwargs)
+        if not misses:
+            return results
+        responses = self._delegate.batch(
+            [messages_list[indices[0]] for indices in misses.values()], *args, **kwargs
+        )
+        return self._store_batch(results, misses, responses)
+
+    async def abatch(
+        self, messages_list: list[list[BaseMessage] | list[dict]], *args, **kwargs
+    ):
+        results, misses = self._cached_batch(messages_list, kwargs)
+        if not misses:
+            return results
+        responses = await self._delegate.abatch(
+            [messages_list[indices[0]] for indices in misses.values()], *args, **kwargs
+        )
+        return self._store_batch(results, misses, responses)
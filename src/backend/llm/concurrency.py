@@ -0,0 +1,259 @@
+"""AIMD (additive increase, multiplicative decrease) concurrency control.
+
+Model calls pass through a gate whose limit grows by about one slot per round
+of healthy responses and is halved on 429s, timeouts or a sustained latency
+rise, the same way TCP congestion control probes for bandwidth. One controller
+is shared per agent and model within a process, so repeated fan-outs of an
+agent converge on the concurrency the provider actually sustains without
+throttling unrelated agents.
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+
+from common.configs import LlmConfig
+
+_OVERLOAD_MARKERS = ("429", "resource_exhausted", "rate limit", "503", "timeout")
+
+
+def is_overload_error(error: Exception) -> bool:
+    """Whether an error means the provider wants us to slow down."""
+    if isinstance(error, TimeoutError):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _OVERLOAD_MARKERS) or (
+        "timed out" in message
+    )
+
+
+class AimdConcurrencyController:
+    """Thread-safe concurrency limit tuned from call latencies and overload errors."""
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.1,
+        window: int = 20,
+    ):
+        """
+        Args:
+            initial: Starting limit
+            minimum: Lowest limit after backing off
+            maximum: Highest limit reachable by probing
+            decrease_factor: Multiplier applied to the limit on overload
+            latency_tolerance: A window whose median latency exceeds this
+                multiple of the baseline counts as congestion
+            smoothing: EWMA weight of new window medians in the baseline latency
+            window: Successes whose median latency is compared to the baseline.
+                Latency follows output length, so single slow answers are no
+                sign of overload
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._baseline_latency: Optional[float] = None
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._last_decrease = 0.0
+        # (loop, future) of coroutines waiting in aacquire
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+        self.successes = 0
+        self.overloads = 0
+        self.decreases = 0
+        self.peak_in_flight = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.minimum, int(self._limit))
+
+    def _enter(self):
+        self._in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._enter()
+
+    async def aacquire(self):
+        """Like :meth:`acquire`, without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._in_flight < self.limit:
+                    self._enter()
+                    return
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._cond:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self._in_flight >= self.limit:
+                return False
+            self._enter()
+            return True
+
+    def _notify_all(self):
+        # Caller holds self._cond
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # Loop already closed
+                pass
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._notify_all()
+
+    def on_success(self, latency: float):
+        with self._cond:
+            self.successes += 1
+            self._latencies.append(latency)
+            if len(self._latencies) == self._latencies.maxlen:
+                median = statistics.median(self._latencies)
+                baseline = self._baseline_latency
+                if baseline is not None and median > baseline * self.latency_tolerance:
+                    self._decrease()
+                    # The next verdict needs a full window at the new limit
+                    self._latencies.clear()
+                    self._notify_all()
+                    return
+                self._baseline_latency = (
+                    median
+                    if baseline is None
+                    else min(median, baseline + self.smoothing * (median - baseline))
+                )
+            # +1 slot per full window of healthy responses
+            self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._notify_all()
+
+    def on_overload(self):
+        with self._cond:
+            self.overloads += 1
+            self._decrease()
+
+    def _decrease(self):
+        # Calls that were already in flight fail together; only back off once
+        # per round trip so a single burst does not collapse the limit
+        now = time.monotonic()
+        if now - self._last_decrease < (self._baseline_latency or 1.0):
+            return
+        self._last_decrease = now
+        self._limit = max(self.minimum, self._limit * self.decrease_factor)
+        self.decreases += 1
+
+    def snapshot(self) -> dict:
+        """Counters at the start of a run; resets the peak in-flight watermark."""
+        with self._cond:
+            self.peak_in_flight = self._in_flight
+            return {
+                "limit": self.limit,
+                "successes": self.successes,
+                "overloads": self.overloads,
+                "decreases": self.decreases,
+                "time": time.monotonic(),
+            }
+
+    def report_since(self, start: dict) -> dict:
+        """Summary of a run started at ``start`` (see :meth:`snapshot`)."""
+        with self._cond:
+            return {
+                "start_limit": start["limit"],
+                "end_limit": self.limit,
+                "peak_in_flight": self.peak_in_flight,
+                "calls": self.successes - start["successes"],
+                "overloads": self.overloads - start["overloads"],
+                "decreases": self.decreases - start["decreases"],
+                "seconds": round(time.monotonic() - start["time"], 3),
+            }
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyMiddleware(AgentMiddleware):
+    """Gates model calls through an AimdConcurrencyController and feeds it outcomes."""
+
+    def __init__(self, controller: AimdConcurrencyController):
+        super().__init__()
+        self.controller = controller
+
+    def _on_error(self, error: Exception):
+        if is_overload_error(error):
+            self.controller.on_overload()
+
+    def wrap_model_call(self, request: ModelRequest, handler):
+        self.controller.acquire()
+        started = time.monotonic()
+        try:
+            response = handler(request)
+        except Exception as e:
+            self._on_error(e)
+            raise
+        finally:
+            self.controller.release()
+        self.controller.on_success(time.monotonic() - started)
+        return response
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        await self.controller.aacquire()
+        started = time.monotonic()
+        try:
+            response = await handler(request)
+        except Exception as e:
+            self._on_error(e)
+            raise
+        finally:
+            self.controller.release()
+        self.controller.on_success(time.monotonic() - started)
+        return response
+
+
+_controllers: dict[str, AimdConcurrencyController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_concurrency_controller(
+    agent_name: str, model_name: str
+) -> Optional[AimdConcurrencyController]:
+    """Return the process-wide controller of an agent and model, or None when disabled."""
+    if not LlmConfig.LLM_ADAPTIVE_CONCURRENCY:
+        return None
+    key = f"{agent_name}:{model_name}"
+    with _controllers_lock:
+        if key not in _controllers:
+            _controllers[key] = AimdConcurrencyController(
+                initial=LlmConfig.LLM_CONCURRENCY_INITIAL,
+                minimum=LlmConfig.LLM_CONCURRENCY_MIN,
+                maximum=LlmConfig.LLM_CONCURRENCY_MAX,
+            )
+        return _controllers[key]
@@ -1,15 +1,48 @@
 from langchain_core.messages import BaseMessage
 from pydantic import BaseModel
-from typing import Iterator, Literal, Callable, Optional
+from typing import AsyncIterator, Iterator, Literal, Callable, Optional
 
+from common.configs import LlmConfig
 from .gemini_dynamic_agent import GenimiDynamicAgent
 from .openai_dynamic_agent import OpenAIDynamicAgent
+from .replay_dynamic_agent import ReplayDynamicAgent
+from .cache import CachedDynamicAgent, get_cache_backend
+from .concurrency import ConcurrencyMiddleware, get_concurrency_controller
+from .metrics import MetricsMiddleware, agent_scope
+from .prefix_cache import PrefixCacheMiddleware
+from .hedging import HedgingMiddleware, hedging_disabled
+from .rate_limiter import get_rate_limiter
 
 
 class DynamicAgent:
     """
     Wrapper that delegates to GeminiDynamicAgent or OpenAIDynamicAgent
     based on the ``family`` parameter.
+
+    With ``replay_mode="replay"`` responses are served from an on-disk cassette
+    (see ReplayDynamicAgent) and the provider is only called to record misses.
+
+    With ``cache=True`` and ``LLM_CACHE_BACKEND`` set, ``invoke``/``batch``
+    responses are cached by content (see CachedDynamicAgent). Only enable it for
+    agents whose answer depends on their input alone, not on tool results.
+
+    With ``LLM_ADAPTIVE_CONCURRENCY`` on, model calls go through the AIMD
+    controller of the agent and model (see AimdConcurrencyController) and
+    ``batch`` / ``abatch`` report the concurrency level they ran at in
+    ``last_batch_report``.
+
+    Every model attempt is recorded by MetricsMiddleware under the agent ``name``.
+
+    ``static_prefix`` (e.g. a few-shot history) is put in front of the messages
+    of every call, right after the system prompt. With ``prefix_cache`` on
+    (``LLM_PREFIX_CACHE``, off by default), that stable prefix is served from the
+    provider's prompt cache (see PrefixCacheMiddleware) so batches only pay for
+    the variable tail.
+
+    With ``hedge=True``, single calls slower than the ``LLM_HEDGE_PERCENTILE``
+    latency of the agent are duplicated on another key or model and the first
+    answer wins (see HedgingMiddleware). Meant for interactive agents; batch
+    calls are never hedged.
     """
 
     def __init__(
@@ -32,8 +65,47 @@ class DynamicAgent:
         retry_on: tuple = (Exception,),
         top_p: float = 1.0,
         alternative_model_names: list[str] = [],
+        name: str = None,
+        replay_mode: Literal["off", "replay"] = LlmConfig.LLM_REPLAY_MODE,
+        cassette_dir: str = LlmConfig.LLM_CASSETTE_DIR,
+        cache: bool = False,
+        static_prefix: list[BaseMessage] = None,
+        prefix_cache: bool = LlmConfig.LLM_PREFIX_CACHE,
+        hedge: bool = False,
     ):
-        if model_provider == "openai":
+        self.name = name or (response_schema.__name__ if response_schema else "agent")
+        has_live_key = any(key and key.strip() for key in api_keys or [])
+        self.last_batch_report = None
+        self.static_prefix = list(static_prefix or [])
+
+        # Kept apart: cache and cassette keys render the prompt through them
+        caller_middleware = list(middleware or [])
+        middleware = list(caller_middleware)
+        hedging = None
+        if hedge:
+            hedging = HedgingMiddleware(
+                self.name,
+                percentile=LlmConfig.LLM_HEDGE_PERCENTILE,
+                min_samples=LlmConfig.LLM_HEDGE_MIN_SAMPLES,
+                min_delay_seconds=LlmConfig.LLM_HEDGE_MIN_DELAY_SECONDS,
+            )
+            # Outside the concurrency gate and metrics: each copy is a call. It
+            # runs inside the rate limiter, so hedges acquire their own token
+            middleware.append(hedging)
+        self._concurrency = get_concurrency_controller(self.name, model_name)
+        if self._concurrency is not None:
+            middleware.append(ConcurrencyMiddleware(self._concurrency))
+        # Innermost, so that latency covers the model call alone
+        middleware.append(MetricsMiddleware(self.name))
+        if prefix_cache and not tools:
+            middleware.append(
+                PrefixCacheMiddleware(model_provider, self.name, self.static_prefix)
+            )
+
+        if replay_mode == "replay" and not has_live_key:
+            # Offline: everything must come from the cassette
+            self._delegate = None
+        elif model_provider == "openai":
             self._delegate = OpenAIDynamicAgent(
                 model_name=model_name,
                 api_keys=api_keys,
@@ -69,6 +141,36 @@ class DynamicAgent:
                 alternative_model_names=alternative_model_names,
             )
 
+        if hedging is not None and self._delegate is not None:
+            hedging.api_keys = self._delegate.api_keys
+            hedging.alternative_model_names = self._delegate.alternative_model_names
+            hedging.model_for_key = self._delegate._model_for_key
+            hedging.limiter = get_rate_limiter()
+
+        if replay_mode == "replay":
+            self._delegate = ReplayDynamicAgent(
+                delegate=self._delegate,
+                name=self.name,
+                model_name=model_name,
+                cassette_dir=cassette_dir,
+                response_schema=response_schema,
+                system_prompt=system_prompt,
+                middleware=caller_middleware,
+            )
+
+        cache_backend = get_cache_backend() if cache else None
+        if cache_backend is not None:
+            self._delegate = CachedDynamicAgent(
+                delegate=self._delegate,
+                backend=cache_backend,
+                name=self.name,
+                model_name=model_name,
+                temperature=temperature,
+                response_schema=response_schema,
+                system_prompt=system_prompt,
+                middleware=caller_middleware,
+            )
+
     @property
     def agent(self):
         return self._delegate.agent
@@ -81,15 +183,78 @@ class DynamicAgent:
     def response_schema(self):
         return self._delegate.response_schema
 
+    def _with_prefix(self, messages: list[BaseMessage] | list[dict]) -> list:
+        # Stable prefix first so the provider can cache it
+        return self.static_prefix + list(messages)
+
     def invoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
-        return self._delegate.invoke(messages, *args, **kwargs)
+        with agent_scope(self.name):
+            return self._delegate.invoke(self._with_prefix(messages), *args, **kwargs)
 
     def stream(
         self, messages: list[BaseMessage] | list[dict], *args, **kwargs
     ) -> Iterator:
-        yield from self._delegate.stream(messages, *args, **kwargs)
+        with agent_scope(self.name):
+            yield from self._delegate.stream(
+                self._with_prefix(messages), *args, **kwargs
+            )
+
+    def _batch_config(self, args: tuple, kwargs: dict):
+        # Let the controller, not the thread pool size, bound in-flight calls
+        if self._concurrency is not None and not args and "config" not in kwargs:
+            kwargs["config"] = {"max_concurrency": self._concurrency.maximum}
+
+    def _report_batch(self, size: int, start: dict):
+        report = {"agent": self.name, "items": size}
+        report.update(self._concurrency.report_since(start))
+        self.last_batch_report = report
+        print(
+            f"| {self.name}: batch of {size} took {report['seconds']}s at concurrency "
+            f"{report['start_limit']} -> {report['end_limit']} "
+            f"(peak {report['peak_in_flight']} in flight, {report['overloads']} overloads)"
+        )
 
     def batch(
         self, messages_list: list[list[BaseMessage] | list[dict]], *args, **kwargs
     ):
-        return self._delegate.batch(messages_list, *args, **kwargs)
+        messages_list = [self._with_prefix(messages) for messages in messages_list]
+        with agent_scope(self.name), hedging_disabled():
+            if self._concurrency is None:
+                return self._delegate.batch(messages_list, *args, **kwargs)
+
+            self._batch_config(args, kwargs)
+            start = self._concurrency.snapshot()
+            try:
+                return self._delegate.batch(messages_list, *args, **kwargs)
+            finally:
+                self._report_batch(len(messages_list), start)
+
+    async def ainvoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
+        with agent_scope(self.name):
+            return await self._delegate.ainvoke(
+                self._with_prefix(messages), *args, **kwargs
+            )
+
+    async def astream(
+        self, messages: list[BaseMessage] | list[dict], *args, **kwargs
+    ) -> AsyncIterator:
+        with agent_scope(self.name):
+            async for chunk in self._delegate.astream(
+                self._with_prefix(messages), *args, **kwargs
+            ):
+                yield chunk
+
+    async def abatch(
+        self, messages_list: list[list[BaseMessage] | list[dict]], *args, **kwargs
+    ):
+        messages_list = [self._with_prefix(messages) for messages in messages_list]
+        with agent_scope(self.name), hedging_disabled():
+            if self._concurrency is None:
+                return await self._delegate.abatch(messages_list, *args, **kwargs)
+
+            self._batch_config(args, kwargs)
+            start = self._concurrency.snapshot()
+            try:
+                return await self._delegate.abatch(messages_list, *args, **kwargs)
+            finally:
+                self._report_batch(len(messages_list), start)
@@ -0,0 +1,167 @@
+"""Deterministic fingerprints and (de)serialization of agent calls and responses."""
+
+import dataclasses
+import hashlib
+import json
+from typing import Any, Optional
+
+from langchain_core.messages import (
+    BaseMessage,
+    message_to_dict,
+    messages_from_dict,
+    messages_to_dict,
+)
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langgraph.runtime import Runtime, get_runtime
+from pydantic import BaseModel
+
+
+def normalize(obj: Any):
+    """Convert an arbitrary call argument into a JSON-stable structure.
+
+    Values that cannot be represented (DB sessions, clients...) are replaced by
+    their type name so that they do not make the fingerprint non-deterministic.
+    """
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, BaseMessage):
+        data = message_to_dict(obj)
+        data["data"].pop("id", None)
+        return data
+    if isinstance(obj, dict):
+        return {str(k): normalize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [normalize(v) for v in obj]
+    if isinstance(obj, BaseModel):
+        return {name: normalize(getattr(obj, name)) for name in type(obj).model_fields}
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {
+            f.name: normalize(getattr(obj, f.name)) for f in dataclasses.fields(obj)
+        }
+    if isinstance(obj, type) and issubclass(obj, BaseModel):
+        return obj.model_json_schema()
+    if callable(obj):
+        return getattr(obj, "__qualname__", type(obj).__name__)
+    return type(obj).__name__
+
+
+def fingerprint(
+    messages,
+    model_name: str = None,
+    response_schema: Optional[type[BaseModel]] = None,
+    system_prompt=None,
+    **extra,
+) -> str:
+    """Return a sha256 hex digest identifying an agent call.
+
+    Args:
+        messages: Input messages (BaseMessage, dict or a list of them)
+        model_name: Model the call is sent to
+        response_schema: Structured output schema, if any
+        system_prompt: Static system prompt or dynamic prompt callable
+        extra: Any other value that influences the response (agent name, runtime context...)
+    """
+    payload = {
+        "model": model_name,
+        "schema": normalize(response_schema),
+        "system_prompt": normalize(system_prompt),
+        "messages": normalize(messages),
+        "extra": normalize(extra),
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _inherited_context():
+    # An agent called inside a graph node without ``context`` runs with the
+    # runtime context of the outer graph run
+    try:
+        runtime = get_runtime()
+    except (RuntimeError, KeyError):
+        return None
+    return runtime.context if runtime is not None else None
+
+
+def render_system_prompt(system_prompt, middleware: list, messages, context=None):
+    """Return the system prompt a call is actually sent with.
+
+    Middleware such as ``@dynamic_prompt`` rewrites the system prompt of every
+    model call, e.g. from a template and the runtime context, so the prompt the
+    agent was built with does not identify the call. The caller's middleware is
+    run on a request that never reaches a model, and the prompt it would have
+    sent is returned. Falls back to ``system_prompt`` when there is nothing to
+    render or rendering fails.
+
+    Args:
+        system_prompt: Static system prompt the agent was built with
+        middleware: Middleware passed by the caller, before the agent's own
+        messages: Input messages of the call
+        context: Runtime context passed to the call, if any
+    """
+    wrappers = [
+        m
+        for m in middleware or []
+        if type(m).wrap_model_call is not AgentMiddleware.wrap_model_call
+    ]
+    if not wrappers:
+        return system_prompt
+
+    rendered = []
+
+    def capture(request: ModelRequest) -> ModelResponse:
+        rendered.append(request.system_message)
+        return ModelResponse(result=[])
+
+    def wrap(m: AgentMiddleware, inner):
+        return lambda request: m.wrap_model_call(request, inner)
+
+    handler = capture
+    for m in reversed(wrappers):
+        handler = wrap(m, handler)
+
+    try:
+        handler(
+            ModelRequest(
+                model=None,
+                messages=list(messages),
+                system_prompt=system_prompt if isinstance(system_prompt, str) else None,
+                state={"messages": list(messages)},
+                runtime=Runtime(
+                    context=context if context is not None else _inherited_context()
+                ),
+            )
+        )
+    except Exception:
+        return system_prompt
+    return rendered[0] if rendered else system_prompt
+
+
+def dump_response(response) -> dict:
+    """Serialize an agent response (``{"messages": [...], "structured_response": ...}``)."""
+    if not isinstance(response, dict):
+        return {"raw": normalize(response)}
+
+    structured = response.get("structured_response")
+    if isinstance(structured, BaseModel):
+        structured = structured.model_dump(mode="json")
+
+    return {
+        "messages": messages_to_dict(response.get("messages", [])),
+        "structured_response": structured,
+    }
+
+
+def load_response(data: dict, response_schema: Optional[type[BaseModel]] = None):
+    """Inverse of :func:`dump_response`."""
+    if "raw" in data:
+        return data["raw"]
+
+    response = {"messages": messages_from_dict(data.get("messages", []))}
+    structured = data.get("structured_response")
+    if structured is not None:
+        response["structured_response"] = (
+            response_schema.model_validate(structured)
+            if response_schema
+            else structured
+        )
+    return response
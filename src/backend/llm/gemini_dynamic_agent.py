@@ -5,13 +5,18 @@ from langchain_google_genai.chat_models import ChatGoogleGenerativeAI
 from langchain_core.messages import BaseMessage
 from pydantic import BaseModel
 import random
-from typing import Iterator, Literal, Callable, Optional
+from typing import AsyncIterator, Iterator, Literal, Callable, Optional
 
 from utils.json_processor import schema_without_titles
+from .rate_limiter import RateLimitMiddleware, get_rate_limiter
+from .metrics import record_rotation
 
 
 class RotationMiddleware:
-    """Middleware to rotate API keys on retries."""
+    """
+    Middleware to rotate API keys on retries. When a rate limiter dispatches the
+    calls (``rotate_api_keys=False``), 429s are left to it and only models rotate.
+    """
 
     def __init__(
         self,
@@ -19,8 +24,10 @@ class RotationMiddleware:
         on_api_key_rotate: Callable[[str], None],
         model_names: list[str],
         on_model_rotate: Callable[[str], None],
+        rotate_api_keys: bool = True,
     ):
         self.api_keys = api_keys
+        self.rotate_api_keys = rotate_api_keys
         self.on_api_key_rotate = on_api_key_rotate
         # self.model = model
         self._cur_api_idx = random.randint(0, len(api_keys) - 1)
@@ -31,13 +38,16 @@ class RotationMiddleware:
     def __call__(self, exception: Exception) -> str:
         """Rotate to next API key and return error message."""
         exception_str = str(exception)
-        if "429" in exception_str and self.api_keys:
+        if "429" in exception_str and not self.rotate_api_keys:
+            print(f"Rate limited, key selection left to the limiter: {exception_str}")
+        elif "429" in exception_str and self.api_keys:
             self._cur_api_idx = (self._cur_api_idx + 1) % len(self.api_keys)
             # self.model.google_api_key = self.api_keys[self._current_index]
             print(
                 f"Rotated to API key index: {self._cur_api_idx}. Reason: {exception_str}"
             )
             self.on_api_key_rotate(self.api_keys[self._cur_api_idx])
+            record_rotation("api_key")
         elif self.model_names:
             # We are using Gemini, most errors occur because of Service Exhaustion, so we rotate the model instead of the API key
             self._cur_model_idx = (self._cur_model_idx + 1) % len(self.model_names)
@@ -45,6 +55,7 @@ class RotationMiddleware:
                 f"Rotated to model index: {self._cur_model_idx}. Reason: {exception_str}"
             )
             self.on_model_rotate(self.model_names[self._cur_model_idx])
+            record_rotation("model")
 
         return f"Retrying with different API key after error: {str(exception)}"
 
@@ -98,12 +109,9 @@ class GenimiDynamicAgent:
 
         self.api_keys = api_keys
         self._api_key_index = random.randint(0, len(api_keys) - 1)
-
-        # Initialize model
-        self.model = ChatGoogleGenerativeAI(
-            model=model_name,
+        self._model_name = model_name
+        self._model_kwargs = dict(
             temperature=temperature,
-            google_api_key=api_keys[self._api_key_index],
             response_mime_type=response_mime_type,
             response_schema=(
                 schema_without_titles(response_schema) if response_schema else None
@@ -111,6 +119,15 @@ class GenimiDynamicAgent:
             max_retries=0,  # Disable model-level retries, use middleware instead
             top_p=top_p,
         )
+        self._key_models = {}
+        self.alternative_model_names = list(alternative_model_names)
+
+        # Initialize model
+        self.model = ChatGoogleGenerativeAI(
+            model=model_name,
+            google_api_key=api_keys[self._api_key_index],
+            **self._model_kwargs,
+        )
 
         # Setup middleware
         middleware_list = middleware or []
@@ -120,6 +137,9 @@ class GenimiDynamicAgent:
 
         def on_model_rotate(new_model: str):
             self.model.model = new_model
+            self._model_name = new_model
+
+        rate_limiter = get_rate_limiter()
 
         if model_name in alternative_model_names:
             print(
@@ -131,6 +151,7 @@ class GenimiDynamicAgent:
             on_api_key_rotate=on_api_key_rotate,
             model_names=alternative_model_names,
             on_model_rotate=on_model_rotate,
+            rotate_api_keys=rate_limiter is None,
         )
 
         # Add retry middleware with exponential backoff and API key rotation
@@ -145,6 +166,11 @@ class GenimiDynamicAgent:
         )
 
         middleware_list.insert(0, retry_middleware)
+        if rate_limiter is not None:
+            # Inside the retry loop so that every attempt is admission controlled
+            middleware_list.insert(
+                1, RateLimitMiddleware(rate_limiter, api_keys, self._model_for_key)
+            )
 
         # Create agent with middleware
         self.agent = create_agent(
@@ -159,6 +185,18 @@ class GenimiDynamicAgent:
 
         self.response_schema = response_schema
 
+    def _model_for_key(
+        self, api_key: str, model_name: str = None
+    ) -> tuple[str, ChatGoogleGenerativeAI]:
+        """Return the model name (current by default) and an instance bound to ``api_key``."""
+        model_name = model_name or self._model_name
+        cache_key = (api_key, model_name)
+        if cache_key not in self._key_models:
+            self._key_models[cache_key] = ChatGoogleGenerativeAI(
+                model=model_name, google_api_key=api_key, **self._model_kwargs
+            )
+        return model_name, self._key_models[cache_key]
+
     def invoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
         """
         Invoke the agent with automatic retry and API key rotation.
@@ -203,3 +241,46 @@ class GenimiDynamicAgent:
         return self.agent.batch(
             [{"messages": msgs} for msgs in messages_list], *args, **kwargs
         )
+
+    async def ainvoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
+        """
+        Async counterpart of ``invoke``; the model call does not block the event loop.
+
+        Args:
+            messages: Input messages
+
+        Returns:
+            Agent response with structured output if schema provided
+        """
+        return await self.agent.ainvoke({"messages": messages}, *args, **kwargs)
+
+    async def astream(
+        self, messages: list[BaseMessage] | list[dict], *args, **kwargs
+    ) -> AsyncIterator:
+        """
+        Async counterpart of ``stream``.
+
+        Args:
+            messages: Input messages
+
+        Yields:
+            Response chunks
+        """
+        async for chunk in self.agent.astream({"messages": messages}, *args, **kwargs):
+            yield chunk
+
+    async def abatch(
+        self, messages_list: list[list[BaseMessage] | list[dict]], *args, **kwargs
+    ):
+        """
+        Async counterpart of ``batch``; requests run concurrently on the event loop.
+
+        Args:
+            messages_list: list of message sets
+
+        Returns:
+            list of agent responses
+        """
+        return await self.agent.abatch(
+            [{"messages": msgs} for msgs in messages_list], *args, **kwargs
+        )
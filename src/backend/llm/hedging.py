@@ -0,0 +1,245 @@
+"""Hedged model calls for latency-sensitive agents.
+
+Interactive features (Gherkin suggestions, chat titles) suffer from the slow
+tail of provider latencies, not from the average. HedgingMiddleware lets a
+call run alone until it exceeds a latency percentile of the agent's recent
+calls, then sends a duplicate on another API key (or an alternative model) and
+returns whichever answer arrives first. With a rate limiter the duplicate waits
+for a token of its own key like any other call. Hedges and hedge wins are
+counted in the LLM metrics so the extra cost stays visible.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+
+from .metrics import record_llm_call
+from .rate_limiter import RateLimitMiddleware, TokenBucketRateLimiter
+
+_hedging_enabled: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "llm_hedging_enabled", default=True
+)
+
+# Hedges only wait on the network; a small shared pool is enough
+_POOL_SIZE = 16
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=_POOL_SIZE, thread_name_prefix="llm-hedge"
+)
+_pool_slots = threading.BoundedSemaphore(_POOL_SIZE)
+
+
+def _submit(fn, *args) -> Optional[concurrent.futures.Future]:
+    """
+    Runs ``fn`` on the pool if a thread is free, else returns None. Calls never
+    queue: a queued call would look slow and be hedged for the wrong reason.
+    """
+    if not _pool_slots.acquire(blocking=False):
+        return None
+
+    def run():
+        try:
+            return fn(*args)
+        finally:
+            _pool_slots.release()
+
+    return _executor.submit(contextvars.copy_context().run, run)
+
+
+@contextmanager
+def hedging_disabled():
+    """Never hedge calls made inside the block (batch fan-outs)."""
+    token = _hedging_enabled.set(False)
+    try:
+        yield
+    finally:
+        _hedging_enabled.reset(token)
+
+
+class LatencyTracker:
+    """Sliding window of call latencies answering percentile queries."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _api_key_of(model) -> Optional[str]:
+    secret = getattr(model, "google_api_key", None) or getattr(
+        model, "openai_api_key", None
+    )
+    return secret.get_secret_value() if secret is not None else None
+
+
+class HedgingMiddleware(AgentMiddleware):
+    """
+    Duplicates a model call that runs longer than the ``percentile`` latency of
+    the agent and keeps the first successful answer. Async losers are cancelled;
+    a sync loser cannot be interrupted, its thread finishes and is discarded.
+    """
+
+    def __init__(
+        self,
+        agent_name: str,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        min_delay_seconds: float = 0.5,
+    ):
+        """
+        Args:
+            agent_name: Name the hedge counters are recorded under
+            percentile: Latency percentile after which a hedge is sent
+            min_samples: Calls observed before hedging starts
+            min_delay_seconds: Never hedge earlier than this
+        """
+        super().__init__()
+        self.agent_name = agent_name
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay_seconds = min_delay_seconds
+        self.latencies = LatencyTracker()
+        # Bound by DynamicAgent once the provider agent exists
+        self.api_keys: list[str] = []
+        self.alternative_model_names: list[str] = []
+        self.model_for_key: Optional[Callable[..., tuple]] = None
+        self.limiter: Optional[TokenBucketRateLimiter] = None
+
+    def _delay(self) -> Optional[float]:
+        if not _hedging_enabled.get() or self.model_for_key is None:
+            return None
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay_seconds, self.latencies.percentile(self.percentile))
+
+    def _hedge(self, request: ModelRequest, handler, is_async: bool = False):
+        """
+        Returns a callable sending the same request on another key, else on an
+        alternative model, or None when there is nowhere to hedge to.
+        """
+        primary_key = _api_key_of(request.model)
+        other_keys = [
+            key for key in self.api_keys if key and key.strip() and key != primary_key
+        ]
+        if other_keys:
+            keys, model_for_key = other_keys, self.model_for_key
+        elif primary_key and self.alternative_model_names:
+            keys = [primary_key]
+            model_for_key = functools.partial(
+                self.model_for_key, model_name=self.alternative_model_names[0]
+            )
+        else:
+            return None
+
+        if self.limiter is None:
+            _, model = model_for_key(random.choice(keys))
+            hedge_request = request.override(model=model)
+            return lambda: handler(hedge_request)
+        # The primary call already holds a token; the hedge acquires its own
+        rate_limit = RateLimitMiddleware(self.limiter, keys, model_for_key)
+        if is_async:
+            return lambda: rate_limit.awrap_model_call(request, handler)
+        return lambda: rate_limit.wrap_model_call(request, handler)
+
+    def _record(self, hedged: bool, hedge_won: bool):
+        if hedged:
+            record_llm_call(self.agent_name, hedges=1, hedge_wins=int(hedge_won))
+
+    def wrap_model_call(self, request: ModelRequest, handler):
+        delay = self._delay()
+        started = time.monotonic()
+        if delay is None:
+            response = handler(request)
+            self.latencies.add(time.monotonic() - started)
+            return response
+
+        primary = _submit(handler, request)
+        if primary is None:
+            # Pool busy: run the call here, unhedged
+            response = handler(request)
+            self.latencies.add(time.monotonic() - started)
+            return response
+        try:
+            response = primary.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            pass
+        else:
+            self.latencies.add(time.monotonic() - started)
+            return response
+
+        hedge_call = self._hedge(request, handler)
+        hedge = _submit(hedge_call) if hedge_call is not None else None
+        if hedge is None:
+            response = primary.result()
+            self.latencies.add(time.monotonic() - started)
+            return response
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    self.latencies.add(time.monotonic() - started)
+                    self._record(hedged=True, hedge_won=future is hedge)
+                    return future.result()
+        self._record(hedged=True, hedge_won=False)
+        raise primary.exception()
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        delay = self._delay()
+        started = time.monotonic()
+        if delay is None:
+            response = await handler(request)
+            self.latencies.add(time.monotonic() - started)
+            return response
+
+        primary = asyncio.ensure_future(handler(request))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        hedge_call = None if done else self._hedge(request, handler, is_async=True)
+        if hedge_call is None:
+            response = await primary
+            self.latencies.add(time.monotonic() - started)
+            return response
+
+        hedge = asyncio.ensure_future(hedge_call())
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies.add(time.monotonic() - started)
+                        self._record(hedged=True, hedge_won=task is hedge)
+                        return task.result()
+        finally:
+            for loser in pending:
+                loser.cancel()
+        self._record(hedged=True, hedge_won=False)
+        raise primary.exception()
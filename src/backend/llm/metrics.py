@@ -0,0 +1,329 @@
+"""Token, latency, retry and rotation instrumentation of LLM calls.
+
+MetricsMiddleware records every model attempt of a DynamicAgent: prompt and
+completion tokens, wall latency, failed attempts (retried by
+ModelRetryMiddleware) and key/model rotations. Calls are attributed to:
+
+- the agent (``DynamicAgent.name``)
+- the LangGraph node they run in, taken from the checkpoint namespace the
+  agent inherits from the enclosing graph
+- the current run, opened with :func:`track_run` around a pipeline
+
+Aggregates are kept in Redis so that every RQ worker contributes to the
+``/metrics`` endpoint, and :meth:`RunMetrics.summary` gives the per-run view.
+Counters are buffered in process and written by a background thread, so a model
+attempt (possibly on the event loop) never waits on Redis.
+"""
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage
+from langgraph.config import get_config
+
+from common.redis_app import redis_client
+
+METRICS_PREFIX = "llm_metrics:"
+COUNTER_FIELDS = (
+    "calls",
+    "failed_attempts",
+    "prompt_tokens",
+    "cached_prompt_tokens",
+    "completion_tokens",
+    "latency_seconds",
+    "rotations",
+    "hedges",
+    "hedge_wins",
+)
+NO_NODE = "-"
+FLUSH_INTERVAL_SECONDS = 1.0
+
+
+def _empty_counters() -> dict:
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+class RunMetrics:
+    """Aggregated LLM usage of one pipeline run, per node and per agent."""
+
+    def __init__(self, kind: str, run_id: str):
+        self.kind = kind
+        self.run_id = run_id
+        self.started = time.monotonic()
+        self.ended: Optional[float] = None
+        self.totals = _empty_counters()
+        self.nodes: dict[str, dict] = {}
+        self.agents: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, node: str, agent: str, **increments):
+        with self._lock:
+            for counters in (
+                self.totals,
+                self.nodes.setdefault(node, _empty_counters()),
+                self.agents.setdefault(agent, _empty_counters()),
+            ):
+                for field, value in increments.items():
+                    counters[field] += value
+
+    def summary(self) -> dict:
+        ended = self.ended or time.monotonic()
+
+        def rounded(counters: dict) -> dict:
+            return {
+                **counters,
+                "latency_seconds": round(counters["latency_seconds"], 3),
+            }
+
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "run_id": self.run_id,
+                "wall_seconds": round(ended - self.started, 3),
+                "totals": rounded(self.totals),
+                "nodes": {name: rounded(c) for name, c in self.nodes.items()},
+                "agents": {name: rounded(c) for name, c in self.agents.items()},
+            }
+
+
+_current_run: ContextVar[Optional[RunMetrics]] = ContextVar(
+    "llm_current_run", default=None
+)
+
+
+@contextmanager
+def track_run(kind: str, run_id: str):
+    """Attribute every LLM call made inside the block to a new RunMetrics.
+
+    Args:
+        kind: Pipeline name ("analysis", "taxonomy", "proposal"...)
+        run_id: Identifier of the run, e.g. the analysis id
+    """
+    run = RunMetrics(kind, run_id)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+        run.ended = time.monotonic()
+        summary = run.summary()
+        _buffer(
+            f"{METRICS_PREFIX}run:{kind}",
+            {"runs": 1, "wall_seconds": summary["wall_seconds"]},
+        )
+        # RQ work horses exit without atexit hooks: write the run before leaving
+        flush_metrics()
+        totals = summary["totals"]
+        print(
+            f"| LLM metrics for {kind} run {run_id}: {totals['calls']} calls, "
+            f"{totals['prompt_tokens']} prompt + {totals['completion_tokens']} completion tokens, "
+            f"{totals['failed_attempts']} failed attempts, {totals['rotations']} rotations, "
+            f"{summary['wall_seconds']}s wall"
+        )
+
+
+def current_node() -> str:
+    """Top-level LangGraph node of the current call, or NO_NODE outside a graph."""
+    try:
+        namespace = get_config().get("configurable", {}).get("checkpoint_ns", "")
+    except RuntimeError:
+        return NO_NODE
+    # "outer_node:<id>|<task>|model:<id>": the agent's own "model" node is last
+    segments = [s for s in namespace.split("|") if not s.isdigit()]
+    if len(segments) < 2:
+        return NO_NODE
+    return segments[0].split(":", 1)[0]
+
+
+_pending: dict[str, dict] = {}
+_pending_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+
+
+def _buffer(redis_key: str, increments: dict):
+    global _flusher
+    with _pending_lock:
+        counters = _pending.setdefault(redis_key, {})
+        for field, value in increments.items():
+            if value:
+                counters[field] = counters.get(field, 0) + value
+        # Started lazily so that forked workers get their own flusher
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(
+                target=_flush_forever, name="llm-metrics-flush", daemon=True
+            )
+            _flusher.start()
+
+
+def _flush_forever():
+    while True:
+        time.sleep(FLUSH_INTERVAL_SECONDS)
+        flush_metrics()
+
+
+def flush_metrics():
+    """Write the buffered counters to Redis in one pipeline."""
+    with _pending_lock:
+        pending = {key: counters for key, counters in _pending.items() if counters}
+        _pending.clear()
+    if not pending:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        for redis_key, increments in pending.items():
+            for field, value in increments.items():
+                if isinstance(value, float):
+                    pipe.hincrbyfloat(redis_key, field, value)
+                else:
+                    pipe.hincrby(redis_key, field, value)
+        pipe.execute()
+    except Exception as e:
+        # Metrics must never fail an LLM call
+        print(f"| LLM metrics: failed to record {len(pending)} keys: {e}")
+
+
+def _reset_after_fork():
+    # The parent flushes its own buffer; the lock may have been held at fork time
+    global _pending_lock, _flusher
+    _pending.clear()
+    _pending_lock = threading.Lock()
+    _flusher = None
+
+
+atexit.register(flush_metrics)
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def record_llm_call(agent: str, **increments):
+    """Add counters for one model attempt to the current run and to the Redis buffer."""
+    run = _current_run.get()
+    node = current_node()
+    kind = run.kind if run else "adhoc"
+    if run is not None:
+        run.add(node, agent, **increments)
+    _buffer(f"{METRICS_PREFIX}agent:{agent}", increments)
+    _buffer(f"{METRICS_PREFIX}node:{kind}:{node}", increments)
+
+
+_current_agent: ContextVar[Optional[str]] = ContextVar(
+    "llm_current_agent", default=None
+)
+
+
+@contextmanager
+def agent_scope(agent: str):
+    """Mark the agent making calls inside the block (used to attribute rotations)."""
+    token = _current_agent.set(agent)
+    try:
+        yield
+    finally:
+        _current_agent.reset(token)
+
+
+def record_rotation(reason: str):
+    """Count an API key or model rotation of the agent currently calling."""
+    record_llm_call(_current_agent.get() or "unknown", rotations=1)
+
+
+def _usage(response) -> tuple[int, int, int]:
+    messages = response.result if isinstance(response, ModelResponse) else [response]
+    prompt_tokens = cached_prompt_tokens = completion_tokens = 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        if isinstance(message, AIMessage) and usage:
+            prompt_tokens += usage.get("input_tokens", 0)
+            cached_prompt_tokens += (usage.get("input_token_details") or {}).get(
+                "cache_read", 0
+            )
+            completion_tokens += usage.get("output_tokens", 0)
+    return prompt_tokens, cached_prompt_tokens, completion_tokens
+
+
+class MetricsMiddleware(AgentMiddleware):
+    """Records each model attempt of an agent; innermost so latency is the call alone."""
+
+    def __init__(self, agent_name: str):
+        super().__init__()
+        self.agent_name = agent_name
+
+    def _record(self, started: float, response=None):
+        latency = time.monotonic() - started
+        if response is None:
+            record_llm_call(self.agent_name, failed_attempts=1, latency_seconds=latency)
+            return
+        prompt_tokens, cached_prompt_tokens, completion_tokens = _usage(response)
+        record_llm_call(
+            self.agent_name,
+            calls=1,
+            prompt_tokens=prompt_tokens,
+            cached_prompt_tokens=cached_prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_seconds=latency,
+        )
+
+    def wrap_model_call(self, request: ModelRequest, handler):
+        started = time.monotonic()
+        try:
+            response = handler(request)
+        except Exception:
+            self._record(started)
+            raise
+        self._record(started, response)
+        return response
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        started = time.monotonic()
+        try:
+            response = await handler(request)
+        except Exception:
+            self._record(started)
+            raise
+        self._record(started, response)
+        return response
+
+
+def get_llm_metrics() -> dict:
+    """Return the Redis aggregates by agent, by pipeline node and by pipeline."""
+    flush_metrics()
+    metrics = {"agents": {}, "nodes": {}, "runs": {}}
+    for redis_key in redis_client.scan_iter(match=f"{METRICS_PREFIX}*"):
+        _, scope, name = redis_key.decode().split(":", 2)
+        values = {
+            field.decode(): float(value)
+            for field, value in redis_client.hgetall(redis_key).items()
+        }
+        if scope == "agent":
+            metrics["agents"][name] = values
+        elif scope == "node":
+            metrics["nodes"][name] = values
+        elif scope == "run":
+            metrics["runs"][name] = values
+    return metrics
+
+
+def render_prometheus() -> str:
+    """Render :func:`get_llm_metrics` in the Prometheus text exposition format."""
+    metrics = get_llm_metrics()
+    lines = []
+
+    def emit(metric: str, labels: dict, value: float):
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+        lines.append(f"karela_llm_{metric}{{{label_text}}} {value:g}")
+
+    for agent, values in sorted(metrics["agents"].items()):
+        for field, value in sorted(values.items()):
+            emit(f"agent_{field}_total", {"agent": agent}, value)
+    for name, values in sorted(metrics["nodes"].items()):
+        pipeline, node = name.split(":", 1)
+        for field, value in sorted(values.items()):
+            emit(f"node_{field}_total", {"pipeline": pipeline, "node": node}, value)
+    for pipeline, values in sorted(metrics["runs"].items()):
+        for field, value in sorted(values.items()):
+            emit(f"run_{field}_total", {"pipeline": pipeline}, value)
+    return "\n".join(lines) + "\n"
@@ -5,9 +5,10 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage
 from pydantic import BaseModel
 import random
-from typing import Iterator, Literal, Callable, Optional
+from typing import AsyncIterator, Iterator, Literal, Callable, Optional
 
 from llm.gemini_dynamic_agent import RotationMiddleware
+from llm.rate_limiter import RateLimitMiddleware, get_rate_limiter
 
 
 class OpenAIDynamicAgent:
@@ -38,14 +39,20 @@ class OpenAIDynamicAgent:
 
         self.api_keys = api_keys
         self._api_key_index = random.randint(0, len(api_keys) - 1)
+        self._model_name = model_name
+        self._model_kwargs = dict(
+            temperature=temperature,
+            max_retries=0,  # Disable model-level retries, use middleware instead
+            # top_p=top_p,
+        )
+        self._key_models = {}
+        self.alternative_model_names = list(alternative_model_names)
 
         # Initialize model
         self.model = ChatOpenAI(
             model=model_name,
-            temperature=temperature,
             openai_api_key=api_keys[self._api_key_index],
-            max_retries=0,  # Disable model-level retries, use middleware instead
-            # top_p=top_p,
+            **self._model_kwargs,
         )
 
         # Setup middleware
@@ -56,6 +63,9 @@ class OpenAIDynamicAgent:
 
         def on_model_rotate(new_model: str):
             self.model.model_name = new_model
+            self._model_name = new_model
+
+        rate_limiter = get_rate_limiter()
 
         if model_name in alternative_model_names:
             print(
@@ -67,6 +77,7 @@ class OpenAIDynamicAgent:
             on_api_key_rotate=on_api_key_rotate,
             model_names=alternative_model_names,
             on_model_rotate=on_model_rotate,
+            rotate_api_keys=rate_limiter is None,
         )
 
         retry_middleware = ModelRetryMiddleware(
@@ -80,6 +91,11 @@ class OpenAIDynamicAgent:
         )
 
         middleware_list.insert(0, retry_middleware)
+        if rate_limiter is not None:
+            # Inside the retry loop so that every attempt is admission controlled
+            middleware_list.insert(
+                1, RateLimitMiddleware(rate_limiter, api_keys, self._model_for_key)
+            )
 
         # Create agent with middleware
         self.agent = create_agent(
@@ -94,6 +110,18 @@ class OpenAIDynamicAgent:
 
         self.response_schema = response_schema
 
+    def _model_for_key(
+        self, api_key: str, model_name: str = None
+    ) -> tuple[str, ChatOpenAI]:
+        """Return the model name (current by default) and an instance bound to ``api_key``."""
+        model_name = model_name or self._model_name
+        cache_key = (api_key, model_name)
+        if cache_key not in self._key_models:
+            self._key_models[cache_key] = ChatOpenAI(
+                model=model_name, openai_api_key=api_key, **self._model_kwargs
+            )
+        return model_name, self._key_models[cache_key]
+
     def invoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
         """Invoke the agent with automatic retry and API key rotation."""
         return self.agent.invoke({"messages": messages}, *args, **kwargs)
@@ -114,3 +142,22 @@ class OpenAIDynamicAgent:
         return self.agent.batch(
             [{"messages": msgs} for msgs in messages_list], *args, **kwargs
         )
+
+    async def ainvoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
+        """Async counterpart of ``invoke``; the model call does not block the event loop."""
+        return await self.agent.ainvoke({"messages": messages}, *args, **kwargs)
+
+    async def astream(
+        self, messages: list[BaseMessage] | list[dict], *args, **kwargs
+    ) -> AsyncIterator:
+        """Async counterpart of ``stream``."""
+        async for chunk in self.agent.astream({"messages": messages}, *args, **kwargs):
+            yield chunk
+
+    async def abatch(
+        self, messages_list: list[list[BaseMessage] | list[dict]], *args, **kwargs
+    ):
+        """Async counterpart of ``batch``; requests run concurrently on the event loop."""
+        return await self.agent.abatch(
+            [{"messages": msgs} for msgs in messages_list], *args, **kwargs
+        )
@@ -0,0 +1,266 @@
+"""Provider-side caching of static prompt prefixes.
+
+Batch pipelines send the same system prompt and few-shot history with every
+call. DynamicAgent puts that static prefix first in every request, and
+PrefixCacheMiddleware makes the provider reuse it:
+
+- Gemini: the system prompt and prefix messages of agents with a
+  ``static_prefix`` are registered once per (API key, model) as cached content,
+  which is billed for storage. Requests then reference it through
+  ``cached_content`` and only send the variable tail. The cache name is shared
+  through Redis so every worker reuses it until the TTL expires.
+- OpenAI: prefix caching is automatic. A ``prompt_cache_key`` derived from
+  the prefix routes identical prefixes to the same cache.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Literal, Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from common.configs import LlmConfig
+from common.redis_app import redis_client
+from .fingerprint import fingerprint
+
+_UNCACHABLE = "-"
+
+
+def _same_prefix(messages: list, prefix: list[BaseMessage]) -> bool:
+    if len(messages) < len(prefix):
+        return False
+    return all(
+        type(message) is type(expected) and message.content == expected.content
+        for message, expected in zip(messages, prefix)
+    )
+
+
+def _to_gemini_contents(prefix: list[BaseMessage]) -> Optional[list]:
+    """Convert a text-only few-shot history; None if it holds anything else."""
+    from google.genai import types
+
+    contents = []
+    for message in prefix:
+        if not isinstance(message.content, str):
+            return None
+        if isinstance(message, HumanMessage):
+            role = "user"
+        elif isinstance(message, AIMessage) and not message.tool_calls:
+            role = "model"
+        else:
+            return None
+        contents.append(
+            types.Content(role=role, parts=[types.Part(text=message.content)])
+        )
+    return contents
+
+
+class GeminiCachedContentRegistry:
+    """Creates Gemini cached contents on demand and shares their names via Redis."""
+
+    def __init__(
+        self,
+        client=redis_client,
+        ttl_seconds: int = 3600,
+        min_tokens: int = 1024,
+        prefix: str = "llm_prefix_cache:",
+    ):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.prefix = prefix
+        self._local: dict[str, tuple[str, float]] = {}
+        # One lock per prefix and key: creating a cache is a network call, and
+        # misses on unrelated prefixes must not wait for each other
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def get_or_create(
+        self,
+        api_key: str,
+        model_name: str,
+        system_prompt: Optional[str],
+        prefix: list[BaseMessage],
+        display_name: str,
+    ) -> Optional[str]:
+        """Return the cached content name for this prefix, or None if not cachable."""
+        key_id = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+        prefix_id = fingerprint(
+            prefix, model_name=model_name, system_prompt=system_prompt
+        )
+        redis_key = f"{self.prefix}{prefix_id}:{key_id}"
+
+        name = self._lookup(redis_key)
+        if name is None:
+            with self._locks_lock:
+                lock = self._locks.setdefault(redis_key, threading.Lock())
+            with lock:
+                name = self._lookup(redis_key)
+                if name is None:
+                    name = self._create(
+                        api_key, model_name, system_prompt, prefix, display_name
+                    )
+                    self._store(redis_key, name)
+        return None if name == _UNCACHABLE else name
+
+    def _lookup(self, redis_key: str) -> Optional[str]:
+        cached = self._local.get(redis_key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        try:
+            raw = self.client.get(redis_key)
+        except Exception:
+            return None
+        if raw is None:
+            return None
+        ttl = self.client.ttl(redis_key)
+        name = raw.decode()
+        self._local[redis_key] = (name, time.monotonic() + max(ttl, 0))
+        return name
+
+    def _store(self, redis_key: str, name: str):
+        # Stop handing out the name a minute before the provider expires it
+        ttl = max(self.ttl_seconds - 60, 1)
+        self._local[redis_key] = (name, time.monotonic() + ttl)
+        try:
+            self.client.set(redis_key, name, ex=ttl)
+        except Exception as e:
+            print(f"| Prefix cache: failed to share {redis_key}: {e}")
+
+    def invalidate(self, name: str):
+        """Forget a cached content the provider no longer knows (expired or deleted)."""
+        for redis_key, (cached_name, _) in list(self._local.items()):
+            if cached_name == name:
+                self._local.pop(redis_key, None)
+                try:
+                    self.client.delete(redis_key)
+                except Exception:
+                    pass
+
+    def _create(
+        self,
+        api_key: str,
+        model_name: str,
+        system_prompt: Optional[str],
+        prefix: list[BaseMessage],
+        display_name: str,
+    ) -> str:
+        chars = len(system_prompt or "") + sum(len(m.content) for m in prefix)
+        contents = _to_gemini_contents(prefix)
+        # Providers reject caches below a minimum size (~4 characters per token)
+        if contents is None or chars // 4 < self.min_tokens:
+            return _UNCACHABLE
+
+        from google import genai
+        from google.genai import types
+
+        try:
+            cache = genai.Client(api_key=api_key).caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(
+                    display_name=display_name,
+                    system_instruction=system_prompt or None,
+                    contents=contents or None,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+        except Exception as e:
+            print(f"| Prefix cache: cannot cache prefix of '{display_name}': {e}")
+            return _UNCACHABLE
+
+        print(f"| Prefix cache: created {cache.name} for '{display_name}'")
+        return cache.name
+
+
+_registry: Optional[GeminiCachedContentRegistry] = None
+
+
+def get_gemini_registry() -> GeminiCachedContentRegistry:
+    global _registry
+    if _registry is None:
+        _registry = GeminiCachedContentRegistry(
+            ttl_seconds=LlmConfig.LLM_PREFIX_CACHE_TTL_SECONDS,
+            min_tokens=LlmConfig.LLM_PREFIX_CACHE_MIN_TOKENS,
+        )
+    return _registry
+
+
+class PrefixCacheMiddleware(AgentMiddleware):
+    """Points requests starting with the agent's static prefix at the provider cache."""
+
+    def __init__(
+        self,
+        provider: Literal["gemini", "openai"],
+        agent_name: str,
+        static_prefix: list[BaseMessage] = None,
+    ):
+        super().__init__()
+        self.provider = provider
+        self.agent_name = agent_name
+        self.static_prefix = list(static_prefix or [])
+
+    def _openai_request(self, request: ModelRequest) -> ModelRequest:
+        prefix_id = fingerprint(self.static_prefix, system_prompt=request.system_prompt)
+        return request.override(
+            model_settings={
+                **request.model_settings,
+                "prompt_cache_key": f"{self.agent_name}:{prefix_id[:16]}",
+            }
+        )
+
+    def _gemini_request(self, request: ModelRequest) -> ModelRequest:
+        # Without a few-shot prefix there is only the system prompt to cache,
+        # which would bill a cache entry per rendered prompt for little gain
+        if (
+            request.tools
+            or not self.static_prefix
+            or not _same_prefix(request.messages, self.static_prefix)
+        ):
+            return request
+        model = request.model
+        name = get_gemini_registry().get_or_create(
+            api_key=model.google_api_key.get_secret_value(),
+            model_name=model.model,
+            system_prompt=request.system_prompt,
+            prefix=self.static_prefix,
+            display_name=self.agent_name,
+        )
+        if name is None:
+            return request
+        # Cached system instruction and prefix must not be sent again
+        return request.override(
+            system_message=None,
+            messages=request.messages[len(self.static_prefix) :],
+            model_settings={**request.model_settings, "cached_content": name},
+        )
+
+    def _prepare(self, request: ModelRequest) -> ModelRequest:
+        if self.provider == "openai":
+            return self._openai_request(request)
+        return self._gemini_request(request)
+
+    def _on_error(self, request: ModelRequest, error: Exception):
+        name = request.model_settings.get("cached_content")
+        if name and "cached" in str(error).lower():
+            # Let the retry recreate it instead of failing on the stale name
+            get_gemini_registry().invalidate(name)
+
+    def wrap_model_call(self, request: ModelRequest, handler):
+        request = self._prepare(request)
+        try:
+            return handler(request)
+        except Exception as e:
+            self._on_error(request, e)
+            raise
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        # Creating the cache is a blocking API call
+        request = await asyncio.to_thread(self._prepare, request)
+        try:
+            return await handler(request)
+        except Exception as e:
+            self._on_error(request, e)
+            raise
@@ -0,0 +1,277 @@
+"""Cluster-wide RPM/TPM admission control for LLM API keys.
+
+Every process (API server and each RQ worker) shares the same Redis token
+buckets, one per (API key, model). A model call is only dispatched once the
+chosen key has both a request and enough tokens left, so concurrent batch
+fan-outs spread over the available keys instead of all hitting the same key
+and burning retries on 429 responses.
+"""
+
+import asyncio
+import hashlib
+import random
+import time
+from typing import Callable, Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage
+
+from common.configs import LlmConfig
+from common.redis_app import redis_client
+
+# Refill both buckets for the elapsed time, then either take one request and
+# `cost` tokens or return how long to wait. Redis TIME keeps every worker on
+# the same clock.
+_ACQUIRE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'r', 't', 'ts')
+local r = tonumber(state[1]) or rpm
+local t = tonumber(state[2]) or tpm
+local ts = tonumber(state[3]) or now
+local elapsed = math.max(0, now - ts)
+local wait = 0
+if rpm > 0 then
+    r = math.min(rpm, r + elapsed * rpm / 60)
+    if r < 1 then wait = math.max(wait, (1 - r) * 60 / rpm) end
+end
+if tpm > 0 then
+    t = math.min(tpm, t + elapsed * tpm / 60)
+    local need = math.min(cost, tpm)
+    if t < need then wait = math.max(wait, (need - t) * 60 / tpm) end
+end
+if wait == 0 then
+    r = r - 1
+    t = t - cost
+end
+redis.call('HSET', KEYS[1], 'r', r, 't', t, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 300)
+return tostring(wait)
+"""
+
+# Empty both buckets after the provider rejected the key
+_PENALIZE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('HSET', KEYS[1], 'r', 0, 't', 0, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 300)
+return 1
+"""
+
+
+class RateLimitTimeout(RuntimeError):
+    """Raised when no API key gets capacity within the configured wait limit."""
+
+
+class TokenBucketRateLimiter:
+    """Redis token buckets tracking requests and tokens per minute per key and model."""
+
+    def __init__(
+        self,
+        client=redis_client,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_wait_seconds: float = 120.0,
+        prefix: str = "llm_rate_limit:",
+    ):
+        """
+        Args:
+            client: Redis client shared by all processes
+            rpm: Requests per minute allowed per key and model (0 = unlimited)
+            tpm: Tokens per minute allowed per key and model (0 = unlimited)
+            max_wait_seconds: Longest time acquire() waits before giving up
+            prefix: Redis key prefix of the buckets
+        """
+        self.client = client
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait_seconds = max_wait_seconds
+        self.prefix = prefix
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+        self._penalize = client.register_script(_PENALIZE_SCRIPT)
+
+    def _bucket(self, api_key: str, model_name: str) -> str:
+        # Never store raw API keys in Redis
+        key_id = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+        return f"{self.prefix}{key_id}:{model_name}"
+
+    def try_acquire(self, api_key: str, model_name: str, tokens: int) -> float:
+        """Take capacity for one call. Returns 0 on success, else seconds to wait."""
+        wait = self._acquire(
+            keys=[self._bucket(api_key, model_name)],
+            args=[self.rpm, self.tpm, tokens],
+        )
+        return float(wait)
+
+    def _probe(self, api_keys: list[str], model_name: str, tokens: int, offset: int):
+        """Try every key once; return ``(index, None)`` or ``(None, shortest_wait)``."""
+        shortest_wait = None
+        for i in range(len(api_keys)):
+            index = (offset + i) % len(api_keys)
+            wait = self.try_acquire(api_keys[index], model_name, tokens)
+            if wait == 0:
+                return index, None
+            shortest_wait = wait if shortest_wait is None else min(shortest_wait, wait)
+        return None, shortest_wait
+
+    def _backoff(self, shortest_wait: float, deadline: float, model_name: str):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise RateLimitTimeout(
+                f"No API key had capacity for model {model_name} within "
+                f"{self.max_wait_seconds}s"
+            )
+        # Jitter so waiting workers do not wake up in lockstep
+        return min(shortest_wait, remaining) + random.uniform(0, 0.1)
+
+    def acquire(self, api_keys: list[str], model_name: str, tokens: int) -> int:
+        """
+        Block until one of ``api_keys`` has capacity for the call and return its
+        index. Keys are probed from a random offset so callers spread out.
+        """
+        deadline = time.monotonic() + self.max_wait_seconds
+        offset = random.randint(0, len(api_keys) - 1)
+        while True:
+            index, shortest_wait = self._probe(api_keys, model_name, tokens, offset)
+            if index is not None:
+                return index
+            time.sleep(self._backoff(shortest_wait, deadline, model_name))
+
+    async def aacquire(self, api_keys: list[str], model_name: str, tokens: int) -> int:
+        """Async counterpart of :meth:`acquire`, waiting without blocking the loop."""
+        deadline = time.monotonic() + self.max_wait_seconds
+        offset = random.randint(0, len(api_keys) - 1)
+        while True:
+            # The scripts run on the shared sync client: keep them off the loop
+            index, shortest_wait = await asyncio.to_thread(
+                self._probe, api_keys, model_name, tokens, offset
+            )
+            if index is not None:
+                return index
+            await asyncio.sleep(self._backoff(shortest_wait, deadline, model_name))
+
+    def reconcile(self, api_key: str, model_name: str, delta_tokens: int):
+        """Charge (or refund) the difference between estimated and actual tokens."""
+        if self.tpm and delta_tokens:
+            self.client.hincrbyfloat(
+                self._bucket(api_key, model_name), "t", -delta_tokens
+            )
+
+    def penalize(self, api_key: str, model_name: str):
+        """Drain the buckets of a key the provider just rate limited."""
+        self._penalize(keys=[self._bucket(api_key, model_name)])
+
+
+_limiter: Optional[TokenBucketRateLimiter] = None
+
+
+def get_rate_limiter() -> Optional[TokenBucketRateLimiter]:
+    """Return the process-wide limiter, or None when no limit is configured."""
+    global _limiter
+    if _limiter is None and (
+        LlmConfig.LLM_RATE_LIMIT_RPM > 0 or LlmConfig.LLM_RATE_LIMIT_TPM > 0
+    ):
+        _limiter = TokenBucketRateLimiter(
+            rpm=LlmConfig.LLM_RATE_LIMIT_RPM,
+            tpm=LlmConfig.LLM_RATE_LIMIT_TPM,
+            max_wait_seconds=LlmConfig.LLM_RATE_LIMIT_MAX_WAIT_SECONDS,
+        )
+    return _limiter
+
+
+def estimate_request_tokens(request: ModelRequest) -> int:
+    """Rough input size (4 characters per token); corrected after the call."""
+    chars = len(request.system_prompt or "")
+    for message in request.messages:
+        chars += len(str(message.content))
+    return chars // 4 + 1
+
+
+def _response_total_tokens(response) -> Optional[int]:
+    messages = response.result if isinstance(response, ModelResponse) else [response]
+    total = None
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        if isinstance(message, AIMessage) and usage:
+            total = (total or 0) + usage.get("total_tokens", 0)
+    return total
+
+
+class RateLimitMiddleware(AgentMiddleware):
+    """
+    Admission control for model calls. Each call (including each retry of
+    ModelRetryMiddleware) waits for a key with free capacity and is sent with
+    that key's model instance.
+    """
+
+    def __init__(
+        self,
+        limiter: TokenBucketRateLimiter,
+        api_keys: list[str],
+        model_for_key: Callable[[str], tuple],
+    ):
+        """
+        Args:
+            limiter: Shared token bucket limiter
+            api_keys: Keys the calls may be dispatched on
+            model_for_key: Returns ``(model_name, chat_model)`` to use with a key
+        """
+        super().__init__()
+        self.limiter = limiter
+        self.api_keys = [key for key in api_keys if key and key.strip()]
+        self.model_for_key = model_for_key
+
+    def _on_error(self, error: Exception, api_key: str, model_name: str, index: int):
+        if "429" in str(error):
+            print(
+                f"| Rate limiter: key index {index} rejected for {model_name}, draining its bucket"
+            )
+            self.limiter.penalize(api_key, model_name)
+
+    def _on_response(self, response, api_key: str, model_name: str, estimated: int):
+        actual_tokens = _response_total_tokens(response)
+        if actual_tokens is not None:
+            self.limiter.reconcile(api_key, model_name, actual_tokens - estimated)
+
+    def wrap_model_call(self, request: ModelRequest, handler):
+        if not self.api_keys:
+            return handler(request)
+
+        estimated_tokens = estimate_request_tokens(request)
+        model_name, _ = self.model_for_key(self.api_keys[0])
+        index = self.limiter.acquire(self.api_keys, model_name, estimated_tokens)
+        api_key = self.api_keys[index]
+        model_name, model = self.model_for_key(api_key)
+
+        try:
+            response = handler(request.override(model=model))
+        except Exception as e:
+            self._on_error(e, api_key, model_name, index)
+            raise
+
+        self._on_response(response, api_key, model_name, estimated_tokens)
+        return response
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        if not self.api_keys:
+            return await handler(request)
+
+        estimated_tokens = estimate_request_tokens(request)
+        model_name, _ = self.model_for_key(self.api_keys[0])
+        index = await self.limiter.aacquire(self.api_keys, model_name, estimated_tokens)
+        api_key = self.api_keys[index]
+        model_name, model = self.model_for_key(api_key)
+
+        try:
+            response = await handler(request.override(model=model))
+        except Exception as e:
+            await asyncio.to_thread(self._on_error, e, api_key, model_name, index)
+            raise
+
+        await asyncio.to_thread(
+            self._on_response, response, api_key, model_name, estimated_tokens
+        )
+        return response
@@ -0,0 +1,284 @@
+import json
+import os
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from pydantic import BaseModel
+
+from .fingerprint import (
+    fingerprint,
+    dump_response,
+    load_response,
+    normalize,
+    render_system_prompt,
+)
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode when a call is not recorded and no API key is available."""
+
+
+class ReplayDynamicAgent:
+    """
+    Serves agent responses from an on-disk cassette so pipelines can run (and be
+    timed) without network access. Cassette entries are keyed by agent name,
+    response schema, the rendered system prompt and a hash of the input
+    messages. When a call is missing from the cassette and a live delegate is
+    available, the real agent is called and its response is recorded.
+    """
+
+    def __init__(
+        self,
+        delegate,
+        name: str,
+        model_name: str,
+        cassette_dir: str,
+        response_schema: Optional[BaseModel] = None,
+        system_prompt=None,
+        middleware: list = None,
+    ):
+        """
+        Args:
+            delegate: Live agent (GenimiDynamicAgent/OpenAIDynamicAgent) or None when offline
+            name: Agent name, used as the cassette sub-directory
+            model_name: Model name, part of the cassette key
+            cassette_dir: Root directory of the cassette
+            response_schema: Pydantic schema used to rebuild structured responses
+            system_prompt: Static system prompt or dynamic prompt callable
+            middleware: Caller middleware that may render the system prompt per call
+        """
+        self._delegate = delegate
+        self.name = name
+        self.model_name = model_name
+        self.response_schema = response_schema
+        self.system_prompt = system_prompt
+        self.middleware = list(middleware or [])
+        self.cassette_path = Path(cassette_dir) / name
+
+    def _live(self):
+        if self._delegate is None:
+            raise CassetteMissError(
+                f"Agent '{self.name}' replays from {self.cassette_path} without an "
+                "API key: there is no live agent or model"
+            )
+        return self._delegate
+
+    @property
+    def agent(self):
+        return self._live().agent
+
+    @property
+    def model(self):
+        return self._live().model
+
+    def _key(self, messages, kwargs: dict) -> str:
+        return fingerprint(
+            messages,
+            model_name=self.model_name,
+            response_schema=self.response_schema,
+            system_prompt=render_system_prompt(
+                self.system_prompt, self.middleware, messages, kwargs.get("context")
+            ),
+            agent=self.name,
+            context=kwargs.get("context"),
+            stream_mode=kwargs.get("stream_mode"),
+        )
+
+    def _read(self, key: str) -> Optional[dict]:
+        path = self.cassette_path / f"{key}.json"
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, key: str, entry: dict):
+        self.cassette_path.mkdir(parents=True, exist_ok=True)
+        path = self.cassette_path / f"{key}.json"
+        # Write-then-rename so concurrent batch workers never read a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _require_delegate(self, key: str):
+        if self._delegate is None:
+            raise CassetteMissError(
+                f"No recorded response for agent '{self.name}' (key {key}) in "
+                f"{self.cassette_path} and no API key available to record it"
+            )
+        print(f"| Replay: cassette miss for agent '{self.name}', recording {key[:12]}")
+
+    def _record(self, key: str, response):
+        self._write(
+            key,
+            {
+                "agent": self.name,
+                "model": self.model_name,
+                "response": dump_response(response),
+            },
+        )
+
+    def _replay(self, key: str):
+        entry = self._read(key)
+        if entry is None:
+            return None
+        return load_response(entry["response"], self.response_schema)
+
+    def _replay_batch(self, messages_list, kwargs: dict):
+        keys = [self._key(messages, kwargs) for messages in messages_list]
+        results = [self._replay(key) for key in keys]
+        miss_indices = [i for i, result in enumerate(results) if result is None]
+        if miss_indices:
+            self._require_delegate(keys[miss_indices[0]])
+        return keys, results, miss_indices
+
+    def _record_batch(self, keys, results, miss_indices, responses):
+        for i, response in zip(miss_indices, responses):
+            results[i] = response
+            self._record(keys[i], response)
+        return results
+
+    def invoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
+        key = self._key(messages, kwargs)
+        response = self._replay(key)
+        if response is not None:
+            return response
+
+        self._require_delegate(key)
+        response = self._delegate.invoke(messages, *args, **kwargs)
+        self._record(key, response)
+        return response
+
+    async def ainvoke(self, messages: list[BaseMessage] | list[dict], *args, **kwargs):
+        key = self._key(messages, kwargs)
+        response = self._replay(key)
+        if response is not None:
+            return response
+
+        self._require_delegate(key)
+        response = await self._delegate.ainvoke(messages, *args, **kwargs)
+        self._record(key, response)
+        return response
+
+    def stream(
+        self, messages: list[BaseMessage] | list[dict], *args, **kwargs
+    ) -> Iterator:
+        key = self._key(messages, kwargs)
+        entry = self._read(key)
+        if entry is not None:
+            for item in entry["chunks"]:
+                yield _load_chunk(item, self.response_schema)
+            return
+
+        self._require_delegate(key)
+        chunks = []
+        for chunk in self._delegate.stream(messages, *args, **kwargs):
+            chunks.append(_dump_chunk(chunk))
+            yield chunk
+        self._write(
+            key, {"agent": self.name, "model": self.model_name, "chunks": chunks}
+        )
+
+    async def astream(
+        self, messages: list[BaseMessage] | list[dict], *args, **kwargs
+    ) -> AsyncIterator:
+        key = self._key(messages, kwargs)
+        entry = self._read(key)
+        if entry is not None:
+            for item in entry["chunks"]:
+                yield _load_chunk(item, self.response_schema)
+            return
+
+        self._require_delegate(key)
+        chunks = []
+        async for chunk in self._delegate.astream(messages, *args, **kwargs):
+            chunks.append(_dump_chunk(chunk))
+            yield chunk
+        self._write(
+            key, {"agent": self.name, "model": self.model_name, "chunks": chunks}
+        )
+
+    def batch(
+        self, messages_list: list[list[BaseMessage] | list[dict]], *args, **kwargs
+    ):
+        keys, results, miss_indices = self._replay_batch(messages_list, kwargs)
+        if not miss_indices:
+            return results
+        responses = self._delegate.batch(
+            [messages_list[i] for i in miss_indices], *args, **kwargs
+        )
+        return self._record_batch(keys, results, miss_indices, responses)
+
+    async def abatch(
+        self, messages_list: list[list[BaseMessage] | list[dict]], *args, **kwargs
+    ):
+        keys, results, miss_indices = self._replay_batch(messages_list, kwargs)
+        if not miss_indices:
+            return results
+        responses = await self._delegate.abatch(
+            [messages_list[i] for i in miss_indices], *args, **kwargs
+        )
+        return self._record_batch(keys, results, miss_indices, responses)
+
+
+def _dump_chunk(chunk) -> dict:
+    # stream_mode="messages" yields (message_chunk, metadata) tuples
+    if (
+        isinstance(chunk, tuple)
+        and len(chunk) == 2
+        and isinstance(chunk[0], BaseMessage)
+    ):
+        return {
+            "message": message_to_dict(chunk[0]),
+            "metadata": normalize(chunk[1]),
+        }
+    return {"value": _dump_value(chunk)}
+
+
+def _load_chunk(item: dict, response_schema: Optional[BaseModel] = None):
+    if "message" in item:
+        return messages_from_dict([item["message"]])[0], item["metadata"]
+    if "value" in item:
+        return _load_value(item["value"], response_schema)
+    # Recorded before chunks kept their types
+    return item["raw"]
+
+
+def _dump_value(value):
+    """Serialize a stream chunk so that :func:`_load_value` rebuilds its types.
+
+    Unlike ``normalize``, messages, structured responses and tuples survive
+    (``updates``/``values`` chunks, chunks of several stream modes).
+    """
+    if isinstance(value, BaseMessage):
+        return {"__message__": message_to_dict(value)}
+    if isinstance(value, BaseModel):
+        return {"__structured__": value.model_dump(mode="json")}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_dump_value(item) for item in value]}
+    if isinstance(value, list):
+        return [_dump_value(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _dump_value(item) for key, item in value.items()}
+    return normalize(value)
+
+
+def _load_value(data, response_schema: Optional[BaseModel] = None):
+    """Inverse of :func:`_dump_value`."""
+    if isinstance(data, list):
+        return [_load_value(item, response_schema) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if "__message__" in data:
+        return messages_from_dict([data["__message__"]])[0]
+    if "__structured__" in data:
+        structured = data["__structured__"]
+        return (
+            response_schema.model_validate(structured)
+            if response_schema
+            else structured
+        )
+    if "__tuple__" in data:
+        return tuple(_load_value(item, response_schema) for item in data["__tuple__"])
+    return {key: _load_value(item, response_schema) for key, item in data.items()}
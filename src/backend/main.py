@@ -12,7 +12,8 @@ processes = []
 for queue_type in queue_types:
     print(f"Starting worker for queue: {queue_type}")
     for _ in range(ServerConfig.WORKER_PER_QUEUE):
-        p = subprocess.Popen(["rq", "worker", f"{queue_type}"])
+        # The scheduler runs delayed jobs (coalesced webhooks)
+        p = subprocess.Popen(["rq", "worker", f"{queue_type}", "--with-scheduler"])
         processes.append(p)
         time.sleep(0.1)  # Stagger worker startups
 
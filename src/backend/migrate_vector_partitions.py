@@ -0,0 +1,108 @@
+"""Copy the vectors of the shared collection into per-connection collections.
+
+Vectors are copied with their stored embeddings, so nothing is re-embedded.
+Copies are upserts, so the script can be rerun safely. To switch a deployment
+to ``VECTORSTORE_PARTITIONING=connection``:
+
+1. run this script while the app still uses the shared collection
+2. set ``VECTORSTORE_PARTITIONING=connection`` and restart the API and workers
+3. run it again to copy what was written in between, with ``--delete-source``
+   to remove the copied vectors from the shared collection
+
+Vectors without a ``connection_id`` stay in the shared collection.
+
+Usage (from src/backend):
+    python migrate_vector_partitions.py --dry-run
+    python migrate_vector_partitions.py [--connection ID ...] [--delete-source]
+"""
+
+import argparse
+from collections import Counter
+
+from langchain_chroma import Chroma
+
+from common.vectorstore import (
+    chroma_vectorstore,
+    create_chroma_vectorstore,
+    tenant_collection_name,
+)
+
+
+def _collection(store):
+    # Chroma stores take precomputed embeddings on their native collection
+    return store._collection if isinstance(store, Chroma) else store
+
+
+def _where(connection_ids: list[str]) -> dict | None:
+    if not connection_ids:
+        return None
+    if len(connection_ids) == 1:
+        return {"connection_id": connection_ids[0]}
+    return {"connection_id": {"$in": connection_ids}}
+
+
+def copy_vectors(connection_ids: list[str], batch_size: int, dry_run: bool) -> Counter:
+    """Copy the shared collection page by page; returns the vectors per connection"""
+    copied = Counter()
+    offset = 0
+    while True:
+        page = chroma_vectorstore.get(
+            where=_where(connection_ids),
+            limit=batch_size,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not len(page["ids"]):
+            return copied
+        offset += len(page["ids"])
+
+        by_connection: dict[str, list[int]] = {}
+        for n, metadata in enumerate(page["metadatas"]):
+            connection_id = (metadata or {}).get("connection_id")
+            by_connection.setdefault(connection_id, []).append(n)
+        for connection_id, rows in by_connection.items():
+            copied[connection_id] += len(rows)
+            if connection_id is None or dry_run:
+                continue
+            _collection(
+                create_chroma_vectorstore(tenant_collection_name(connection_id))
+            ).upsert(
+                ids=[page["ids"][n] for n in rows],
+                embeddings=[page["embeddings"][n] for n in rows],
+                documents=[page["documents"][n] for n in rows],
+                metadatas=[page["metadatas"][n] for n in rows],
+            )
+        print(f"Read {offset} vectors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connection", action="append", default=[])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--delete-source", action="store_true")
+    args = parser.parse_args()
+
+    copied = copy_vectors(args.connection, args.batch_size, args.dry_run)
+    unpartitioned = copied.pop(None, 0)
+    if unpartitioned:
+        print(f"{unpartitioned} vectors have no connection_id and stay shared")
+
+    for connection_id, count in sorted(copied.items()):
+        collection_name = tenant_collection_name(connection_id)
+        if args.dry_run:
+            print(f"{connection_id}: {count} vectors -> {collection_name}")
+            continue
+        stored = _collection(create_chroma_vectorstore(collection_name)).count()
+        print(f"{connection_id}: copied {count}, {stored} in {collection_name}")
+        if not args.delete_source:
+            continue
+        if stored < count:
+            print(f"{connection_id}: collection is missing vectors, source kept")
+            continue
+        chroma_vectorstore.delete(where={"connection_id": connection_id})
+        print(f"{connection_id}: removed from the shared collection")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Full resyncs through ``store_project_issues`` keep the ACs created in the app.
+
+Run from src/backend: python -m pytest tests
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.connection.jira.models import GherkinAC, Project, Story
+from app.connection.jira.upsert import store_project_issues
+from common.database import utcnow
+
+CONNECTION_ID = "test-connection"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Project.metadata.create_all(
+        engine, tables=[Project.__table__, Story.__table__, GherkinAC.__table__]
+    )
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def project_row() -> dict:
+    return {
+        "id_": "10000",
+        "key": "TP",
+        "name": "Test project",
+        "avatar_url": None,
+        "connection_id": CONNECTION_ID,
+        "description": "",
+        "synced": True,
+        "last_synced_at": utcnow(),
+    }
+
+
+STORIES = [
+    {
+        "id_": "10001",
+        "key": "TP-1",
+        "summary": "Upload assets",
+        "description": "As a user I want to upload assets",
+        "content_hash": None,
+    }
+]
+
+
+def jira_ac(id_: str, key: str, description: str) -> dict:
+    return {
+        "id_": id_,
+        "key": key,
+        "summary": description.splitlines()[0],
+        "description": description,
+        "parent_key": "TP-1",
+        "created_at": utcnow(),
+    }
+
+
+def local_ac(story_id: str, key=None) -> GherkinAC:
+    # Like ACService.create_ac: id_ keeps its random default, key is the
+    # Jira key once pushed
+    return GherkinAC(
+        summary="Feature: Upload",
+        description="Feature: Upload\n  Scenario: drag and drop",
+        story_id=story_id,
+        key=key,
+    )
+
+
+def test_resync_keeps_local_and_pushed_acs(db):
+    acs = [jira_ac("20001", "TP-2", "Feature: Synced")]
+    _, story_rows, _ = store_project_issues(db, project_row(), STORIES, acs)
+    story_id = story_rows[0]["id"]
+
+    unpushed = local_ac(story_id)
+    pushed = local_ac(story_id, key="TP-3")
+    db.add_all([unpushed, pushed])
+    db.commit()
+    synced_id = db.query(GherkinAC.id).filter_by(key="TP-2").scalar()
+
+    # Jira now also returns the pushed AC, under its real Jira ID
+    acs.append(jira_ac("20003", "TP-3", "Feature: Upload edited in Jira"))
+    store_project_issues(db, project_row(), STORIES, acs)
+    db.expire_all()
+
+    rows = {ac.id: ac for ac in db.query(GherkinAC)}
+    assert set(rows) == {unpushed.id, pushed.id, synced_id}
+    assert rows[pushed.id].id_ == "20003"
+    assert rows[pushed.id].description == "Feature: Upload edited in Jira"
+    assert rows[unpushed.id].key is None
+
+
+def test_resync_deletes_acs_removed_from_jira(db):
+    acs = [
+        jira_ac("20001", "TP-2", "Feature: Kept"),
+        jira_ac("20002", "TP-3", "Feature: Deleted in Jira"),
+    ]
+    _, story_rows, _ = store_project_issues(db, project_row(), STORIES, acs)
+    unpushed = local_ac(story_rows[0]["id"])
+    db.add(unpushed)
+    db.commit()
+
+    store_project_issues(db, project_row(), STORIES, acs[:1])
+
+    keys = {key for (key,) in db.query(GherkinAC.key)}
+    assert keys == {"TP-2", None}
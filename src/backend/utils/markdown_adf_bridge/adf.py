@@ -0,0 +1,733 @@
+"""In-process Markdown <-> Atlassian Document Format conversion.
+
+Pure-Python counterpart of the Node bridge (``md_adf_bridge.mjs``). It covers
+the node types Jira issue descriptions actually contain: paragraphs, headings,
+lists and task lists, code blocks, quotes, rules, tables, external images and
+inline marks. Jira-only nodes (mentions, emoji, cards, panels, status, dates)
+are rendered to readable Markdown. Conversions run in microseconds instead of
+spawning a ``node`` process per call.
+"""
+
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+# ---------------------------------------------------------------------------
+# Markdown -> ADF
+# ---------------------------------------------------------------------------
+
+_FENCE_RE = re.compile(r"^(\s*)(`{3,}|~{3,})\s*([^\s`]*)")
+_HEADING_RE = re.compile(r"^\s{0,3}(#{1,6})(?:\s+(.*?))?\s*#*\s*$")
+_RULE_RE = re.compile(r"^\s{0,3}([-*_])(?:\s*\1){2,}\s*$")
+_QUOTE_RE = re.compile(r"^\s{0,3}> ?(.*)$")
+_LIST_RE = re.compile(r"^(\s*)([-*+]|\d{1,9}[.)])(?:\s+(.*))?$")
+_TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+_AUTOLINK_RE = re.compile(r"<((?:https?|mailto):[^>\s]+)>")
+_TASK_RE = re.compile(r"^\[([ xX])\](?:\s+(.*))?$")
+_IMAGE_LINE_RE = re.compile(r"^\s*!\[")
+_ESCAPABLE = set("\\`*_{}[]()#+-.!|~>")
+
+
+def _text(text: str, marks: tuple) -> dict:
+    node = {"type": "text", "text": text}
+    if marks:
+        node["marks"] = [dict(mark) for mark in marks]
+    return node
+
+
+def _append_text(nodes: list, text: str, marks: tuple):
+    if not text:
+        return
+    last = nodes[-1] if nodes else None
+    if (
+        last is not None
+        and last["type"] == "text"
+        and last.get("marks", []) == [dict(mark) for mark in marks]
+    ):
+        last["text"] += text
+    else:
+        nodes.append(_text(text, marks))
+
+
+def _find_closing(text: str, delimiter: str, start: int) -> int:
+    """Index of the closing ``delimiter`` for emphasis opened before ``start``."""
+    i = start
+    while True:
+        i = text.find(delimiter, i)
+        if i == -1:
+            return -1
+        if text[i - 1] == "\\":
+            i += 1
+            continue
+        # A closing delimiter follows non-space text, and a single * or _
+        # must not be half of a double one
+        if i > start and not text[i - 1].isspace():
+            if len(delimiter) == 2:
+                # ***x***: the double delimiter closes at the end of the run,
+                # leaving the single one inside for the nested emphasis
+                while text[i + 2 : i + 3] == delimiter[0]:
+                    i += 1
+                return i
+            if text[i + 1 : i + 2] != delimiter:
+                if delimiter != "_" or not text[i + 1 : i + 2].isalnum():
+                    return i
+        i += len(delimiter)
+
+
+def _find_code_fence(text: str, fence: str, start: int) -> int:
+    """Index of a backtick run exactly as long as ``fence``."""
+    i = text.find(fence, start)
+    while i != -1:
+        end = i + len(fence)
+        if text[end : end + 1] != "`":
+            return i
+        i = text.find(fence, end + len(text[end:]) - len(text[end:].lstrip("`")))
+    return -1
+
+
+def _match_emphasis(text: str, i: int) -> Optional[tuple[str, int, int, int]]:
+    """``(mark, inner_start, inner_end, end)`` of emphasis opening at ``i``."""
+    for delimiter, mark in (
+        ("**", "strong"),
+        ("__", "strong"),
+        ("~~", "strike"),
+        ("*", "em"),
+        ("_", "em"),
+    ):
+        if not text.startswith(delimiter, i):
+            continue
+        if len(delimiter) == 1 and text.startswith(delimiter * 2, i):
+            # An unmatched ** is literal, not two em delimiters
+            return None
+        # Intraword underscores (snake_case) are literal
+        if delimiter[0] == "_" and i > 0 and text[i - 1].isalnum():
+            return None
+        inner_start = i + len(delimiter)
+        inner_end = _find_closing(text, delimiter, inner_start)
+        if inner_end > inner_start and not text[inner_start].isspace():
+            return mark, inner_start, inner_end, inner_end + len(delimiter)
+    return None
+
+
+def _parse_inline(text: str, marks: tuple = ()) -> list[dict]:
+    nodes: list[dict] = []
+    buf: list[str] = []
+
+    def flush():
+        _append_text(nodes, "".join(buf), marks)
+        buf.clear()
+
+    i = 0
+    while i < len(text):
+        c = text[i]
+
+        if c == "\\" and i + 1 < len(text) and text[i + 1] in _ESCAPABLE:
+            buf.append(text[i + 1])
+            i += 2
+            continue
+
+        if c == "`":
+            run = len(text[i:]) - len(text[i:].lstrip("`"))
+            fence = "`" * run
+            end = _find_code_fence(text, fence, i + run)
+            if end != -1:
+                flush()
+                code = text[i + run : end]
+                if len(code) > 2 and code[0] == code[-1] == " ":
+                    code = code[1:-1]
+                nodes.append(_text(code, marks + ({"type": "code"},)))
+                i = end + run
+                continue
+            buf.append(fence)
+            i += run
+            continue
+
+        if c == "!" and text[i + 1 : i + 2] == "[":
+            image = _match_link(text, i + 1)
+            if image is not None:
+                # Media are blocks in ADF: an image inside text keeps its alt
+                # text, linked to the image
+                alt, href, end = image
+                flush()
+                link_mark = {"type": "link", "attrs": {"href": href}}
+                _append_text(nodes, alt or href, marks + (link_mark,))
+                i = end
+                continue
+
+        if c == "[":
+            link = _match_link(text, i)
+            if link is not None:
+                label, href, end = link
+                flush()
+                link_mark = {"type": "link", "attrs": {"href": href}}
+                for node in _parse_inline(label, marks + (link_mark,)):
+                    _merge_node(nodes, node)
+                i = end
+                continue
+
+        if c == "<":
+            m = _AUTOLINK_RE.match(text, i)
+            if m:
+                flush()
+                href = m.group(1)
+                nodes.append(
+                    _text(href, marks + ({"type": "link", "attrs": {"href": href}},))
+                )
+                i = m.end()
+                continue
+
+        emphasis = _match_emphasis(text, i)
+        if emphasis is not None:
+            mark, inner_start, inner_end, end = emphasis
+            flush()
+            for node in _parse_inline(
+                text[inner_start:inner_end], marks + ({"type": mark},)
+            ):
+                _merge_node(nodes, node)
+            i = end
+            continue
+
+        buf.append(c)
+        i += 1
+
+    flush()
+    return nodes
+
+
+def _merge_node(nodes: list, node: dict):
+    if node["type"] == "text":
+        marks = tuple(node.get("marks", []))
+        _append_text(nodes, node["text"], marks)
+    else:
+        nodes.append(node)
+
+
+def _match_link(text: str, start: int) -> Optional[tuple[str, str, int]]:
+    """``(label, href, end)`` of an inline ``[label](href)`` link at ``start``."""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "\\":
+            continue
+        if text[i] == "[":
+            depth += 1
+        elif text[i] == "]":
+            depth -= 1
+            if depth == 0:
+                break
+    else:
+        return None
+    if text[i + 1 : i + 2] != "(":
+        return None
+    close = text.find(")", i + 2)
+    if close == -1:
+        return None
+    target = text[i + 2 : close].strip()
+    href = target.split()[0] if target else ""
+    if href.startswith("<") and href.endswith(">"):
+        href = href[1:-1]
+    return text[start + 1 : i], href, close + 1
+
+
+def _inline_with_breaks(lines: list[str]) -> list[dict]:
+    """Inline content of a paragraph; source line breaks become hard breaks."""
+    content: list[dict] = []
+    for n, line in enumerate(lines):
+        if n:
+            content.append({"type": "hardBreak"})
+        line = line.strip()
+        if line.endswith("\\"):
+            line = line[:-1]
+        for node in _parse_inline(line):
+            _merge_node(content, node)
+    return content
+
+
+def _is_block_start(line: str) -> bool:
+    return bool(
+        _FENCE_RE.match(line)
+        or _HEADING_RE.match(line)
+        or _RULE_RE.match(line)
+        or _QUOTE_RE.match(line)
+        or _LIST_RE.match(line)
+    )
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" \t"))
+
+
+def _split_row(line: str) -> list[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    cells = re.split(r"(?<!\\)\|", line)
+    return [cell.strip().replace("\\|", "|") for cell in cells]
+
+
+def _table(lines: list[str]) -> dict:
+    rows = []
+    for n, line in enumerate(lines):
+        cell_type = "tableHeader" if n == 0 else "tableCell"
+        rows.append(
+            {
+                "type": "tableRow",
+                "content": [
+                    {
+                        "type": cell_type,
+                        "attrs": {},
+                        "content": [
+                            {"type": "paragraph", "content": _parse_inline(cell)}
+                        ],
+                    }
+                    for cell in _split_row(line)
+                ],
+            }
+        )
+    return {
+        "type": "table",
+        "attrs": {"isNumberColumnEnabled": False, "layout": "default"},
+        "content": rows,
+    }
+
+
+def _parse_list(lines: list[str], i: int) -> tuple[dict, int]:
+    first = _LIST_RE.match(lines[i])
+    base = _indent(lines[i])
+    ordered = first.group(2)[0].isdigit()
+    items = []
+    tasks = []
+
+    while i < len(lines):
+        m = _LIST_RE.match(lines[i])
+        if (
+            not m
+            or _indent(lines[i]) > base + 1
+            or _indent(lines[i]) < base
+            or m.group(2)[0].isdigit() != ordered
+            or _RULE_RE.match(lines[i])
+        ):
+            break
+        content_offset = len(m.group(1)) + len(m.group(2)) + 1
+        item_lines = [m.group(3) or ""]
+        i += 1
+        while i < len(lines):
+            line = lines[i]
+            if not line.strip():
+                # A blank line ends the item unless the list continues after it
+                j = i
+                while j < len(lines) and not lines[j].strip():
+                    j += 1
+                if j < len(lines) and _indent(lines[j]) > base:
+                    item_lines.extend([""] * (j - i))
+                    i = j
+                    continue
+                break
+            indent = _indent(line)
+            if indent > base:
+                item_lines.append(line[min(indent, content_offset) :])
+            elif not _is_block_start(line) and item_lines[-1].strip():
+                # Lazy continuation of the item's paragraph
+                item_lines.append(line)
+            else:
+                break
+            i += 1
+        blocks = _parse_blocks(item_lines) or [{"type": "paragraph", "content": []}]
+        items.append({"type": "listItem", "content": blocks})
+        task = _TASK_RE.match(item_lines[0])
+        if task:
+            tasks.append(
+                (task.group(1), _parse_blocks([task.group(2) or ""] + item_lines[1:]))
+            )
+        if i < len(lines) and not lines[i].strip():
+            j = i
+            while j < len(lines) and not lines[j].strip():
+                j += 1
+            m = _LIST_RE.match(lines[j]) if j < len(lines) else None
+            if m and base <= _indent(lines[j]) <= base + 1:
+                i = j
+                continue
+            break
+
+    if not ordered and len(tasks) == len(items):
+        task_list = _task_list(tasks)
+        if task_list is not None:
+            return task_list, i
+
+    node: dict[str, Any] = {
+        "type": "orderedList" if ordered else "bulletList",
+        "content": items,
+    }
+    if ordered:
+        start = int(first.group(2)[:-1])
+        if start != 1:
+            node["attrs"] = {"order": start}
+    return node, i
+
+
+def _task_list(tasks: list[tuple[str, list[dict]]]) -> Optional[dict]:
+    """GFM task list as a ``taskList``, or None when ADF cannot hold its items.
+
+    Task items only take inline content; nested task lists follow their parent
+    item inside the same ``taskList``.
+    """
+    content = []
+    for state, blocks in tasks:
+        inline = []
+        if blocks and blocks[0]["type"] == "paragraph":
+            inline = blocks.pop(0)["content"]
+        if any(block["type"] != "taskList" for block in blocks):
+            return None
+        content.append(
+            {
+                "type": "taskItem",
+                "attrs": {
+                    "localId": str(uuid.uuid4()),
+                    "state": "TODO" if state == " " else "DONE",
+                },
+                "content": inline,
+            }
+        )
+        content.extend(blocks)
+    return {
+        "type": "taskList",
+        "attrs": {"localId": str(uuid.uuid4())},
+        "content": content,
+    }
+
+
+def _parse_blocks(lines: list[str]) -> list[dict]:
+    blocks: list[dict] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+
+        fence = _FENCE_RE.match(line)
+        if fence:
+            indent, marker, language = fence.groups()
+            code_lines = []
+            i += 1
+            while i < len(lines):
+                closing = lines[i].strip()
+                if closing.startswith(marker[0] * len(marker)) and not closing.strip(
+                    marker[0]
+                ):
+                    i += 1
+                    break
+                code_lines.append(
+                    lines[i][min(len(indent), _indent(lines[i])) :]
+                    if lines[i].strip()
+                    else ""
+                )
+                i += 1
+            code = "\n".join(code_lines)
+            node: dict[str, Any] = {"type": "codeBlock"}
+            if language:
+                node["attrs"] = {"language": language}
+            if code:
+                node["content"] = [{"type": "text", "text": code}]
+            blocks.append(node)
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading:
+            blocks.append(
+                {
+                    "type": "heading",
+                    "attrs": {"level": len(heading.group(1))},
+                    "content": _parse_inline(heading.group(2) or ""),
+                }
+            )
+            i += 1
+            continue
+
+        if _RULE_RE.match(line):
+            blocks.append({"type": "rule"})
+            i += 1
+            continue
+
+        if _QUOTE_RE.match(line):
+            quoted = []
+            while i < len(lines) and _QUOTE_RE.match(lines[i]):
+                quoted.append(_QUOTE_RE.match(lines[i]).group(1))
+                i += 1
+            blocks.append({"type": "blockquote", "content": _parse_blocks(quoted)})
+            continue
+
+        if (
+            "|" in line
+            and i + 1 < len(lines)
+            and "-" in lines[i + 1]
+            and _TABLE_SEPARATOR_RE.match(lines[i + 1])
+        ):
+            rows = [line]
+            i += 2
+            while i < len(lines) and "|" in lines[i] and lines[i].strip():
+                rows.append(lines[i])
+                i += 1
+            blocks.append(_table(rows))
+            continue
+
+        if _LIST_RE.match(line):
+            node, i = _parse_list(lines, i)
+            blocks.append(node)
+            continue
+
+        image = _match_link(line.strip(), 1) if _IMAGE_LINE_RE.match(line) else None
+        if image is not None and image[2] == len(line.strip()):
+            alt, href, _ = image
+            media = {"type": "media", "attrs": {"type": "external", "url": href}}
+            if alt:
+                media["attrs"]["alt"] = alt
+            blocks.append(
+                {
+                    "type": "mediaSingle",
+                    "attrs": {"layout": "center"},
+                    "content": [media],
+                }
+            )
+            i += 1
+            continue
+
+        paragraph = [line]
+        i += 1
+        while i < len(lines) and lines[i].strip() and not _is_block_start(lines[i]):
+            paragraph.append(lines[i])
+            i += 1
+        blocks.append({"type": "paragraph", "content": _inline_with_breaks(paragraph)})
+
+    return blocks
+
+
+def md_to_adf(markdown: str) -> dict:
+    """Convert Markdown string -> ADF dict."""
+    lines = markdown.replace("\r\n", "\n").replace("\r", "\n").expandtabs(4)
+    return {"version": 1, "type": "doc", "content": _parse_blocks(lines.split("\n"))}
+
+
+# ---------------------------------------------------------------------------
+# ADF -> Markdown
+# ---------------------------------------------------------------------------
+
+
+def _wrap(text: str, left: str, right: Optional[str] = None) -> str:
+    """Wrap ``text`` in emphasis delimiters, keeping outer whitespace outside."""
+    core = text.strip()
+    if not core:
+        return text
+    lead = text[: len(text) - len(text.lstrip())]
+    trail = text[len(text.rstrip()) :]
+    return f"{lead}{left}{core}{right if right is not None else left}{trail}"
+
+
+def _code_span(text: str) -> str:
+    longest = max((len(run) for run in re.findall(r"`+", text)), default=0)
+    fence = "`" * (longest + 1)
+    pad = " " if text.startswith("`") or text.endswith("`") else ""
+    return f"{fence}{pad}{text}{pad}{fence}"
+
+
+# Characters that would otherwise open emphasis or code. An underscore inside
+# a word (snake_case) never does, and a backslash only escapes what follows it
+_MARKDOWN_SPECIAL_RE = re.compile(
+    r"[*`]|\\(?=[%s]|$)|(?<![^\W_])_|_(?![^\W_])"
+    % re.escape("".join(sorted(_ESCAPABLE)))
+)
+
+
+def _escape(text: str) -> str:
+    return _MARKDOWN_SPECIAL_RE.sub(lambda m: "\\" + m.group(0), text)
+
+
+def _render_text(node: dict) -> str:
+    text = node.get("text", "")
+    types = {mark.get("type") for mark in node.get("marks", [])}
+    if "code" in types:
+        return _code_span(text)
+    text = _escape(text)
+    if "strike" in types:
+        text = _wrap(text, "~~")
+    if "em" in types:
+        text = _wrap(text, "*")
+    if "strong" in types:
+        text = _wrap(text, "**")
+    return text
+
+
+def _link_href(node: dict) -> Optional[str]:
+    for mark in node.get("marks", []):
+        if mark.get("type") == "link":
+            return (mark.get("attrs") or {}).get("href")
+    return None
+
+
+def _render_inline_node(node: dict) -> str:
+    node_type = node.get("type")
+    attrs = node.get("attrs") or {}
+    if node_type == "text":
+        return _render_text(node)
+    if node_type == "hardBreak":
+        return "\n"
+    if node_type == "mention":
+        text = attrs.get("text") or attrs.get("id", "")
+        return text if text.startswith("@") else f"@{text}"
+    if node_type == "emoji":
+        return attrs.get("text") or attrs.get("shortName", "")
+    if node_type in ("inlineCard", "blockCard", "embedCard"):
+        url = attrs.get("url", "")
+        return f"<{url}>" if url else ""
+    if node_type == "status":
+        return attrs.get("text", "")
+    if node_type == "date":
+        try:
+            timestamp = int(attrs.get("timestamp")) / 1000
+        except (TypeError, ValueError):
+            return ""
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+    if node_type == "placeholder":
+        return attrs.get("text", "")
+    return _render_inline(node.get("content", []))
+
+
+def _render_inline(nodes: list[dict]) -> str:
+    out = []
+    i = 0
+    while i < len(nodes):
+        href = _link_href(nodes[i]) if nodes[i].get("type") == "text" else None
+        if href is None:
+            out.append(_render_inline_node(nodes[i]))
+            i += 1
+            continue
+        # Consecutive text nodes sharing a link render as one link
+        label = []
+        while (
+            i < len(nodes)
+            and nodes[i].get("type") == "text"
+            and _link_href(nodes[i]) == href
+        ):
+            unlinked = dict(nodes[i])
+            unlinked["marks"] = [
+                mark for mark in nodes[i].get("marks", []) if mark.get("type") != "link"
+            ]
+            label.append(_render_text(unlinked))
+            i += 1
+        label = "".join(label)
+        out.append(f"<{href}>" if label == href else f"[{label}]({href})")
+    return "".join(out)
+
+
+def _prefix_lines(text: str, first: str, rest: str) -> str:
+    lines = text.split("\n")
+    return "\n".join(
+        [first + lines[0]] + [rest + line if line else "" for line in lines[1:]]
+    )
+
+
+def _render_list(node: dict) -> str:
+    ordered = node.get("type") == "orderedList"
+    number = (node.get("attrs") or {}).get("order", 1) or 1
+    items = []
+    for item in node.get("content", []):
+        if item.get("type") == "taskList":
+            # Nested task list, rendered under the item before it
+            items.append(_prefix_lines(_render_list(item), "  ", "  "))
+            continue
+        if item.get("type") == "taskItem":
+            state = (item.get("attrs") or {}).get("state")
+            marker = "- [x] " if state == "DONE" else "- [ ] "
+            body = _render_inline(item.get("content", []))
+        else:
+            marker = f"{number}. " if ordered else "- "
+            # Tight list: an item's paragraph and nested lists are not separated
+            body = "\n".join(
+                rendered
+                for rendered in (
+                    _render_block(child) for child in item.get("content", [])
+                )
+                if rendered
+            )
+        items.append(_prefix_lines(body, marker, " " * len(marker)))
+        number += 1
+    return "\n".join(items)
+
+
+def _render_table(node: dict) -> str:
+    rows = []
+    for row in node.get("content", []):
+        cells = []
+        for cell in row.get("content", []):
+            text = " ".join(
+                _render_block(child) for child in cell.get("content", [])
+            ).replace("\n", " ")
+            cells.append(text.replace("|", "\\|").strip())
+        rows.append(cells)
+    if not rows:
+        return ""
+    width = max(len(cells) for cells in rows)
+    rows = [cells + [""] * (width - len(cells)) for cells in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + " --- |" * width]
+    lines += ["| " + " | ".join(cells) + " |" for cells in rows[1:]]
+    return "\n".join(lines)
+
+
+def _render_block(node: dict) -> str:
+    node_type = node.get("type")
+    attrs = node.get("attrs") or {}
+    content = node.get("content", [])
+
+    if node_type == "paragraph":
+        return _render_inline(content)
+    if node_type == "heading":
+        return "#" * int(attrs.get("level", 1)) + " " + _render_inline(content)
+    if node_type in ("bulletList", "orderedList", "taskList"):
+        return _render_list(node)
+    if node_type == "codeBlock":
+        code = "".join(child.get("text", "") for child in content)
+        fence = "```"
+        while fence in code:
+            fence += "`"
+        return f"{fence}{attrs.get('language') or ''}\n{code}\n{fence}"
+    if node_type in ("blockquote", "panel"):
+        return _prefix_lines(_render_blocks(content), "> ", "> ").replace(
+            "\n\n", "\n>\n"
+        )
+    if node_type == "rule":
+        return "---"
+    if node_type == "table":
+        return _render_table(node)
+    if node_type in ("expand", "nestedExpand"):
+        title = attrs.get("title")
+        body = _render_blocks(content)
+        return f"**{title}**\n\n{body}" if title else body
+    if node_type in ("mediaSingle", "media"):
+        # Only external images have a URL; attachments are referenced by ID
+        media = node if node_type == "media" else (content or [{}])[0]
+        media_attrs = media.get("attrs") or {}
+        if media_attrs.get("type") != "external" or not media_attrs.get("url"):
+            return ""
+        return f"![{_escape(media_attrs.get('alt') or '')}]({media_attrs['url']})"
+    if node_type in ("mediaGroup", "extension"):
+        return ""
+    if node_type in ("blockCard", "embedCard"):
+        return _render_inline_node(node)
+    if node_type in ("text", "hardBreak", "mention", "emoji", "inlineCard", "status"):
+        return _render_inline_node(node)
+    return _render_blocks(content)
+
+
+def _render_blocks(nodes: list[dict]) -> str:
+    return "\n\n".join(
+        rendered for rendered in (_render_block(node) for node in nodes) if rendered
+    )
+
+
+def adf_to_md(adf: dict) -> str:
+    """Convert ADF dict -> Markdown string."""
+    if adf.get("type") == "doc":
+        return _render_blocks(adf.get("content", []))
+    return _render_block(adf)
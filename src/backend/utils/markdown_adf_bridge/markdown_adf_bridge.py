@@ -6,6 +6,9 @@ from typing import Optional
 
 from jira2markdown import convert as jira2md_convert
 
+from common.configs import JiraConfig
+from . import adf as _adf
+
 HERE = Path(__file__).parent.resolve()
 BRIDGE = HERE / "md_adf_bridge.mjs"
 NODE_MODULES = HERE / "node_modules"
@@ -19,7 +22,13 @@ NPM_PKGS = [
 ]
 
 
+_node_bridge_ready = False
+
+
 def _ensure_node_bridge_ready():
+    global _node_bridge_ready
+    if _node_bridge_ready:
+        return
     if shutil.which("node") is None:
         raise RuntimeError(
             "Node.js is required on PATH to run the Markdown<->ADF bridge."
@@ -49,6 +58,7 @@ def _ensure_node_bridge_ready():
         raise RuntimeError(
             f"Bridge script not found at {BRIDGE}. Save md_adf_bridge.mjs next to this Python file."
         )
+    _node_bridge_ready = True
 
 
 def _run_bridge(direction: str, payload: str) -> str:
@@ -69,16 +79,30 @@ def _run_bridge(direction: str, payload: str) -> str:
     return proc.stdout.decode("utf-8")
 
 
-def md_to_adf(markdown: str) -> dict:
-    """Convert Markdown string -> ADF dict."""
+def node_md_to_adf(markdown: str) -> dict:
+    """Convert Markdown string -> ADF dict with the Node bridge."""
     out = _run_bridge("md2adf", markdown)
     return json.loads(out)
 
 
-def adf_to_md(adf: any) -> str:
+def node_adf_to_md(adf: dict) -> str:
+    """Convert ADF dict -> Markdown string with the Node bridge."""
+    return _run_bridge("adf2md", json.dumps(adf))
+
+
+def md_to_adf(markdown: str, engine: Optional[str] = None) -> dict:
+    """Convert Markdown string -> ADF dict."""
+    if (engine or JiraConfig.ADF_ENGINE) == "node":
+        return node_md_to_adf(markdown)
+    return _adf.md_to_adf(markdown)
+
+
+def adf_to_md(adf: any, engine: Optional[str] = None) -> str:
     """Convert ADF dict -> Markdown string."""
     if isinstance(adf, dict):
-        return _run_bridge("adf2md", json.dumps(adf))
+        if (engine or JiraConfig.ADF_ENGINE) == "node":
+            return node_adf_to_md(adf)
+        return _adf.adf_to_md(adf)
     elif isinstance(adf, str):
         return adf.replace("{noformat}", "")  # Strip noformat if accidentally included
     else:
@@ -0,0 +1,106 @@
+"""Group items into LLM batches by token count instead of item count.
+
+A fixed number of stories per call gives wildly uneven prompts when story
+descriptions range from one line to several pages: small batches waste calls,
+large ones hit the context limit and retry. ``pack_by_tokens`` fills each batch
+up to a token budget so per-call latency evens out and each request carries as
+many items as fit.
+"""
+
+import math
+from functools import lru_cache
+from typing import Callable, Optional, Sequence, TypeVar
+
+import tiktoken
+
+T = TypeVar("T")
+
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(name)
+
+
+def count_tokens(text: str, encoding: str = DEFAULT_ENCODING) -> int:
+    """Count the tokens of ``text`` with tiktoken (``o200k_base`` by default)."""
+    return len(_encoding(encoding).encode(text, disallowed_special=()))
+
+
+def pack_by_tokens(
+    items: Sequence[T],
+    token_budget: int,
+    measure: Callable[[T], int],
+    max_items: Optional[int] = None,
+) -> list[list[T]]:
+    """
+    Pack ``items`` into the fewest batches that respect ``token_budget`` and
+    ``max_items``, balancing the tokens of the batches so calls take about the
+    same time. Items are placed largest first on the least loaded batch that
+    has room; an item larger than the budget gets a batch of its own. Items
+    keep their original relative order inside a batch and batches are ordered
+    by their first item.
+
+    Args:
+        items: Items to pack
+        token_budget: Target tokens per batch (the item part of the prompt)
+        measure: Token count of one item, e.g. ``count_tokens`` of its rendering
+        max_items: Optional cap on items per batch
+    """
+    if not items:
+        return []
+    sizes = [measure(item) for item in items]
+    oversized = sum(1 for size in sizes if size > token_budget)
+    fitting_tokens = sum(size for size in sizes if size <= token_budget)
+    batch_count = max(
+        oversized + math.ceil(fitting_tokens / max(token_budget, 1)),
+        math.ceil(len(items) / max_items) if max_items else 1,
+    )
+    batches: list[list[int]] = [[] for _ in range(batch_count)]
+    loads = [0] * batch_count
+
+    for i in sorted(range(len(items)), key=lambda i: sizes[i], reverse=True):
+        candidates = [
+            b
+            for b in range(len(batches))
+            if (max_items is None or len(batches[b]) < max_items)
+            and (not batches[b] or loads[b] + sizes[i] <= token_budget)
+        ]
+        if candidates:
+            b = min(candidates, key=lambda b: loads[b])
+        else:
+            batches.append([])
+            loads.append(0)
+            b = len(batches) - 1
+        batches[b].append(i)
+        loads[b] += sizes[i]
+
+    packed = sorted((sorted(batch) for batch in batches if batch), key=lambda b: b[0])
+    return [[items[i] for i in batch] for batch in packed]
+
+
+def chunk_items(
+    items: Sequence[T],
+    batch_size: int,
+    token_budget: int = 0,
+    measure: Optional[Callable[[T], int]] = None,
+) -> list[list[T]]:
+    """
+    Split ``items`` into batches: packed to ``token_budget`` (with ``batch_size``
+    as the cap on items per batch) when a budget and ``measure`` are given,
+    otherwise in fixed chunks of ``batch_size``.
+    """
+    if token_budget > 0 and measure is not None:
+        tokens = {id(item): measure(item) for item in items}
+        batches = pack_by_tokens(
+            items, token_budget, lambda item: tokens[id(item)], max_items=batch_size
+        )
+        sizes = [sum(tokens[id(item)] for item in batch) for batch in batches]
+        if sizes:
+            print(
+                f"| Token packer: {len(items)} items into {len(batches)} batches "
+                f"(budget {token_budget}, tokens min {min(sizes)} / max {max(sizes)})"
+            )
+        return batches
+    return [list(items[i : i + batch_size]) for i in range(0, len(items), batch_size)]